@@ -0,0 +1,47 @@
+"""
+DataMender: smart cleaning for large CSV/Parquet files.
+
+The package is organised by pipeline stage (see plan.md): profiling,
+rule discovery, validation and the batch fix engine.
+
+The main entry points are available from the package itself. They are
+imported on first use, so ``import datamender`` (and the command line)
+does not load pandas and pyarrow until a stage actually needs them.
+"""
+
+import importlib
+
+__version__ = "0.1.0"
+
+_EXPORTS = {
+    "profile_file": "profiler",
+    "load_profile": "profiler",
+    "save_profile": "profiler",
+    "discover_rules": "discovery",
+    "preview_rules": "preview",
+    "check_constraints": "constraints",
+    "load_rules": "rules",
+    "save_rules": "rules",
+    "compile_plan": "fixer",
+    "fix_file": "fixer",
+    "run_checkpointed": "runlog",
+    "dedup_file": "dedup",
+    "Pipeline": "pipeline",
+    "load_pipeline": "pipeline",
+    "iter_batches": "io",
+    "infer_csv_schema": "io",
+    "Tracer": "trace",
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_EXPORTS})
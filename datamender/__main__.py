@@ -0,0 +1,3 @@
+from datamender.cli import main
+
+main()
@@ -0,0 +1,229 @@
+"""
+Offline benchmark suite: throughput and peak memory per pipeline stage.
+
+For every requested size a messy trips file is generated with
+:mod:`datamender.synth` and pushed through the whole pipeline::
+
+    generate → profile → discover (stub models) → fix → export (Parquet)
+
+Each stage runs in a fresh worker process, so its peak resident set size is
+its own and not inherited from an earlier, hungrier stage. Results (rows/s,
+MB/s, peak RSS) are written to JSON; pass the JSON of an earlier run with
+``--compare`` to flag stages that got slower or bigger::
+
+    python -m datamender.benchmark --sizes 1 10 100 -o bench.json --compare last.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from datamender import __version__
+from datamender.io import DEFAULT_CHUNKSIZE, ChunkWriter, iter_batches
+from datamender.trace import peak_rss_mb
+
+STAGES = ("generate", "profile", "discover", "fix", "export")
+DEFAULT_SIZES = (1, 10, 100)
+DEFAULT_TOLERANCE = 0.10
+
+# Counters turned into rates; discovery is measured in model calls, not rows.
+THROUGHPUT = (("rows", "rows_per_second"), ("calls", "calls_per_second"))
+
+# Stage bodies import what they need themselves, so each worker's peak RSS
+# only counts the modules its own stage uses.
+
+
+def _generate(data, size_mb, seed, rules):
+    from datamender.rules import save_rules
+    from datamender.synth import generate_trips, trip_rules
+
+    manifest = generate_trips(data, size_mb=size_mb, seed=seed)
+    save_rules(trip_rules(), rules)
+    return {"rows": manifest["rows"], "bytes": manifest["bytes"], "injected": manifest["injected"]}
+
+
+def _profile(data, profile_path, chunksize, workers):
+    from datamender.profiler import profile_file, save_profile
+
+    profile = profile_file(data, chunksize=chunksize, workers=workers)
+    save_profile(profile, profile_path)
+    return {"rows": profile["rows"], "bytes": os.path.getsize(data)}
+
+
+def _discover(profile_path, models, latency):
+    from datamender.discovery import discover_rules_async
+    from datamender.llm import StubModel
+    from datamender.profiler import load_profile
+
+    profile = load_profile(profile_path)
+    stubs = [StubModel(f"stub-{i}", latency=latency, margin=0.05 * (i + 1)) for i in range(models)]
+    rules, results = asyncio.run(discover_rules_async(profile, stubs))
+    return {"columns": len(profile["columns"]), "calls": len(results), "rules": len(rules)}
+
+
+def _fix(data, rules, cleaned, chunksize):
+    from datamender.fixer import fix_file
+
+    report = fix_file(data, rules, cleaned, chunksize=chunksize)
+    return {"rows": report["rows_in"], "bytes": os.path.getsize(data),
+            "rows_out": report["rows_out"], "anomalies": report["anomalies"]}
+
+
+def _export(cleaned, exported, chunksize):
+    with ChunkWriter(exported) as writer:
+        for chunk in iter_batches(cleaned, chunksize=chunksize):
+            writer.write(chunk)
+    return {"rows": writer.rows, "bytes": os.path.getsize(exported)}
+
+
+def _measure(function, *args):
+    """Run one stage in the worker; returns its metrics, wall time and peak RSS."""
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    metrics = function(*args)
+    metrics["seconds"] = time.perf_counter() - started
+    metrics["baseline_rss_mb"] = baseline
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+def run_stage(function, *args):
+    """Run ``function(*args)`` in a fresh process and return its metrics."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        metrics = pool.submit(_measure, function, *args).result()
+    seconds = metrics["seconds"]
+    if seconds > 0:
+        for count, rate in THROUGHPUT:
+            if count in metrics:
+                metrics[rate] = metrics[count] / seconds
+        if "bytes" in metrics:
+            metrics["mb_per_second"] = metrics["bytes"] / 2 ** 20 / seconds
+    return {key: round(value, 3) if isinstance(value, float) else value
+            for key, value in metrics.items()}
+
+
+def benchmark_size(size_mb, workdir, file_format="csv", seed=0, chunksize=DEFAULT_CHUNKSIZE,
+                   workers=1, models=3, latency=0.0, on_stage=None):
+    """Benchmark every stage on one generated file; returns ``{stage: metrics}``."""
+    stem = os.path.join(workdir, f"trips-{size_mb:g}mb")
+    data = f"{stem}.{file_format}"
+    rules = f"{stem}.rules.yaml"
+    profile_path = f"{stem}.profile.json"
+    cleaned = f"{stem}.clean.{file_format}"
+    exported = f"{stem}.export.parquet"
+    stages = {
+        "generate": (_generate, data, size_mb, seed, rules),
+        "profile": (_profile, data, profile_path, chunksize, workers),
+        "discover": (_discover, profile_path, models, latency),
+        "fix": (_fix, data, rules, cleaned, chunksize),
+        "export": (_export, cleaned, exported, chunksize),
+    }
+    results = {}
+    for name in STAGES:
+        results[name] = run_stage(*stages[name])
+        if on_stage is not None:
+            on_stage(size_mb, name, results[name])
+    return results
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, workdir=None, **options):
+    """Benchmark each size in MB; returns a JSON-serialisable report."""
+    report = {
+        "version": __version__,
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": {key: value for key, value in options.items() if key != "on_stage"},
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory(dir=workdir, prefix="datamender-bench-") as scratch:
+        for size_mb in sizes:
+            stages = benchmark_size(size_mb, scratch, **options)
+            report["runs"].append({"size_mb": size_mb, "format": options.get("file_format", "csv"),
+                                   "stages": stages})
+    return report
+
+
+def compare_reports(current, previous, tolerance=DEFAULT_TOLERANCE):
+    """List regressions of ``current`` against ``previous``.
+
+    A stage regresses when its throughput dropped, or its peak RSS grew, by
+    more than ``tolerance`` (a fraction) for the same file size and format.
+    """
+    earlier = {(run["size_mb"], run.get("format"), name): metrics
+               for run in previous.get("runs", []) for name, metrics in run["stages"].items()}
+    checks = [(rate, -1) for _, rate in THROUGHPUT] + [("peak_rss_mb", 1)]
+    regressions = []
+    for run in current["runs"]:
+        for name, metrics in run["stages"].items():
+            before = earlier.get((run["size_mb"], run.get("format"), name))
+            if before is None:
+                continue
+            for key, worse in checks:
+                old, new = before.get(key), metrics.get(key)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                if change * worse > tolerance:
+                    regressions.append({"size_mb": run["size_mb"], "stage": name, "metric": key,
+                                        "before": old, "after": new, "change": round(change, 3)})
+    return regressions
+
+
+def main(argv=None):
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark DataMender on generated trip data.")
+    parser.add_argument("--sizes", type=float, nargs="+", default=list(DEFAULT_SIZES),
+                        help="file sizes in MB")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--workers", type=int, default=1, help="profiler worker processes")
+    parser.add_argument("--models", type=int, default=3, help="number of stub models")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated seconds per stub model call")
+    parser.add_argument("--workdir", help="directory for the generated files (default: temp)")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="results JSON to write")
+    parser.add_argument("--compare", help="results JSON of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown / memory growth before flagging (fraction)")
+    args = parser.parse_args(argv)
+
+    def show(size_mb, name, metrics):
+        if "rows_per_second" in metrics:
+            throughput = f"{metrics['rows_per_second']:>12,.0f} rows/s"
+        else:
+            throughput = f"{metrics.get('calls_per_second', 0):>11,.0f} calls/s"
+        if "mb_per_second" in metrics:
+            throughput += f" {metrics['mb_per_second']:>8.1f} MB/s"
+        print(f"  {size_mb:>8g} MB  {name:<9} {metrics['seconds']:>8.2f}s {throughput}"
+              f"  peak {metrics['peak_rss_mb']:.0f} MB")
+
+    report = run_benchmark(args.sizes, args.workdir, file_format=args.format, seed=args.seed,
+                           chunksize=args.chunksize, workers=args.workers, models=args.models,
+                           latency=args.latency, on_stage=show)
+    if args.compare:
+        with open(args.compare) as f:
+            report["regressions"] = compare_reports(report, json.load(f), args.tolerance)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Benchmark results written to {args.output}")
+    for regression in report.get("regressions", []):
+        print(f"⚠️  {regression['stage']} at {regression['size_mb']:g} MB: {regression['metric']} "
+              f"{regression['before']} → {regression['after']} ({regression['change']:+.0%})")
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
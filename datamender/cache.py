@@ -0,0 +1,354 @@
+"""
+Content-addressed on-disk cache for LLM rule suggestions.
+
+Discovery runs daily on files whose schema and distributions barely move,
+so most model calls ask the same question again. Each answer is stored
+under a fingerprint of the column profile, the prompt template and the
+model name:
+
+* the exact key hashes a quantized copy of the summary (3 significant
+  digits, dates truncated to the day, row counts left out), so noise in
+  the last digits does not cause a miss;
+* on an exact miss, entries of the same *family* (model, template, column
+  name and type) are compared numerically. Within ``similarity`` (relative
+  to the column's value range) they count as a hit, so slowly drifting
+  columns still skip the model call.
+
+The cache is bounded by entry count and total bytes and evicts the least
+recently used entries first. :attr:`SuggestionCache.stats` reports hits,
+misses and the model latency and tokens that were saved.
+
+:class:`PlanCache` keeps what the command line would otherwise rebuild on
+every invocation: compiled rule plans and pinned or inferred CSV schemas,
+keyed by the size and modification time of the file they come from. The
+command-line tool points it at ``$DATAMENDER_CACHE_DIR``.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from datamender import __version__
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SIMILARITY = 0.02
+FINGERPRINT_DIGITS = 3
+
+# Directory of the PlanCache used by the command line; unset disables it.
+CACHE_DIR_ENV = "DATAMENDER_CACHE_DIR"
+
+# Summary fields that identify a column's shape. Counts that grow with the
+# file (rows, missing, distinct, zeros) are left out on purpose.
+EXACT_FIELDS = ("kind", "missing_pct", "min", "max", "mean", "std", "quantiles",
+                "min_length", "max_length")
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how much work the cache saved."""
+
+    hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    saved_seconds: float = 0.0
+    saved_tokens: int = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.similar_hits + self.misses
+        return (self.hits + self.similar_hits) / lookups if lookups else 0.0
+
+    def to_dict(self):
+        data = asdict(self)
+        data["saved_seconds"] = round(self.saved_seconds, 6)
+        data["hit_rate"] = round(self.hit_rate, 4)
+        return data
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    key: str
+    family: str
+    features: tuple
+
+
+def fingerprint(column, summary, template, model_name):
+    """Return the exact key, similarity family and numeric features of a lookup."""
+    template_hash = _sha256(template)
+    shape = {field: _quantize(summary.get(field)) for field in EXACT_FIELDS
+             if summary.get(field) is not None}
+    shape["has_negatives"] = bool(summary.get("negatives"))
+    shape["top_values"] = sorted(str(_top_value(item)) for item in summary.get("top_values") or [])
+    family = {"model": model_name, "template": template_hash, "column": column,
+              "kind": summary.get("kind"), "has_negatives": shape["has_negatives"],
+              "top_values": shape["top_values"]}
+    family_key = _sha256(_canonical(family))
+    key = _sha256(_canonical({"family": family_key, "shape": shape}))
+    return Fingerprint(key, family_key, _features(summary))
+
+
+class SuggestionCache:
+    """LRU, size-bounded on-disk cache of raw model answers."""
+
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES, similarity=DEFAULT_SIMILARITY):
+        self.directory = os.fspath(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.similarity = similarity
+        self.stats = CacheStats()
+        os.makedirs(os.path.join(self.directory, "entries"), exist_ok=True)
+        self.index = self._load_index()
+        self._tick = max((entry["tick"] for entry in self.index.values()), default=0)
+        self._dirty = False
+
+    def lookup(self, column, summary, template, model_name):
+        """Return the cached answer for this column/template/model, or None."""
+        key_print = fingerprint(column, summary, template, model_name)
+        key, similar = key_print.key, False
+        if key not in self.index and self.similarity > 0:
+            key, similar = self._nearest(key_print), True
+        response = self._read(key) if key in self.index else None
+        if response is None:
+            self.stats.misses += 1
+            return None
+        entry = self.index[key]
+        self._tick += 1
+        entry["tick"] = self._tick
+        self._dirty = True
+        if similar:
+            self.stats.similar_hits += 1
+        else:
+            self.stats.hits += 1
+        self.stats.saved_seconds += entry.get("seconds", 0.0)
+        self.stats.saved_tokens += entry.get("tokens", 0)
+        return response
+
+    def store(self, column, summary, template, model_name, response, seconds=0.0, tokens=0):
+        """Cache a model answer along with what the call cost."""
+        key_print = fingerprint(column, summary, template, model_name)
+        payload = json.dumps({"column": column, "model": model_name, "response": response})
+        atomic_write(self._entry_path(key_print.key), payload)
+        self._tick += 1
+        self.index[key_print.key] = {
+            "family": key_print.family,
+            "features": list(key_print.features),
+            "bytes": len(payload.encode()),
+            "tick": self._tick,
+            "seconds": seconds,
+            "tokens": tokens,
+        }
+        self.stats.stores += 1
+        self._evict()
+        self._dirty = True
+
+    def flush(self):
+        """Persist the index (access order and sizes) if it changed."""
+        if self._dirty:
+            atomic_write(self._index_path(), json.dumps(self.index))
+            self._dirty = False
+
+    def clear(self):
+        for key in list(self.index):
+            self._remove(key)
+        self._dirty = True
+        self.flush()
+
+    @property
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self.index.values())
+
+    def __len__(self):
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def _nearest(self, key_print):
+        best_key, best_distance = None, None
+        for key, entry in self.index.items():
+            if entry["family"] != key_print.family:
+                continue
+            distance = _distance(key_print.features, entry["features"])
+            if distance is not None and distance <= self.similarity and (
+                best_distance is None or distance < best_distance
+            ):
+                best_key, best_distance = key, distance
+        return best_key
+
+    def _evict(self):
+        total = self.total_bytes
+        while self.index and (len(self.index) > self.max_entries or total > self.max_bytes):
+            oldest = min(self.index, key=lambda key: self.index[key]["tick"])
+            total -= self.index[oldest]["bytes"]
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def _remove(self, key):
+        self.index.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _read(self, key):
+        try:
+            with open(self._entry_path(key)) as f:
+                return json.load(f)["response"]
+        except (FileNotFoundError, ValueError, KeyError):
+            self.index.pop(key, None)
+            self._dirty = True
+            return None
+
+    def _load_index(self):
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _index_path(self):
+        return os.path.join(self.directory, "index.json")
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, "entries", f"{key}.json")
+
+
+class PlanCache:
+    """Objects built from a file, kept in memory and on disk until the file changes.
+
+    :meth:`get` returns ``build()`` for a (kind, file) pair, rebuilt only
+    when the file's size or modification time (or the package version)
+    changed. Entries are pickled, so every call returns a fresh object
+    (a FixPlan's counters start at zero each time). There is one entry per
+    kind and file, replaced when the file changes.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.fspath(directory)
+        self.memory = {}
+        self.stats = CacheStats()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, kind, path, build):
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        key = _sha256(_canonical([kind, path]))
+        stamp = [stat.st_size, stat.st_mtime_ns, __version__]
+        entry = self.memory.get(key)
+        if entry is None:
+            try:
+                with open(os.path.join(self.directory, f"{key}.pkl"), "rb") as f:
+                    entry = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                entry = None
+        if entry is not None and entry[0] == stamp:
+            self.stats.hits += 1
+            self.memory[key] = entry
+            return pickle.loads(entry[1])
+        self.stats.misses += 1
+        value = build()
+        entry = (stamp, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        self.memory[key] = entry
+        self.stats.stores += 1
+        atomic_write(os.path.join(self.directory, f"{key}.pkl"),
+                     pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
+
+
+_plan_caches = {}
+
+
+def plan_cache():
+    """The PlanCache in ``$DATAMENDER_CACHE_DIR`` (one per directory and process), or None."""
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if not directory:
+        return None
+    if directory not in _plan_caches:
+        _plan_caches[directory] = PlanCache(directory)
+    return _plan_caches[directory]
+
+
+def _features(summary):
+    """Numeric view of a summary used for similarity matching."""
+    values = [("missing_pct", summary.get("missing_pct"))]
+    for field in ("min", "max", "mean", "std"):
+        values.append((field, summary.get(field)))
+    for name, value in sorted((summary.get("quantiles") or {}).items()):
+        values.append((name, value))
+    return tuple((name, _number(value)) for name, value in values if _number(value) is not None)
+
+
+def _distance(left, right):
+    """Largest feature difference relative to the column's value range."""
+    left, right = dict(left), dict(right)
+    if set(left) != set(right):
+        return None
+    span = max(
+        abs(left.get("max", 0) - left.get("min", 0)),
+        abs(right.get("max", 0) - right.get("min", 0)),
+        1e-12,
+    )
+    distance = 0.0
+    for name, value in left.items():
+        scale = 100.0 if name == "missing_pct" else span
+        distance = max(distance, abs(value - right[name]) / scale)
+    return distance
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def _quantize(value):
+    if isinstance(value, dict):
+        return {key: _quantize(item) for key, item in value.items()}
+    if isinstance(value, float):
+        return float(f"{value:.{FINGERPRINT_DIGITS}g}")
+    if isinstance(value, str) and _number(value) is not None:
+        return value[:10]
+    return value
+
+
+def _top_value(item):
+    return item[0] if isinstance(item, list) else item.get("value")
+
+
+def _canonical(document):
+    return json.dumps(document, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def atomic_write(path, text):
+    """Write ``text`` (str or bytes) to ``path`` so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if isinstance(text, bytes) else "w") as f:
+            f.write(text)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
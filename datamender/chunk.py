@@ -0,0 +1,198 @@
+"""
+Arrow-backed chunks shared by the profiler, the fix engine and the writers.
+
+A :class:`Chunk` wraps one ``pyarrow.RecordBatch``. Parquet batches and
+memory-mapped Arrow IPC/Feather batches are used exactly as they come off
+the reader, so profiling, fixing and writing a chunk all see the same
+buffers: numeric and timestamp columns are handed to NumPy as read-only
+views, text statistics run on Arrow compute kernels, and only columns a
+rule actually rewrites are copied. Peak memory is therefore about one
+chunk plus the sketches, instead of one copy per stage.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+NAT = np.iinfo(np.int64).min
+
+# dtype name pandas uses for text columns ("str" on pandas 3, "object" before).
+_STRING_DTYPE = str(pd.Series(["a"]).dtype)
+
+
+class Chunk:
+    """One bounded batch of rows held in Arrow buffers."""
+
+    def __init__(self, batch, frame=None):
+        self.batch = batch
+        self._frame = frame
+
+    @classmethod
+    def wrap(cls, data):
+        """Return a Chunk for a Chunk, RecordBatch, Table or DataFrame."""
+        if isinstance(data, Chunk):
+            return data
+        if isinstance(data, pa.RecordBatch):
+            return cls(data)
+        if isinstance(data, pa.Table):
+            batches = data.combine_chunks().to_batches()
+            return cls(batches[0] if batches else pa.RecordBatch.from_pylist([], data.schema))
+        return cls.from_pandas(data)
+
+    @classmethod
+    def from_pandas(cls, frame):
+        """Convert a DataFrame; NaN/NaT become nulls.
+
+        The frame is kept, so consumers that still need pandas (e.g. the
+        sampler or the CSV writer) do not convert it back.
+        """
+        try:
+            batch = pa.RecordBatch.from_pandas(frame, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Object columns mixing e.g. str and int are kept as text.
+            converted = frame.copy(deep=False)
+            for name in converted.columns:
+                series = converted[name]
+                if series.dtype == object:
+                    converted[name] = series.astype(str).where(series.notna(), None)
+            batch = pa.RecordBatch.from_pandas(converted, preserve_index=False)
+        except TypeError:
+            # Columns backed by chunked Arrow data (e.g. concatenated frames).
+            return cls.wrap(pa.Table.from_pandas(frame, preserve_index=False))
+        return cls(batch, frame)
+
+    def __len__(self):
+        return self.batch.num_rows
+
+    @property
+    def columns(self):
+        return self.batch.schema.names
+
+    @property
+    def nbytes(self):
+        return self.batch.nbytes
+
+    def array(self, name):
+        """Return one column as a (dictionary-decoded) Arrow array."""
+        index = self.batch.schema.get_field_index(name)
+        if index < 0:
+            raise KeyError(name)
+        array = self.batch.column(index)
+        if pa.types.is_dictionary(array.type):
+            array = array.dictionary_decode()
+        return array
+
+    def select(self, names):
+        names = list(names)
+        frame = self._frame[names] if self._frame is not None else None
+        return Chunk(self.batch.select(names), frame)
+
+    def filter(self, keep):
+        """Return the rows where the boolean NumPy mask ``keep`` is True."""
+        return Chunk(self.batch.filter(pa.array(keep, type=pa.bool_())))
+
+    def with_columns(self, arrays):
+        """Return a chunk with some columns replaced by new Arrow arrays."""
+        names = self.columns
+        columns = [arrays.get(name, self.batch.column(i)) for i, name in enumerate(names)]
+        return Chunk(pa.RecordBatch.from_arrays(columns, names=names))
+
+    def to_pandas(self):
+        if self._frame is None:
+            self._frame = self.batch.to_pandas()
+        return self._frame
+
+
+def as_arrow(values):
+    """Return a Series, ChunkedArray or Array as a single Arrow array."""
+    if isinstance(values, pa.ChunkedArray):
+        return values.combine_chunks()
+    if isinstance(values, pa.Array):
+        return values
+    return Chunk.from_pandas(values.to_frame(name="values")).array("values")
+
+
+def column_kind(data_type):
+    """Map an Arrow type to boolean/integer/float/datetime/string/null."""
+    if pa.types.is_dictionary(data_type):
+        data_type = data_type.value_type
+    if pa.types.is_null(data_type):
+        return "null"
+    if pa.types.is_boolean(data_type):
+        return "boolean"
+    if pa.types.is_integer(data_type):
+        return "integer"
+    if pa.types.is_floating(data_type) or pa.types.is_decimal(data_type):
+        return "float"
+    if pa.types.is_timestamp(data_type) or pa.types.is_date(data_type):
+        return "datetime"
+    return "string"
+
+
+def is_text(data_type):
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+
+def pandas_dtype(data_type):
+    """Name of the dtype pandas would give a column of this Arrow type."""
+    if pa.types.is_dictionary(data_type):
+        data_type = data_type.value_type
+    if is_text(data_type):
+        return _STRING_DTYPE
+    try:
+        dtype = data_type.to_pandas_dtype()
+    except NotImplementedError:
+        return str(data_type)
+    return str(dtype if isinstance(dtype, pd.api.extensions.ExtensionDtype) else np.dtype(dtype))
+
+
+def nanoseconds(array):
+    """Return a timestamp/date array as int64 epoch nanoseconds; nulls become NaT.
+
+    Nanosecond timestamps without nulls are viewed, not copied.
+    """
+    data_type = array.type
+    if pa.types.is_date(data_type) or (
+        pa.types.is_timestamp(data_type) and data_type.unit != "ns"
+    ):
+        array = pc.cast(array, pa.timestamp("ns", getattr(data_type, "tz", None)))
+    array = array.view(pa.int64())
+    if array.null_count:
+        array = pc.fill_null(array, NAT)
+    return array.to_numpy()
+
+
+def numeric(array):
+    """Return a numeric array as NumPy; nulls become NaN.
+
+    Integer and float columns without nulls are zero-copy, read-only views.
+    """
+    if pa.types.is_decimal(array.type):
+        array = pc.cast(array, pa.float64())
+    if pa.types.is_boolean(array.type):
+        return array.to_numpy(zero_copy_only=False).astype(np.float64)
+    return array.to_numpy(zero_copy_only=False)
+
+
+def text(array):
+    """Return a column as an Arrow string array, casting other types to text."""
+    if pa.types.is_large_string(array.type) or pa.types.is_string(array.type):
+        return array
+    return pc.cast(array, pa.string())
+
+
+def from_numpy(kind, values, data_type=None):
+    """Build an Arrow array from a Workspace-style NumPy array.
+
+    NaN (numeric) and NaT (datetime) become nulls; numeric buffers are
+    wrapped rather than copied where Arrow allows it.
+    """
+    if kind == "datetime":
+        return pa.array(values, mask=values == NAT).view(pa.timestamp("ns"))
+    if kind == "numeric":
+        return pa.array(values, from_pandas=True)
+    try:
+        return pa.array(values, type=data_type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(values, from_pandas=True)
@@ -0,0 +1,238 @@
+"""
+The ``datamender`` command line: one entry point for every stage.
+
+::
+
+    python -m datamender profile trips.csv -o profile.json
+    python -m datamender fix trips.csv rules.yaml -o clean.parquet --schema
+    python -m datamender pipeline job.yaml
+
+Each subcommand is the ``main`` of one module, imported only when that
+subcommand runs, so ``--help`` or a mistyped command never pays for
+importing pandas and pyarrow. Compiled rule plans and CSV schemas are
+cached between invocations in ``$DATAMENDER_CACHE_DIR`` (default
+``~/.cache/datamender``; ``--no-cache`` turns the cache off).
+
+Schedulers that call the tool thousands of times on small files can start
+a long-lived worker that keeps the imports and caches warm::
+
+    python -m datamender serve --socket /tmp/datamender.sock --idle-timeout 600 &
+    python -m datamender --socket /tmp/datamender.sock fix small.csv rules.yaml -o out.parquet
+
+The worker runs the jobs sent to its socket one at a time, in the
+caller's working directory and with the caller's cache settings. A job's
+output comes back when it finishes, and the client exits with the job's
+exit status. If no worker is listening, the client runs the job itself.
+"""
+
+import argparse
+import importlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+from datamender import __version__
+from datamender.cache import CACHE_DIR_ENV
+
+# Subcommand → (module whose main runs it, help, arguments put before the user's).
+COMMANDS = {
+    "profile": ("profiler", "profile a CSV/Parquet file", ()),
+    "discover": ("discovery", "suggest cleaning rules from a profile", ()),
+    "preview": ("preview", "preview how many rows each rule would affect", ()),
+    "validate": ("constraints", "check cross-column constraints", ()),
+    "fix": ("fixer", "apply accepted rules to a file", ()),
+    "run": ("runlog", "clean a file with checkpoints, resuming an interrupted run", ("run",)),
+    "status": ("runlog", "show the progress of a checkpointed run", ("status",)),
+    "rollback": ("runlog", "undo one rule of a checkpointed run", ("rollback",)),
+    "diff": ("runlog", "export the cells changed by a checkpointed run", ("diff",)),
+    "dedup": ("dedup", "remove duplicate rows", ()),
+    "pipeline": ("pipeline", "run profile/validate/fix/export in one scan", ()),
+    "trace": ("trace", "summarise a run trace", ()),
+    "synth": ("synth", "generate messy trip data", ()),
+    "bench": ("benchmark", "benchmark every stage", ()),
+    "models": ("llm", "serve offline stub models over HTTP", ()),
+}
+
+# Modules a worker imports before it accepts jobs.
+WARM_MODULES = ("profiler", "fixer", "constraints", "preview", "dedup", "runlog", "pipeline")
+
+SOCKET_ENV = "DATAMENDER_SOCKET"
+
+
+def default_cache_dir():
+    """``$XDG_CACHE_HOME/datamender``, or ``~/.cache/datamender``."""
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "datamender")
+
+
+def run_command(command, argv):
+    """Run one subcommand in this process; returns its exit status."""
+    module, _, leading = COMMANDS[command]
+    main = importlib.import_module(f"datamender.{module}").main
+    program = sys.argv[0]
+    sys.argv[0] = "datamender" if leading else f"datamender {command}"
+    try:
+        main([*leading, *argv])
+    except SystemExit as exit:
+        return _status(exit.code)
+    finally:
+        sys.argv[0] = program
+    return 0
+
+
+def submit(path, command, argv):
+    """Send a job to the worker listening on ``path``; returns its response.
+
+    Raises FileNotFoundError or ConnectionRefusedError if no worker is listening.
+    """
+    request = {"command": command, "args": list(argv), "cwd": os.getcwd(),
+               "cache_dir": os.environ.get(CACHE_DIR_ENV)}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError(f"The worker on {path} closed the connection")
+    return json.loads(line)
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        response = _run_job(json.loads(self.rfile.readline()))
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _WorkerServer(socketserver.UnixStreamServer):
+    idle = False
+
+    def handle_timeout(self):
+        self.idle = True
+
+
+def _run_job(request):
+    started = time.perf_counter()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    directory = os.getcwd()
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    status = 1
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                os.chdir(request.get("cwd") or directory)
+                _set_cache_dir(request.get("cache_dir"))
+                if request.get("command") not in COMMANDS:
+                    print(f"datamender: unknown command {request.get('command')!r}",
+                          file=sys.stderr)
+                    status = 2
+                else:
+                    status = run_command(request["command"], request.get("args", []))
+            except Exception:
+                traceback.print_exc()
+    finally:
+        os.chdir(directory)
+        _set_cache_dir(cache_dir)
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue(),
+            "seconds": round(time.perf_counter() - started, 6)}
+
+
+def _set_cache_dir(directory):
+    if directory:
+        os.environ[CACHE_DIR_ENV] = directory
+    else:
+        os.environ.pop(CACHE_DIR_ENV, None)
+
+
+def serve(path, idle_timeout=None):
+    """Run jobs sent to the Unix socket ``path`` until idle for ``idle_timeout`` seconds."""
+    for module in WARM_MODULES:
+        importlib.import_module(f"datamender.{module}")
+    if os.path.exists(path):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise SystemExit(f"datamender: a worker is already listening on {path}")
+    umask = os.umask(0o177)
+    try:
+        server = _WorkerServer(path, _JobHandler)
+    finally:
+        os.umask(umask)
+    server.timeout = idle_timeout
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"✅ Worker listening on {path} (pid {os.getpid()})", flush=True)
+    try:
+        with server:
+            while not server.idle:
+                server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.unlink(path)
+
+
+def _status(code):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def main(argv=None):
+    """Dispatch ``datamender <command> ...`` to the module that implements it."""
+    commands = "\n".join(f"  {name:<10}{text}" for name, (_, text, _) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="datamender", description="Smart cleaning for large CSV/Parquet files.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"commands:\n{commands}\n  {'serve':<10}run jobs sent to --socket in a warm "
+               f"worker\n\nRun 'datamender <command> --help' for the options of a command.")
+    parser.add_argument("--version", action="version", version=f"datamender {__version__}")
+    parser.add_argument("--socket", default=os.environ.get(SOCKET_ENV),
+                        help=f"send the job to the worker on this Unix socket, or run it here "
+                             f"if none is listening (default: ${SOCKET_ENV})")
+    parser.add_argument("--cache-dir", help=f"rule plan and schema cache (default: "
+                                            f"${CACHE_DIR_ENV} or {default_cache_dir()})")
+    parser.add_argument("--no-cache", action="store_true", help="do not cache plans and schemas")
+    parser.add_argument("command", choices=[*COMMANDS, "serve"], metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments of the command")
+    args = parser.parse_args(argv)
+
+    _set_cache_dir(None if args.no_cache else
+                   args.cache_dir or os.environ.get(CACHE_DIR_ENV) or default_cache_dir())
+
+    if args.command == "serve":
+        options = argparse.ArgumentParser(prog="datamender serve",
+                                          description="Run jobs in a warm worker process.")
+        options.add_argument("--socket", default=args.socket, required=args.socket is None,
+                             help="Unix socket to listen on")
+        options.add_argument("--idle-timeout", type=float,
+                             help="exit after this many seconds without a job")
+        options = options.parse_args(args.args)
+        serve(options.socket, options.idle_timeout)
+        return
+
+    if args.socket:
+        try:
+            response = submit(args.socket, args.command, args.args)
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass
+        else:
+            sys.stdout.write(response["stdout"])
+            sys.stderr.write(response["stderr"])
+            sys.exit(response["status"])
+    sys.exit(run_command(args.command, args.args))
+
+
+if __name__ == "__main__":
+    main()
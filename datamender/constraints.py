@@ -0,0 +1,530 @@
+"""
+Cross-column constraints checked in one streaming pass (plan.md, Week 5).
+
+Constraints sit next to the cleaning rules, under a top-level
+``constraints`` list of the same YAML file::
+
+    constraints:
+      - check: fd                # functional dependency: zone -> borough
+        columns: [pickup_zone]
+        dependent: [pickup_borough]
+      - check: unique
+        columns: [trip_id]
+      - check: monotonic         # per vendor, pickups never go back in time
+        column: pickup_datetime
+        group_by: [vendor_id]
+      - check: order             # row-local: pickup <= dropoff
+        column: pickup_datetime
+        other: dropoff_datetime
+
+Checks that need grouping never hold the file in memory. Every chunk is
+reduced to a small hash index (one entry per distinct key in the chunk,
+built with hash tables rather than sorting); the indexes are spilled to
+on-disk partitions by :class:`~datamender.dedup.HashPartitioner` and each
+partition is merged on its own. Results carry violation counts and sample
+row ids (data rows counted from 0)::
+
+    python -m datamender.constraints trips.csv rules.yaml -o constraints.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from datamender.dedup import DEFAULT_PARTITIONS, NULL_HASH, HashPartitioner, cell_hashes, mix, \
+    row_keys
+from datamender.fixer import Workspace
+from datamender.io import DEFAULT_CHUNKSIZE, iter_batches
+from datamender.rules import RuleError
+from datamender.trace import NULL_TRACER, add_trace_arguments, save_trace, tracer_from_args
+
+CONSTRAINTS = ("fd", "unique", "monotonic", "order")
+DEFAULT_SAMPLES = 10
+
+_FIELD_ORDER = ("id", "check", "columns", "dependent", "column", "other", "group_by",
+                "decreasing", "strict")
+
+
+@dataclass
+class Constraint:
+    """One validated cross-column constraint."""
+
+    check: str
+    columns: tuple = ()
+    dependent: tuple = ()
+    column: str = None
+    other: str = None
+    group_by: tuple = ()
+    decreasing: bool = False
+    strict: bool = False
+    id: str = None
+
+    def __post_init__(self):
+        if self.check not in CONSTRAINTS:
+            raise RuleError(f"Unknown constraint {self.check!r}; expected one of {list(CONSTRAINTS)}")
+        self.columns, self.dependent, self.group_by = (
+            _names(self.columns), _names(self.dependent), _names(self.group_by))
+        if self.check in ("fd", "unique") and not self.columns:
+            raise RuleError(f"{self.check!r} constraint needs 'columns'")
+        if self.check == "fd" and not self.dependent:
+            raise RuleError(f"FD constraint on {list(self.columns)} needs 'dependent' columns")
+        if self.check in ("monotonic", "order") and not self.column:
+            raise RuleError(f"{self.check!r} constraint needs a 'column'")
+        if self.check == "order" and not self.other:
+            raise RuleError(f"Order constraint on {self.column!r} needs an 'other' column")
+        if self.id is None:
+            if self.check == "fd":
+                self.id = f"{'+'.join(self.columns)}->{'+'.join(self.dependent)}.fd"
+            elif self.check == "unique":
+                self.id = f"{'+'.join(self.columns)}.unique"
+            elif self.group_by:
+                self.id = f"{self.column}.monotonic_by.{'+'.join(self.group_by)}"
+            else:
+                self.id = f"{self.column}.{self.check}"
+
+    @property
+    def names(self):
+        """Every column the constraint reads."""
+        return (*self.columns, *self.dependent, *(self.column, self.other), *self.group_by)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        if "check" not in data:
+            raise RuleError(f"Constraint needs a 'check': {data}")
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise RuleError(f"Unknown constraint fields {sorted(unknown)}: {data}")
+        return cls(**data)
+
+    def to_dict(self):
+        data = {}
+        for key in _FIELD_ORDER:
+            value = getattr(self, key)
+            if value not in (None, (), False):
+                data[key] = list(value) if isinstance(value, tuple) else value
+        return data
+
+
+def _names(value):
+    if value is None:
+        return ()
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+def load_constraints(path):
+    """Load the ``constraints`` list of a rules YAML file."""
+    with open(path) as f:
+        document = yaml.safe_load(f) or {}
+    return parse_constraints(document)
+
+
+def parse_constraints(document):
+    """Build Constraint objects from a parsed YAML/JSON document."""
+    entries = document.get("constraints", []) if isinstance(document, dict) else document
+    constraints = [Constraint.from_dict(entry) for entry in entries or []]
+    seen = set()
+    for constraint in constraints:
+        if constraint.id in seen:
+            raise RuleError(f"Duplicate constraint id {constraint.id!r}")
+        seen.add(constraint.id)
+    return constraints
+
+
+@dataclass
+class ConstraintResult:
+    """Outcome of one constraint over the whole file.
+
+    ``sample`` lists up to ``samples`` violations, each as (at most
+    ``samples`` of) the row ids involved: the rows sharing a key (unique), the first row of each
+    conflicting dependent value (fd), the previous and offending row of a
+    group (monotonic) or the offending row (order).
+    """
+
+    id: str
+    check: str
+    rows: int = 0
+    violations: int = 0
+    groups: int = 0
+    sample: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self):
+        return self.violations == 0
+
+    def to_dict(self):
+        return {"id": self.id, "check": self.check, "rows": self.rows,
+                "violations": self.violations, "groups": self.groups,
+                "sample_rows": self.sample, "seconds": round(self.seconds, 6)}
+
+
+def _first(codes, rows, groups):
+    """Smallest row id per code (``-1`` for codes without rows)."""
+    first = np.full(groups, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, codes, rows)
+    first[first == np.iinfo(np.int64).max] = -1
+    return first
+
+
+def _previous_in_group(codes):
+    """Position of the previous element with the same code, or -1 for a group's first.
+
+    Values are compared in their own dtype; ``groupby().shift()`` would turn
+    int64 nanoseconds into float64 and merge timestamps less than ~256 ns apart.
+    """
+    order = np.argsort(codes, kind="stable")
+    same = codes[order[1:]] == codes[order[:-1]]
+    previous = np.full(len(codes), -1, dtype=np.int64)
+    previous[order[1:][same]] = order[:-1][same]
+    return previous
+
+
+def _keep_earliest(sample, limit):
+    """The ``limit`` earliest violations, each cut to its first ``limit`` rows."""
+    return [rows[:limit] for rows in sorted(sample, key=lambda rows: rows[0])[:limit]]
+
+
+class _UniqueCheck:
+    """Rows whose key columns repeat; rows with a null key cell are skipped."""
+
+    RECORD = np.dtype([("key", "<u8"), ("first", "<i8"), ("second", "<i8"), ("count", "<i8")])
+
+    def __init__(self, constraint, directory, partitions, samples):
+        self.result = ConstraintResult(constraint.id, constraint.check)
+        self.constraint = constraint
+        self.partitioner = HashPartitioner(self.RECORD, partitions, directory)
+        self.samples = samples
+
+    def update(self, chunk, work, rows):
+        (hashes,) = cell_hashes(chunk, self.constraint.columns)
+        valid = np.logical_and.reduce([hashed != NULL_HASH for hashed in hashes])
+        self.result.rows += int(valid.sum())
+        keys, rows = row_keys(hashes, 1, len(chunk))[valid], rows[valid]
+        codes, uniques = pd.factorize(keys)
+        first = _first(codes, rows, len(uniques))
+        later = rows != first[codes]
+        records = np.empty(len(uniques), dtype=self.RECORD)
+        records["key"], records["first"] = uniques, first
+        records["second"] = _first(codes[later], rows[later], len(uniques))
+        records["count"] = np.bincount(codes, minlength=len(uniques))
+        self.partitioner.add(records)
+
+    def finish(self):
+        for part in self.partitioner:
+            codes, uniques = pd.factorize(part["key"])
+            total = np.bincount(codes, weights=part["count"], minlength=len(uniques)).astype(np.int64)
+            repeated = total > 1
+            self.result.violations += int((total[repeated] - 1).sum())
+            self.result.groups += int(repeated.sum())
+            chosen = {}
+            for code, first, second in zip(codes.tolist(), part["first"].tolist(),
+                                           part["second"].tolist()):
+                if repeated[code] and (code in chosen or len(chosen) < self.samples):
+                    chosen.setdefault(code, []).extend(row for row in (first, second) if row >= 0)
+            self.result.sample = _keep_earliest(
+                self.result.sample + [sorted(rows) for rows in chosen.values()], self.samples)
+        self.partitioner.close()
+        return self.result
+
+
+class _FDCheck:
+    """Determinant values mapped to more than one dependent value.
+
+    A violation is a row that disagrees with the most common dependent
+    value of its determinant (the rows a repair would have to change).
+    """
+
+    RECORD = np.dtype([("key", "<u8"), ("dependent", "<u8"), ("first", "<i8"), ("count", "<i8")])
+
+    def __init__(self, constraint, directory, partitions, samples):
+        self.result = ConstraintResult(constraint.id, constraint.check)
+        self.constraint = constraint
+        self.partitioner = HashPartitioner(self.RECORD, partitions, directory)
+        self.samples = samples
+
+    def update(self, chunk, work, rows):
+        (determinant,) = cell_hashes(chunk, self.constraint.columns)
+        (dependent,) = cell_hashes(chunk, self.constraint.dependent)
+        valid = np.logical_and.reduce([hashed != NULL_HASH for hashed in determinant])
+        self.result.rows += int(valid.sum())
+        keys = row_keys(determinant, 1, len(chunk))[valid]
+        values = row_keys(dependent, 2, len(chunk))[valid]
+        self.partitioner.add(self._index(keys, values, rows[valid], np.ones(len(keys), np.int64)))
+
+    def _index(self, keys, values, first, counts):
+        """Collapse (determinant, dependent) pairs to one record each."""
+        codes, uniques = pd.factorize(mix(keys ^ mix(values)))
+        records = np.empty(len(uniques), dtype=self.RECORD)
+        position = np.zeros(len(uniques), dtype=np.int64)
+        position[codes] = np.arange(len(codes))
+        records["key"], records["dependent"] = keys[position], values[position]
+        records["first"] = _first(codes, first, len(uniques))
+        records["count"] = np.bincount(codes, weights=counts, minlength=len(uniques))
+        return records
+
+    def finish(self):
+        for part in self.partitioner:
+            pairs = self._index(part["key"], part["dependent"], part["first"], part["count"])
+            codes, uniques = pd.factorize(pairs["key"])
+            distinct = np.bincount(codes, minlength=len(uniques))
+            total = np.bincount(codes, weights=pairs["count"], minlength=len(uniques))
+            most = np.zeros(len(uniques), dtype=np.int64)
+            np.maximum.at(most, codes, pairs["count"])
+            conflicting = distinct > 1
+            self.result.violations += int((total[conflicting] - most[conflicting]).sum())
+            self.result.groups += int(conflicting.sum())
+            chosen = {}
+            for code, first in zip(codes.tolist(), pairs["first"].tolist()):
+                if conflicting[code] and (code in chosen or len(chosen) < self.samples):
+                    chosen.setdefault(code, []).append(first)
+            self.result.sample = _keep_earliest(
+                self.result.sample + [sorted(rows) for rows in chosen.values()], self.samples)
+        self.partitioner.close()
+        return self.result
+
+
+class _MonotonicCheck:
+    """A column that must not decrease (or increase) within each group, in file order.
+
+    Inside a chunk each row is compared with the previous row of its group;
+    the chunk's index keeps only each group's first and last value, and
+    chunk boundaries are checked when the partitions are merged.
+    """
+
+    def __init__(self, constraint, directory, partitions, samples):
+        self.result = ConstraintResult(constraint.id, constraint.check)
+        self.constraint = constraint
+        self.directory, self.partitions = directory, partitions
+        self.partitioner = None
+        self.samples = samples
+
+    def _violates(self, previous, current):
+        if self.constraint.decreasing:
+            return current >= previous if self.constraint.strict else current > previous
+        return current <= previous if self.constraint.strict else current < previous
+
+    def update(self, chunk, work, rows):
+        kind, values = work.orderable(self.constraint.column)
+        if self.partitioner is None:
+            value_type = "<i8" if kind == "datetime" else "<f8"
+            record = np.dtype([("key", "<u8"), ("first_value", value_type),
+                               ("last_value", value_type), ("first", "<i8"), ("last", "<i8"),
+                               ("violations", "<i8")])
+            self.partitioner = HashPartitioner(record, self.partitions, self.directory)
+        valid = ~work.nulls(self.constraint.column)
+        if self.constraint.group_by:
+            (hashes,) = cell_hashes(chunk, self.constraint.group_by)
+            keys = row_keys(hashes, 1, len(chunk))[valid]
+        else:
+            keys = np.zeros(int(valid.sum()), dtype=np.uint64)
+        values, rows = values[valid], rows[valid]
+        self.result.rows += len(rows)
+        codes, uniques = pd.factorize(keys)
+        grouped = pd.DataFrame({"value": values, "row": rows}).groupby(codes, sort=False)
+        previous = _previous_in_group(codes)
+        bad = (previous >= 0) & self._violates(values[previous], values)
+        self._record(rows[previous[bad]], rows[bad])
+
+        ends = grouped.agg(first_value=("value", "first"), last_value=("value", "last"),
+                           first=("row", "first"), last=("row", "last"))
+        records = np.empty(len(ends), dtype=self.partitioner.dtype)
+        records["key"] = uniques[ends.index.to_numpy()]
+        for name in ("first_value", "last_value", "first", "last"):
+            records[name] = ends[name].to_numpy()
+        records["violations"] = np.bincount(codes[bad], minlength=len(uniques))[ends.index]
+        self.partitioner.add(records)
+
+    def _record(self, previous, rows):
+        self.result.violations += len(rows)
+        room = self.samples - len(self.result.sample)
+        self.result.sample += [[int(before), int(row)] for before, row in
+                               zip(previous[:room], rows[:room])]
+
+    def finish(self):
+        if self.partitioner is None:
+            return self.result
+        # Records reach each partition in chunk order, so a group's previous
+        # record is the one from the chunk before.
+        for part in self.partitioner:
+            codes, _ = pd.factorize(part["key"])
+            previous = _previous_in_group(codes)
+            bad = (previous >= 0) & self._violates(part["last_value"][previous],
+                                                   part["first_value"])
+            self._record(part["last"][previous[bad]], part["first"][bad])
+            per_group = np.bincount(codes, weights=part["violations"] + bad)
+            self.result.groups += int((per_group > 0).sum())
+        self.result.sample = _keep_earliest(self.result.sample, self.samples)
+        self.partitioner.close()
+        return self.result
+
+
+class _OrderCheck:
+    """Row-local ordering of two columns (``column <= other``; ``<`` when strict)."""
+
+    def __init__(self, constraint, directory, partitions, samples):
+        self.result = ConstraintResult(constraint.id, constraint.check)
+        self.constraint = constraint
+        self.samples = samples
+
+    def update(self, chunk, work, rows):
+        first_kind, first = work.orderable(self.constraint.column)
+        second_kind, second = work.orderable(self.constraint.other)
+        if first_kind != second_kind:
+            raise RuleError(f"Columns {self.constraint.column!r} and {self.constraint.other!r} "
+                            f"are not comparable ({first_kind} vs {second_kind})")
+        valid = ~(work.nulls(self.constraint.column) | work.nulls(self.constraint.other))
+        bad = valid & ((first >= second) if self.constraint.strict else (first > second))
+        self.result.rows += int(valid.sum())
+        self.result.violations += int(bad.sum())
+        room = self.samples - len(self.result.sample)
+        self.result.sample += [[int(row)] for row in rows[bad][:room]]
+
+    def finish(self):
+        return self.result
+
+
+CHECKERS = {"fd": _FDCheck, "unique": _UniqueCheck, "monotonic": _MonotonicCheck,
+            "order": _OrderCheck}
+
+
+def constraint_columns(constraints):
+    """Every column some of ``constraints`` reads, in first-use order."""
+    return list(dict.fromkeys(name for constraint in constraints
+                              for name in constraint.names if name is not None))
+
+
+class ConstraintSuite:
+    """Streaming state of a list of constraints checked in one pass.
+
+    Feed every chunk of the data to :meth:`update` in order, then call
+    :meth:`finish` for the results. Spill files go to a temporary directory
+    under ``workdir`` that is removed on :meth:`close` (or when the suite
+    is used as a context manager).
+    """
+
+    def __init__(self, constraints, partitions=DEFAULT_PARTITIONS, samples=DEFAULT_SAMPLES,
+                 workdir=None, tracer=None):
+        self.constraints = list(constraints)
+        self.tracer = tracer or NULL_TRACER
+        self.scratch = tempfile.mkdtemp(prefix="datamender-constraints-", dir=workdir)
+        self.checkers = [CHECKERS[constraint.check](constraint, os.path.join(self.scratch, str(i)),
+                                                    partitions, samples)
+                         for i, constraint in enumerate(self.constraints)]
+        self.seconds = [0.0] * len(self.checkers)
+        self.rows = 0
+
+    def update(self, chunk):
+        """Feed the next chunk (a :class:`~datamender.chunk.Chunk`)."""
+        if self.rows == 0:
+            for constraint in self.constraints:
+                missing = [name for name in constraint.names
+                           if name is not None and name not in chunk.columns]
+                if missing:
+                    raise RuleError(f"Constraint {constraint.id!r}: columns {missing} "
+                                    f"are not in the input")
+        rows = np.arange(self.rows, self.rows + len(chunk), dtype=np.int64)
+        self.rows += len(chunk)
+        work = Workspace(chunk)
+        for i, (constraint, checker) in enumerate(zip(self.constraints, self.checkers)):
+            started = time.perf_counter()
+            checker.update(chunk, work, rows)
+            elapsed = time.perf_counter() - started
+            self.seconds[i] += elapsed
+            self.tracer.record(constraint.id, started, elapsed, "constraint", rows=len(chunk))
+
+    def finish(self):
+        """Merge the spilled state; returns one ConstraintResult per constraint."""
+        results = []
+        for constraint, checker, elapsed in zip(self.constraints, self.checkers, self.seconds):
+            started = time.perf_counter()
+            result = checker.finish()
+            merged = time.perf_counter() - started
+            result.seconds = elapsed + merged
+            self.tracer.record(constraint.id, started, merged, "constraint")
+            results.append(result)
+        return results
+
+    def close(self):
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def check_constraints(path, constraints, chunksize=DEFAULT_CHUNKSIZE,
+                      partitions=DEFAULT_PARTITIONS, samples=DEFAULT_SAMPLES, workdir=None,
+                      tracer=None):
+    """Check every constraint in one streaming pass; returns ConstraintResults.
+
+    ``constraints`` may be a list of :class:`Constraint` or a path to a
+    rules YAML file. Spill files go to a temporary directory under
+    ``workdir`` and are removed afterwards. A
+    :class:`~datamender.trace.Tracer` gets the time of every constraint on
+    every chunk and of its final merge.
+    """
+    if isinstance(constraints, (str, os.PathLike)):
+        constraints = load_constraints(constraints)
+    tracer = tracer or NULL_TRACER
+    begun = time.perf_counter()
+    with ConstraintSuite(constraints, partitions, samples, workdir, tracer) as suite:
+        chunks = iter_batches(path, chunksize=chunksize)
+        while True:
+            tick = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            tracer.record("validate.read", tick, time.perf_counter() - tick, rows=len(chunk))
+            suite.update(chunk)
+        results = suite.finish()
+    tracer.record("validate", begun, time.perf_counter() - begun, rows=suite.rows,
+                  bytes_read=os.path.getsize(path))
+    return results
+
+
+def main(argv=None):
+    """Check the constraints of a rules YAML file against a CSV/Parquet file."""
+    parser = argparse.ArgumentParser(description="Check cross-column constraints.")
+    parser.add_argument("input", help="CSV, Parquet or Arrow file")
+    parser.add_argument("rules", help="rules YAML file with a 'constraints' list")
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help="sample violations kept per constraint")
+    parser.add_argument("--workdir", help="directory for spill files (default: temp)")
+    add_trace_arguments(parser)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    tracer = tracer_from_args(args)
+    results = check_constraints(args.input, args.rules, chunksize=args.chunksize,
+                                partitions=args.partitions, samples=args.samples,
+                                workdir=args.workdir, tracer=tracer)
+    print(f"✅ Checked {len(results)} constraints in {time.perf_counter() - started:.2f}s")
+    for result in results:
+        mark = "✅" if result.ok else "❌"
+        print(f"{mark} {result.id:<45} {result.violations:>10,} violations "
+              f"of {result.rows:,} rows")
+        if result.sample:
+            print(f"   sample rows: {result.sample[:3]}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([result.to_dict() for result in results], f, indent=2)
+        print(f"✅ Results → {args.output}")
+    save_trace(tracer, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+"""
+Out-of-core exact and near-duplicate record detection.
+
+Exact duplicates: every row (or only its key columns) is normalized and
+hashed to a 128-bit key. ``(key, row)`` records are spilled to on-disk
+hash partitions by :class:`HashPartitioner`; each partition is small enough
+to sort in memory, and rows sharing a key form a duplicate group whose
+first row is kept. Memory therefore depends on the chunk size and the
+partition size, never on the number of rows.
+
+Near duplicates: rows are MinHash-ed over their normalized cells, so two
+rows that differ in a few columns get similar signatures. LSH banding
+turns each signature into band keys that go through the same partitioner;
+only rows sharing a band bucket are compared, which keeps the work
+sub-quadratic. Candidates are verified against the signatures, which are
+kept in an on-disk memory map, and linked into clusters::
+
+    python -m datamender.dedup trips.csv -o deduped.csv --near --threshold 0.8
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+
+from datamender.chunk import NAT, column_kind, nanoseconds, numeric, text
+from datamender.io import DEFAULT_CHUNKSIZE, ChunkWriter, iter_batches
+
+DEFAULT_PARTITIONS = 256
+DEFAULT_BUFFER_BYTES = 16 * 1024 * 1024
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+# LSH bands aim at this fraction of the threshold, so pairs just above it
+# are rarely missed; verification drops the extra candidates.
+BAND_MARGIN = 0.9
+# Buckets larger than this are linked as a chain instead of all pairs.
+MAX_BUCKET = 256
+SAMPLE_GROUPS = 20
+VERIFY_BATCH = 250_000
+
+NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+# The first key is pandas' default; the second gives text cells an
+# independent hash, so two rows only match if both 64-bit keys agree.
+HASH_KEYS = ("0123456789123456", "datamender-dedup")
+
+ROW_RECORD = np.dtype([("key", "<u8"), ("check", "<u8"), ("row", "<i8")])
+BAND_RECORD = np.dtype([("key", "<u8"), ("row", "<i8")])
+PAIR_RECORD = np.dtype([("left", "<i8"), ("right", "<i8"), ("similarity", "<f4")])
+
+
+class HashPartitioner:
+    """Spill records to on-disk partitions chosen by the top bits of a 64-bit key.
+
+    ``dtype`` is a NumPy structured dtype with a ``uint64`` field called
+    ``key``. Records are buffered and appended to one file per partition;
+    iterating yields each partition as a structured array. Without a
+    ``directory`` a temporary one is created and removed on :meth:`close`.
+    """
+
+    def __init__(self, dtype, partitions=DEFAULT_PARTITIONS, directory=None,
+                 buffer_bytes=DEFAULT_BUFFER_BYTES):
+        if partitions & (partitions - 1):
+            raise ValueError("partitions must be a power of two")
+        self.dtype = np.dtype(dtype)
+        self.partitions = partitions
+        self._owned = directory is None
+        self.directory = tempfile.mkdtemp(prefix="datamender-") if directory is None else directory
+        os.makedirs(self.directory, exist_ok=True)
+        self.records = 0
+        self._shift = np.uint64(64 - max(1, partitions.bit_length() - 1))
+        self._buffer_records = max(1, buffer_bytes // self.dtype.itemsize)
+        self._pending = []
+        self._pending_records = 0
+
+    def path(self, partition):
+        return os.path.join(self.directory, f"part-{partition:05d}.bin")
+
+    def add(self, records):
+        """Queue a structured array of records; spills when the buffer is full."""
+        if len(records):
+            self._pending.append(records)
+            self._pending_records += len(records)
+            self.records += len(records)
+        if self._pending_records >= self._buffer_records:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        records = np.concatenate(self._pending)
+        self._pending, self._pending_records = [], 0
+        if self.partitions == 1:
+            targets = np.zeros(len(records), dtype=np.int64)
+        else:
+            targets = (records["key"] >> self._shift).astype(np.int64)
+        order = np.argsort(targets, kind="stable")
+        records, targets = records[order], targets[order]
+        bounds = np.searchsorted(targets, np.arange(self.partitions + 1))
+        for partition in np.flatnonzero(np.diff(bounds)):
+            with open(self.path(partition), "ab") as f:
+                records[bounds[partition]:bounds[partition + 1]].tofile(f)
+
+    def __iter__(self):
+        self.flush()
+        for partition in range(self.partitions):
+            path = self.path(partition)
+            if os.path.exists(path):
+                yield np.fromfile(path, dtype=self.dtype)
+
+    def close(self):
+        self._pending = []
+        if self._owned:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def mix(values):
+    """splitmix64 finalizer over uint64 values (arithmetic wraps)."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _salt(number):
+    # Scalar uint64 arithmetic warns on overflow; arrays wrap silently.
+    return mix(np.array([number], dtype=np.uint64))[0]
+
+
+def cell_hashes(chunk, columns, hash_keys=HASH_KEYS[:1]):
+    """Hash normalized cell values; returns, per hash key, one uint64 array per column.
+
+    Text is trimmed, lower-cased and has runs of whitespace collapsed;
+    integers, floats and booleans all hash as float64, so per-chunk dtype
+    drift in CSV input does not change a row's hash; nulls of any type hash
+    to ``NULL_HASH``. Hash keys only affect text (numbers are hashed
+    bijectively), and each distinct string is hashed once per key.
+    """
+    hashes = [[] for _ in hash_keys]
+    for name in columns:
+        array = chunk.array(name)
+        kind = column_kind(array.type)
+        if kind == "string":
+            encoded = pc.dictionary_encode(_normalize_text(text(array)))
+            codes = pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False)
+            uniques = encoded.dictionary.to_numpy(zero_copy_only=False)
+            for per_key, hash_key in zip(hashes, hash_keys):
+                hashed = np.append(pd.util.hash_array(uniques, hash_key=hash_key,
+                                                      categorize=False), NULL_HASH)
+                per_key.append(hashed[codes])
+            continue
+        if kind == "datetime":
+            values = nanoseconds(array)
+            valid = values != NAT
+        elif kind == "null":
+            values = np.zeros(len(array), dtype=np.uint64)
+            valid = np.zeros(len(array), dtype=bool)
+        else:
+            values = numeric(array).astype(np.float64) + 0.0  # folds -0.0 into 0.0
+            valid = ~np.isnan(values)
+        hashed = pd.util.hash_array(values)
+        hashed[~valid] = NULL_HASH
+        for per_key in hashes:
+            per_key.append(hashed)
+    return hashes
+
+
+def _normalize_text(array):
+    array = pc.utf8_lower(pc.utf8_trim_whitespace(array))
+    # The regex pass is slow, so only pay for it when some value needs it.
+    if any(pc.any(pc.match_substring(array, run)).as_py() for run in ("  ", "\t", "\n", "\r")):
+        array = pc.replace_substring_regex(array, r"\s+", " ")
+    return array
+
+
+def informative_columns(chunk):
+    """Columns with at least sqrt(rows) distinct values in ``chunk``.
+
+    Low-cardinality columns (flags, categories, small counts) make unrelated
+    rows look alike and would flood the LSH buckets, so near-duplicate
+    search ignores them unless they are asked for explicitly.
+    """
+    floor = max(2, int(len(chunk) ** 0.5))
+    return [name for name in chunk.columns
+            if pc.count_distinct(chunk.array(name)).as_py() >= floor] or list(chunk.columns)
+
+
+def row_keys(hashes, seed, rows):
+    """Combine per-column hashes into one order-sensitive 64-bit key per row."""
+    key = np.full(rows, _salt(seed), dtype=np.uint64)
+    for hashed in hashes:
+        key = mix(key ^ hashed)
+    return key
+
+
+class MinHasher:
+    """MinHash signatures over the cells of a row.
+
+    Each cell is a token salted with its column position, so equal values
+    in different columns do not match. Minima are kept as their top 16 bits
+    (b-bit MinHash), which makes signatures four times smaller at a bias of
+    1/65536 on the similarity estimate.
+    """
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._multipliers = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._offsets = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def signatures(self, hashes, rows):
+        """Return a ``(rows, num_perm)`` uint16 signature matrix."""
+        tokens = np.empty((rows, len(hashes)), dtype=np.uint64)
+        for position, hashed in enumerate(hashes):
+            tokens[:, position] = mix(hashed ^ _salt(position + 1))
+        signatures = np.empty((rows, self.num_perm), dtype=np.uint16)
+        for i in range(self.num_perm):
+            minima = (tokens * self._multipliers[i] + self._offsets[i]).min(axis=1)
+            signatures[:, i] = minima >> np.uint64(48)
+        return signatures
+
+
+def lsh_bands(threshold, num_perm=DEFAULT_NUM_PERM):
+    """Return ``(bands, rows_per_band)`` whose LSH S-curve midpoint is closest to ``threshold``."""
+    return min(((bands, num_perm // bands) for bands in range(1, num_perm + 1)),
+               key=lambda shape: abs((1 / shape[0]) ** (1 / shape[1]) - threshold))
+
+
+def band_keys(signatures, bands, rows_per_band):
+    """Yield one uint64 bucket key per row for every LSH band."""
+    rows = len(signatures)
+    for band in range(bands):
+        key = np.full(rows, _salt(band + 1), dtype=np.uint64)
+        for column in range(band * rows_per_band, (band + 1) * rows_per_band):
+            key = mix(key ^ signatures[:, column].astype(np.uint64))
+        yield key
+
+
+@dataclass
+class Duplicates:
+    """Result of :func:`find_duplicates`; row ids count data rows from 0."""
+
+    rows: int = 0
+    drop: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    groups: int = 0
+    sample: list = field(default_factory=list)
+    near_pairs: np.ndarray = None
+    near_clusters: list = None
+    candidates: int = 0
+    seconds: float = 0.0
+
+    def near_drop(self):
+        """Row ids to drop so each near-duplicate cluster keeps its first row."""
+        if not self.near_clusters:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([cluster[1:] for cluster in self.near_clusters]))
+
+    def to_dict(self):
+        summary = {
+            "rows": self.rows,
+            "exact_groups": self.groups,
+            "exact_duplicates": int(len(self.drop)),
+            "sample_groups": [group.tolist() for group in self.sample],
+            "seconds": round(self.seconds, 6),
+        }
+        if self.near_pairs is not None:
+            summary.update({
+                "candidate_pairs": self.candidates,
+                "near_pairs": int(len(self.near_pairs)),
+                "near_clusters": len(self.near_clusters),
+                "near_duplicates": int(sum(len(cluster) - 1 for cluster in self.near_clusters)),
+                "sample_clusters": [cluster.tolist() for cluster in
+                                    self.near_clusters[:SAMPLE_GROUPS]],
+            })
+        return summary
+
+
+def find_duplicates(path, columns=None, near=False, near_columns=None,
+                    threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                    chunksize=DEFAULT_CHUNKSIZE, partitions=DEFAULT_PARTITIONS, workdir=None):
+    """Find exact (and optionally near-) duplicate rows in one streaming pass.
+
+    ``columns`` are the key columns for exact matching (default: all).
+    With ``near=True`` rows whose estimated Jaccard similarity over the
+    cells of ``near_columns`` (default: :func:`informative_columns` of the
+    first chunk) is at least ``threshold`` are reported as near-duplicate
+    pairs and clusters; exact duplicates are left out of that search.
+    Spill files go to a temporary directory under ``workdir``.
+    """
+    started = time.perf_counter()
+    scratch = tempfile.mkdtemp(prefix="datamender-dedup-", dir=workdir)
+    try:
+        exact = HashPartitioner(ROW_RECORD, partitions, os.path.join(scratch, "rows"))
+        bands = band_partitioner = minhasher = None
+        if near:
+            bands = lsh_bands(threshold * BAND_MARGIN, num_perm)
+            band_partitioner = HashPartitioner(BAND_RECORD, partitions,
+                                               os.path.join(scratch, "bands"))
+            minhasher = MinHasher(num_perm)
+            signature_path = os.path.join(scratch, "signatures.bin")
+            signature_file = open(signature_path, "wb")
+
+        rows = 0
+        for chunk in iter_batches(path, chunksize=chunksize):
+            count = len(chunk)
+            ids = np.arange(rows, rows + count, dtype=np.int64)
+            key_columns = columns or chunk.columns
+            hashes, second = cell_hashes(chunk, key_columns, HASH_KEYS)
+            records = np.empty(count, dtype=ROW_RECORD)
+            records["key"] = row_keys(hashes, 1, count)
+            records["check"] = row_keys(second, 2, count)
+            records["row"] = ids
+            exact.add(records)
+            if near:
+                if near_columns is None:
+                    near_columns = informative_columns(chunk)
+                if list(near_columns) != list(key_columns):
+                    (hashes,) = cell_hashes(chunk, near_columns)
+                signatures = minhasher.signatures(hashes, count)
+                signatures.tofile(signature_file)
+                for key in band_keys(signatures, *bands):
+                    records = np.empty(count, dtype=BAND_RECORD)
+                    records["key"] = key
+                    records["row"] = ids
+                    band_partitioner.add(records)
+            rows += count
+
+        result = Duplicates(rows=rows)
+        drops = []
+        for partition in exact:
+            drop, groups, sample = _exact_groups(partition)
+            drops.append(drop)
+            result.groups += groups
+            result.sample.extend(sample[:SAMPLE_GROUPS - len(result.sample)])
+        result.drop = np.sort(np.concatenate(drops)) if drops else result.drop
+
+        if near:
+            signature_file.close()
+            signatures = np.memmap(signature_path, dtype=np.uint16, mode="r",
+                                   shape=(rows, num_perm)) if rows else np.empty((0, num_perm))
+            candidates = [_bucket_pairs(partition, result.drop) for partition in band_partitioner]
+            candidates = np.unique(np.concatenate(candidates)) if candidates else np.empty(0, np.int64)
+            result.candidates = int(len(candidates))
+            result.near_pairs = _verify(candidates, signatures, rows, threshold)
+            result.near_clusters = _clusters(result.near_pairs)
+            del signatures
+        result.seconds = time.perf_counter() - started
+        return result
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _exact_groups(partition):
+    """Return (rows to drop, group count, sample groups) for one partition."""
+    if not len(partition):
+        return np.empty(0, dtype=np.int64), 0, []
+    partition = partition[np.lexsort((partition["row"], partition["check"], partition["key"]))]
+    new = np.ones(len(partition), dtype=bool)
+    new[1:] = (partition["key"][1:] != partition["key"][:-1]) | (
+        partition["check"][1:] != partition["check"][:-1])
+    starts = np.flatnonzero(new)
+    sizes = np.diff(np.append(starts, len(partition)))
+    duplicated = sizes > 1
+    sample = [partition["row"][start:start + size]
+              for start, size in zip(starts[duplicated][:SAMPLE_GROUPS], sizes[duplicated])]
+    return partition["row"][~new], int(duplicated.sum()), sample
+
+
+def _bucket_pairs(partition, exclude):
+    """Candidate pairs (encoded ``left * 2**32 + right``) of rows sharing a band bucket."""
+    if len(exclude):
+        partition = partition[~_contains(exclude, partition["row"])]
+    if len(partition) < 2:
+        return np.empty(0, dtype=np.int64)
+    # Records reach a partition in row order, so a stable sort on the key
+    # leaves each bucket's rows ascending.
+    partition = partition[np.argsort(partition["key"], kind="stable")]
+    new = np.ones(len(partition), dtype=bool)
+    new[1:] = partition["key"][1:] != partition["key"][:-1]
+    group = np.cumsum(new) - 1
+    small = (np.bincount(group) <= MAX_BUCKET)[group]
+    rows = partition["row"]
+    # Members of a bucket are contiguous, so pairing every row with the next
+    # one links every bucket. Oversized buckets get only these neighbour
+    # links, which still connect the cluster without quadratic work.
+    linked = np.flatnonzero(group[1:] == group[:-1])
+    pairs = [rows[linked] * 2 ** 32 + rows[linked + 1]]
+    # Pairing the rows of small buckets with the one ``distance`` places
+    # later, for growing distances, enumerates the rest of their pairs; the
+    # loop ends after at most MAX_BUCKET passes.
+    group, rows = group[small], rows[small]
+    for distance in range(2, len(rows)):
+        left = np.arange(len(rows) - distance)
+        left = left[group[left] == group[left + distance]]
+        if not len(left):
+            break
+        pairs.append(rows[left] * 2 ** 32 + rows[left + distance])
+    return np.concatenate(pairs)
+
+
+def _contains(sorted_values, values):
+    positions = np.searchsorted(sorted_values, values)
+    positions[positions == len(sorted_values)] = 0
+    return sorted_values[positions] == values
+
+
+def _verify(candidates, signatures, rows, threshold):
+    """Estimate the similarity of candidate pairs and keep those above ``threshold``."""
+    kept = []
+    for offset in range(0, len(candidates), VERIFY_BATCH):
+        batch = candidates[offset:offset + VERIFY_BATCH]
+        left, right = batch >> 32, batch & (2 ** 32 - 1)
+        similarity = (np.asarray(signatures[left]) == np.asarray(signatures[right])).mean(axis=1)
+        keep = similarity >= threshold
+        pairs = np.empty(int(keep.sum()), dtype=PAIR_RECORD)
+        pairs["left"], pairs["right"] = left[keep], right[keep]
+        pairs["similarity"] = similarity[keep]
+        kept.append(pairs)
+    return np.concatenate(kept) if kept else np.empty(0, dtype=PAIR_RECORD)
+
+
+def _clusters(pairs):
+    """Connected components of the verified pairs, each sorted by row id."""
+    parent = {}
+
+    def root(row):
+        while parent.get(row, row) != row:
+            parent[row] = parent.get(parent[row], parent[row])
+            row = parent[row]
+        return row
+
+    for left, right in zip(pairs["left"].tolist(), pairs["right"].tolist()):
+        left, right = root(left), root(right)
+        if left != right:
+            parent[max(left, right)] = min(left, right)
+    members = {}
+    for row in set(parent) | set(parent.values()):
+        members.setdefault(root(row), []).append(row)
+    return sorted((np.array(sorted(group), dtype=np.int64) for group in members.values()),
+                  key=lambda group: group[0])
+
+
+def drop_rows(input_path, drop, output_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Copy a file, leaving out the (sorted) row ids in ``drop``; returns rows written."""
+    rows = 0
+    with ChunkWriter(output_path) as writer:
+        for chunk in iter_batches(input_path, chunksize=chunksize):
+            ids = np.arange(rows, rows + len(chunk), dtype=np.int64)
+            rows += len(chunk)
+            keep = ~_contains(drop, ids) if len(drop) else np.ones(len(ids), dtype=bool)
+            writer.write(chunk if keep.all() else chunk.filter(keep))
+        return writer.rows
+
+
+def dedup_file(input_path, output_path, columns=None, near=False, drop_near=False,
+               chunksize=DEFAULT_CHUNKSIZE, **options):
+    """Remove exact duplicates (and, with ``drop_near``, near-duplicates) from a file.
+
+    Returns ``(report, duplicates)``: the :meth:`Duplicates.to_dict` summary
+    plus the row counts of the written file, and the :class:`Duplicates`
+    themselves. Other keyword arguments go to :func:`find_duplicates`.
+    """
+    found = find_duplicates(input_path, columns=columns, near=near or drop_near,
+                            chunksize=chunksize, **options)
+    drop = found.drop
+    if drop_near:
+        drop = np.union1d(drop, found.near_drop())
+    started = time.perf_counter()
+    rows_out = drop_rows(input_path, drop, output_path, chunksize=chunksize)
+    report = found.to_dict()
+    report.update({"input": os.fspath(input_path), "output": os.fspath(output_path),
+                   "rows_out": rows_out, "rows_dropped": found.rows - rows_out,
+                   "write_seconds": round(time.perf_counter() - started, 6)})
+    return report, found
+
+
+def main(argv=None):
+    """Find and remove duplicate rows from the command line."""
+    parser = argparse.ArgumentParser(description="Remove duplicate rows from a large file.")
+    parser.add_argument("input", help="CSV, Parquet or Arrow file")
+    parser.add_argument("-o", "--output", help="write the de-duplicated file here")
+    parser.add_argument("--columns", nargs="+", help="key columns for exact matching")
+    parser.add_argument("--near", action="store_true", help="also look for near-duplicates")
+    parser.add_argument("--near-columns", nargs="+", help="columns compared for near-duplicates")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="minimum estimated Jaccard similarity of near-duplicates")
+    parser.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM)
+    parser.add_argument("--drop-near", action="store_true",
+                        help="keep only the first row of each near-duplicate cluster")
+    parser.add_argument("--pairs", help="write verified near-duplicate pairs to this CSV")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS)
+    parser.add_argument("--workdir", help="directory for spill files (default: temp)")
+    args = parser.parse_args(argv)
+
+    options = {"near_columns": args.near_columns, "threshold": args.threshold,
+               "num_perm": args.num_perm, "partitions": args.partitions, "workdir": args.workdir}
+    if args.output:
+        summary, found = dedup_file(args.input, args.output, columns=args.columns, near=args.near,
+                                    drop_near=args.drop_near, chunksize=args.chunksize, **options)
+    else:
+        found = find_duplicates(args.input, columns=args.columns,
+                                near=args.near or args.drop_near, chunksize=args.chunksize,
+                                **options)
+        summary = found.to_dict()
+    print(f"✅ {summary['rows']:,} rows: {summary['exact_duplicates']:,} exact duplicates "
+          f"in {summary['exact_groups']:,} groups ({summary['seconds']:.2f}s)")
+    if found.near_pairs is not None:
+        print(f"   {summary['near_pairs']:,} near-duplicate pairs in {summary['near_clusters']:,} "
+              f"clusters from {summary['candidate_pairs']:,} candidates")
+        if args.pairs:
+            pd.DataFrame(found.near_pairs).to_csv(args.pairs, index=False)
+            print(f"✅ Near-duplicate pairs → {args.pairs}")
+    if args.output:
+        print(f"✅ {summary['rows_out']:,} rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
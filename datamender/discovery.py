@@ -0,0 +1,343 @@
+"""
+Rule discovery: ask language models to suggest cleaning rules per column.
+
+Each column summary from the profile is rendered into a prompt and sent to
+every configured model. Answers are parsed into ``suggested`` rules, merged
+across models and written as a rules YAML file for human review::
+
+    python -m datamender.discovery profile.json -o suggestions.yaml --cache-dir .cache
+
+With a :class:`~datamender.cache.SuggestionCache`, columns whose profile has
+not (meaningfully) changed since the last run are answered from disk
+instead of calling the model again.
+
+All column/model requests are issued at once on an asyncio event loop,
+bounded by a semaphore, with a per-call timeout and retries with
+exponential backoff. Cross-model agreement is re-scored as each answer
+arrives, so wall-clock time is close to the slowest single call rather
+than the sum of all calls.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from string import Template
+
+from datamender.cache import SuggestionCache
+from datamender.llm import PROFILE_MARKER, FakeModelServer, ModelError, StubModel
+from datamender.profiler import load_profile
+from datamender.rules import CHECKS, Rule, RuleError, save_rules
+from datamender.sampling import compact_column, estimate_tokens
+from datamender.trace import NULL_TRACER, add_trace_arguments, save_trace, tracer_from_args
+
+PROMPT_TEMPLATE = Template(
+    "You are a data-quality assistant. Suggest cleaning rules for one column\n"
+    "of a tabular dataset, based on its profile. Guess valid ranges, whether\n"
+    "values must be non-negative or present, and which action fits best.\n"
+    "Answer with a JSON list of objects with the keys check (range,\n"
+    "non_negative, not_null), action, min, max, value, confidence (0-1)\n"
+    "and reason.\n"
+    "COLUMN: $column\n"
+    f"{PROFILE_MARKER} $profile\n"
+)
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 0.5
+
+# Column-name pairs whose datetimes must be ordered (first <= second).
+ORDER_PAIRS = (("pickup", "dropoff"), ("start", "end"), ("begin", "end"), ("departure", "arrival"))
+
+
+def render_prompt(column, summary, template=PROMPT_TEMPLATE):
+    """Fill the prompt template for one column."""
+    profile = json.dumps(compact_column(summary, level=1), separators=(",", ":"), default=str)
+    return template.substitute(column=column, profile=profile)
+
+
+def parse_suggestions(response, column, source):
+    """Turn a model's raw answer into ``suggested`` Rule objects.
+
+    Models wrap JSON in prose or code fences and sometimes invent checks;
+    anything that does not validate as a rule is skipped.
+    """
+    match = re.search(r"\[.*\]", response, re.S)
+    try:
+        entries = json.loads(match.group(0)) if match else []
+    except ValueError:
+        return []
+    rules = []
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or entry.get("check") not in CHECKS:
+            continue
+        entry = dict(entry, column=column, status="suggested")
+        entry.pop("id", None)
+        entry.setdefault("confidence", 0.5)
+        entry["sources"] = [source]
+        try:
+            rules.append(Rule.from_dict(entry))
+        except (RuleError, TypeError):
+            continue
+    return rules
+
+
+def universal_checks(profile):
+    """Cheap, model-free suggestions that hold for almost any dataset."""
+    columns = profile.get("columns", {})
+    rules = []
+    for name, summary in columns.items():
+        if summary.get("kind") == "datetime":
+            for first, second in ORDER_PAIRS:
+                other = name.replace(first, second)
+                if first in name and other in columns and columns[other].get("kind") == "datetime":
+                    rules.append(Rule("order", name, "swap", other=other, status="suggested",
+                                      extra={"confidence": 0.8, "sources": ["heuristic"],
+                                             "reason": f"{name} should not be after {other}"}))
+    return rules
+
+
+def merge_suggestions(rules, models=1):
+    """Collapse duplicate suggestions from several sources into one rule each.
+
+    Bounds are averaged, the most common action and fill value win, and the
+    confidence is the mean model confidence scaled by cross-model agreement
+    (the share of models that proposed the rule; heuristics do not vote).
+    """
+    groups = {}
+    for rule in rules:
+        groups.setdefault((rule.column, rule.check, rule.other), []).append(rule)
+    merged = []
+    for (column, check, other), group in groups.items():
+        sources = sorted({source for rule in group for source in rule.extra.get("sources", [])})
+        confidence = sum(float(rule.extra.get("confidence", 0.5)) for rule in group) / len(group)
+        voters = [source for source in sources if source != "heuristic"]
+        agreement = min(1.0, len(voters) / max(1, models)) if voters else 1.0
+        extra = {"confidence": round(confidence * agreement, 3), "agreement": round(agreement, 3),
+                 "sources": sources}
+        reasons = [rule.extra["reason"] for rule in group if rule.extra.get("reason")]
+        if reasons:
+            extra["reason"] = reasons[0]
+        merged.append(Rule(
+            check, column, _most_common(rule.action for rule in group), other=other,
+            min=_mean(rule.min for rule in group), max=_mean(rule.max for rule in group),
+            value=_most_common(rule.value for rule in group), status="suggested", extra=extra,
+        ))
+    return merged
+
+
+@dataclass
+class CallResult:
+    """Outcome of asking one model about one column."""
+
+    column: str
+    model: str
+    rules: list = field(default_factory=list)
+    seconds: float = 0.0
+    attempts: int = 0
+    cached: bool = False
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class AgreementScorer:
+    """Cross-model agreement, re-scored as answers stream in.
+
+    Agreement is measured against every model asked, so a rule's score only
+    grows as more models confirm it and failed calls count as abstentions.
+    """
+
+    def __init__(self, profile, models):
+        self.columns = list(profile.get("columns", {}))
+        self.models = list(models)
+        self.heuristics = universal_checks(profile)
+        self.results = {}
+
+    def add(self, result):
+        """Record one answer; returns the column's current merged rules."""
+        self.results[(result.column, result.model)] = result
+        return self.scores(result.column)
+
+    def scores(self, column):
+        return merge_suggestions(self._suggestions(column), models=len(self.models))
+
+    def answered(self, column):
+        return sum((column, model) in self.results for model in self.models)
+
+    def rules(self):
+        """Merged rules for all columns, in profile order."""
+        rules = []
+        for column in self.columns:
+            rules.extend(self.scores(column))
+        return rules
+
+    def _suggestions(self, column):
+        # Merge in model order, not arrival order, so results are reproducible.
+        suggestions = [rule for rule in self.heuristics if rule.column == column]
+        for model in self.models:
+            result = self.results.get((column, model))
+            if result is not None:
+                suggestions.extend(result.rules)
+        return suggestions
+
+
+async def discover_rules_async(profile, models, cache=None, template=PROMPT_TEMPLATE,
+                               concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                               retries=DEFAULT_RETRIES, deadline=None, on_result=None,
+                               tracer=None):
+    """Ask every model about every column concurrently.
+
+    At most ``concurrency`` calls are in flight; each attempt is cancelled
+    after ``timeout`` seconds and retried up to ``retries`` times. After
+    ``deadline`` seconds all outstanding calls are cancelled and the rules
+    gathered so far are returned. ``on_result(result, scorer)`` is called as
+    each answer arrives. Returns ``(rules, results)``.
+
+    A :class:`~datamender.trace.Tracer` gets every model call attempt and
+    the number of calls in flight.
+    """
+    tracer = tracer or NULL_TRACER
+    begun = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    scorer = AgreementScorer(profile, [model.name for model in models])
+    in_flight = 0
+    call_ids = itertools.count()
+
+    async def ask(column, summary, prompt, model):
+        nonlocal in_flight
+        if cache is not None:
+            response = cache.lookup(column, summary, template.template, model.name)
+            if response is not None:
+                return CallResult(column, model.name, parse_suggestions(response, column, model.name),
+                                  cached=True)
+        started = time.perf_counter()
+        error = None
+        for attempt in range(1, retries + 2):
+            async with semaphore:
+                called = time.perf_counter()
+                in_flight += 1
+                tracer.queue("discover.calls", in_flight)
+                try:
+                    response = await asyncio.wait_for(model.acomplete(prompt), timeout)
+                except asyncio.TimeoutError:
+                    error = f"timed out after {timeout}s"
+                except (ModelError, OSError, ValueError, KeyError) as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+                else:
+                    tracer.record(model.name, called, time.perf_counter() - called, "model",
+                                  async_id=next(call_ids), calls=1)
+                    if cache is not None:
+                        cache.store(column, summary, template.template, model.name, response,
+                                    seconds=time.perf_counter() - called,
+                                    tokens=estimate_tokens(prompt) + estimate_tokens(response))
+                    return CallResult(column, model.name,
+                                      parse_suggestions(response, column, model.name),
+                                      seconds=time.perf_counter() - started, attempts=attempt)
+                finally:
+                    in_flight -= 1
+                tracer.record(model.name, called, time.perf_counter() - called, "model",
+                              async_id=next(call_ids), calls=1, errors=1)
+            if attempt <= retries:
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        return CallResult(column, model.name, seconds=time.perf_counter() - started,
+                          attempts=retries + 1, error=error)
+
+    tasks = [
+        asyncio.create_task(ask(column, summary, render_prompt(column, summary, template), model))
+        for column, summary in profile.get("columns", {}).items()
+        for model in models
+    ]
+    results = []
+    try:
+        for next_result in asyncio.as_completed(tasks, timeout=deadline):
+            result = await next_result
+            scorer.add(result)
+            results.append(result)
+            if on_result is not None:
+                on_result(result, scorer)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if cache is not None:
+            cache.flush()
+    tracer.record("discover", begun, time.perf_counter() - begun, calls=len(results),
+                  columns=len(profile.get("columns", {})))
+    return scorer.rules(), results
+
+
+def discover_rules(profile, models, cache=None, template=PROMPT_TEMPLATE, **options):
+    """Blocking wrapper around :func:`discover_rules_async`; returns the rules."""
+    rules, _ = asyncio.run(discover_rules_async(profile, models, cache, template, **options))
+    return rules
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return float(f"{sum(values) / len(values):.6g}") if values else None
+
+
+def _most_common(values):
+    counts = {}
+    for value in values:
+        if value is not None:
+            counts[value] = counts.get(value, 0) + 1
+    return max(counts, key=counts.get) if counts else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suggest cleaning rules from a profile")
+    parser.add_argument("profile", help="profile JSON written by datamender.profiler")
+    parser.add_argument("-o", "--output", default="suggestions.yaml", help="rules YAML to write")
+    parser.add_argument("--models", type=int, default=3, help="number of offline stub models")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated seconds per stub model call")
+    parser.add_argument("--fake-server", action="store_true",
+                        help="query the stub models through a local HTTP server")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds before a model call is retried")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--deadline", type=float, help="give up on outstanding calls after this")
+    parser.add_argument("--cache-dir", help="reuse answers cached in this directory")
+    add_trace_arguments(parser)
+    args = parser.parse_args(argv)
+
+    profile = load_profile(args.profile)
+    models = [StubModel(f"stub-{i}", latency=args.latency, margin=0.05 * (i + 1))
+              for i in range(args.models)]
+    cache = SuggestionCache(args.cache_dir) if args.cache_dir else None
+    tracer = tracer_from_args(args)
+    options = {"concurrency": args.concurrency, "timeout": args.timeout,
+               "retries": args.retries, "deadline": args.deadline, "tracer": tracer}
+
+    async def run():
+        if not args.fake_server:
+            return await discover_rules_async(profile, models, cache, **options)
+        async with FakeModelServer(models) as server:
+            return await discover_rules_async(profile, server.clients(), cache, **options)
+
+    started = time.perf_counter()
+    rules, results = asyncio.run(run())
+    save_rules(rules, args.output)
+    failed = sum(not result.ok for result in results)
+    print(f"✅ {len(rules)} suggested rules written to {args.output} "
+          f"in {time.perf_counter() - started:.2f}s ({len(results)} calls, {failed} failed)")
+    if cache is not None:
+        stats = cache.stats
+        print(f"✅ Cache: {stats.hits} hits, {stats.similar_hits} similar, {stats.misses} misses, "
+              f"{stats.saved_seconds:.2f}s and {stats.saved_tokens} tokens saved")
+    save_trace(tracer, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,664 @@
+"""
+Vectorized batch fix engine (plan.md, Week 5).
+
+The accepted rules are compiled once into a :class:`FixPlan`: one NumPy
+kernel per rule plus the set of columns the kernels touch. Every chunk is
+read once as an Arrow-backed :class:`~datamender.chunk.Chunk`; checks run
+on zero-copy NumPy views of the touched columns, actions copy only the
+columns they rewrite, rows flagged by any ``drop`` action are removed with
+a single combined mask, and the chunk goes to the writer (and the
+post-clean profiler) without a pandas round trip. The whole rule set
+therefore costs one read-transform-write pass over the file, and the time
+spent in each rule is reported separately.
+"""
+
+import argparse
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+
+from datamender.cache import plan_cache
+from datamender.chunk import NAT, Chunk, column_kind, from_numpy, nanoseconds, numeric
+from datamender.io import (
+    DEFAULT_CHUNKSIZE, ChunkWriter, Partition, detect_format, iter_batches, iter_parquet_batches,
+    pinned_schema, row_group_stats, schema_pairs, schema_path,
+)
+from datamender.profiler import (
+    DATETIME_SNIFF_ROWS, DEFAULT_BINS, DEFAULT_TOP_K, Profiler, datetime_ns, load_profile,
+    looks_like_datetime, save_profile,
+)
+from datamender.rules import RuleError, load_rules
+from datamender.trace import NULL_TRACER, add_trace_arguments, save_trace, tracer_from_args
+
+
+class Workspace:
+    """NumPy views of the columns of one chunk that rules touch.
+
+    Columns are converted lazily on first use. Numeric and timestamp
+    columns without nulls are read-only views of the Arrow buffers; a column
+    is copied only when an action asks for it with ``write=True``, and only
+    such columns are converted back to Arrow. Text columns parsed as
+    datetimes and the ``float_columns`` a plan may null out are always
+    written back, so every output chunk gets the same types whether or not
+    a rule fired.
+    """
+
+    def __init__(self, chunk, float_columns=()):
+        self.chunk = chunk
+        self.drop = np.zeros(len(chunk), dtype=bool)
+        self.float_columns = float_columns
+        self._arrays = {}
+        self._kinds = {}
+        self._dirty = set()
+
+    def array(self, name, write=False):
+        """Return ``(kind, values)`` for a column; kind is numeric/datetime/object.
+
+        With ``write=True`` the values are a private, writable copy that is
+        written back to the chunk.
+        """
+        if name not in self._arrays:
+            if name not in self.chunk.columns:
+                raise RuleError(f"Column {name!r} is not in the input")
+            array = self.chunk.array(name)
+            kind, values = _to_array(array)
+            if kind == "numeric" and name in self.float_columns and values.dtype.kind != "f":
+                values = values.astype(np.float64)
+                self._dirty.add(name)
+            elif kind == "datetime" and column_kind(array.type) != "datetime":
+                self._dirty.add(name)
+            self._kinds[name], self._arrays[name] = kind, values
+        if write:
+            if not self._arrays[name].flags.writeable:
+                self._arrays[name] = self._arrays[name].copy()
+            self._dirty.add(name)
+        return self._kinds[name], self._arrays[name]
+
+    def orderable(self, name, write=False):
+        """Return ``(kind, values)`` for a column that must be numeric or datetime."""
+        kind, values = self.array(name)
+        if kind == "object":
+            raise RuleError(f"Column {name!r} is neither numeric nor a datetime")
+        return self.array(name, write) if write else (kind, values)
+
+    def nulls(self, name):
+        kind, values = self.array(name)
+        if kind == "datetime":
+            return values == NAT
+        if kind == "object" or values.dtype.kind == "f":
+            return pd.isna(values)
+        return np.zeros(values.size, dtype=bool)
+
+    def replace(self, name, values):
+        """Swap in a new array for a column (e.g. after an int -> float cast)."""
+        self._arrays[name] = values
+        self._dirty.add(name)
+
+    def set_null(self, name, mask):
+        kind, values = self.array(name, write=True)
+        if kind == "datetime":
+            values[mask] = NAT
+        else:
+            if values.dtype.kind in "iub":
+                values = values.astype(np.float64)
+                self.replace(name, values)
+            values[mask] = np.nan if kind == "numeric" else None
+
+    def result(self):
+        """Return the chunk with modified columns written back and drops applied."""
+        chunk = self.chunk
+        if self._dirty:
+            chunk = chunk.with_columns({
+                name: from_numpy(self._kinds[name], self._arrays[name], chunk.array(name).type)
+                for name in self._dirty
+            })
+        if self.drop.any():
+            chunk = chunk.filter(~self.drop)
+        return chunk
+
+
+def _to_array(array):
+    kind = column_kind(array.type)
+    if kind == "boolean":
+        return "object", array.to_numpy(zero_copy_only=False).astype(object)
+    if kind == "null":
+        return "numeric", np.full(len(array), np.nan)
+    if kind in ("integer", "float"):
+        return "numeric", numeric(array)
+    if kind == "datetime":
+        return "datetime", nanoseconds(array)
+    if looks_like_datetime(pc.drop_null(array).slice(0, DATETIME_SNIFF_ROWS).to_pandas()):
+        return "datetime", datetime_ns(array.to_pandas())
+    return "object", array.to_numpy(zero_copy_only=False)
+
+
+def _bound(kind, bound):
+    if bound is None:
+        return None
+    if kind == "datetime":
+        return pd.Timestamp(bound).value
+    return bound
+
+
+def _range_mask(rule, work):
+    kind, values = work.orderable(rule.column)
+    low, high = _bound(kind, rule.min), _bound(kind, rule.max)
+    mask = np.zeros(values.size, dtype=bool)
+    if low is not None:
+        mask |= values < low
+        if kind == "datetime":
+            mask &= values != NAT
+    if high is not None:
+        mask |= values > high
+    return mask
+
+
+def _non_negative_mask(rule, work):
+    kind, values = work.orderable(rule.column)
+    mask = values < 0
+    if kind == "datetime":
+        mask &= values != NAT
+    return mask
+
+
+def _not_null_mask(rule, work):
+    return work.nulls(rule.column)
+
+
+def _order_mask(rule, work):
+    _, first = work.orderable(rule.column)
+    _, second = work.orderable(rule.other)
+    mask = first >= second if rule.strict else first > second
+    mask &= ~(work.nulls(rule.column) | work.nulls(rule.other))
+    return mask
+
+
+def _clip(rule, work, mask):
+    kind, values = work.orderable(rule.column, write=True)
+    if rule.check == "non_negative":
+        values[mask] = 0
+        return
+    low, high = _bound(kind, rule.min), _bound(kind, rule.max)
+    if low is not None:
+        values[mask & (values < low)] = low
+    if high is not None:
+        values[mask & (values > high)] = high
+
+
+def _fractional(bound):
+    return isinstance(bound, (int, float)) and not float(bound).is_integer()
+
+
+def _abs(rule, work, mask):
+    _, values = work.orderable(rule.column, write=True)
+    np.negative(values, out=values, where=mask)
+
+
+def _fill(rule, work, mask):
+    kind, values = work.array(rule.column, write=True)
+    values[mask] = _bound(kind, rule.value)
+
+
+def _swap(rule, work, mask):
+    _, first = work.orderable(rule.column, write=True)
+    _, second = work.orderable(rule.other, write=True)
+    first[mask], second[mask] = second[mask], first[mask]
+
+
+def _drop(rule, work, mask):
+    work.drop |= mask
+
+
+def _null(rule, work, mask):
+    work.set_null(rule.column, mask)
+
+
+# A rule is a check (violation mask) followed by an action on the masked rows.
+MASKS = {
+    "range": _range_mask,
+    "non_negative": _non_negative_mask,
+    "not_null": _not_null_mask,
+    "order": _order_mask,
+}
+
+def could_violate(rule, stats):
+    """Whether rows described by footer stats may violate ``rule``.
+
+    ``stats`` maps column names to ``(min, max, nulls, kind)`` as in
+    :class:`~datamender.io.RowGroupStats`. Unknown statistics never rule a
+    row group out, so only a False answer is certain.
+    """
+    if any(name not in stats for name in rule.columns):
+        return True
+    low, high, nulls, kind = stats[rule.column]
+    if rule.check == "not_null":
+        # The null count leaves out NaN, which the check flags.
+        return nulls is None or nulls > 0 or kind == "float"
+    if low is None:
+        return True
+    if rule.check == "non_negative":
+        return low < 0
+    if rule.check == "range":
+        kind = "datetime" if kind == "datetime" else "numeric"
+        below = rule.min is not None and low < _bound(kind, rule.min)
+        above = rule.max is not None and high > _bound(kind, rule.max)
+        return below or above
+    other_low = stats[rule.other][0]
+    if other_low is None:
+        return True
+    return high >= other_low if rule.strict else high > other_low
+
+
+def _violates(rule, stats, probe):
+    """Whether any row read by ``probe`` violates ``rule`` (True for missing columns)."""
+    if any(name not in stats for name in rule.columns):
+        return True
+    check = MASKS[rule.check]
+    return any(check(rule, Workspace(chunk)).any() for chunk in probe(list(rule.columns)))
+
+
+ACTIONS = {
+    "clip": _clip,
+    "abs": _abs,
+    "fill": _fill,
+    "swap": _swap,
+    "drop": _drop,
+    "null": _null,
+}
+
+
+@dataclass
+class CellChanges:
+    """Cells of one column changed by one rule in one chunk.
+
+    ``rows`` are positions in the input chunk. For ``drop`` rules ``column``
+    is None and ``rows`` are the rows removed.
+    """
+
+    rule_id: str
+    column: str
+    kind: str
+    rows: np.ndarray
+    before: np.ndarray = None
+    after: np.ndarray = None
+
+
+def _capture(rule, work, mask):
+    rows = np.flatnonzero(mask & ~work.drop)
+    if rule.action == "drop":
+        return [CellChanges(rule.id, None, "drop", rows)]
+    columns = rule.columns if rule.action == "swap" else (rule.column,)
+    changes = []
+    for name in columns:
+        kind, values = work.array(name)
+        changes.append(CellChanges(rule.id, name, kind, rows, before=values[rows].copy()))
+    return changes
+
+
+def _changes(rule, work, captured):
+    """Fill in the new values and keep only the cells that really changed."""
+    for change in captured:
+        if change.column is None:
+            if change.rows.size:
+                yield change
+            continue
+        after = work.array(change.column)[1][change.rows]
+        same = np.asarray(change.before == after, dtype=bool)
+        same |= np.asarray(pd.isna(change.before) & pd.isna(after), dtype=bool)
+        if change.kind == "datetime":
+            same |= (change.before == NAT) & (after == NAT)
+        if not same.all():
+            changed = ~same
+            yield CellChanges(rule.id, change.column, change.kind, change.rows[changed],
+                              change.before[changed], after[changed])
+
+
+@dataclass
+class RuleStats:
+    """Per-rule counters accumulated over a fix run."""
+
+    rule_id: str
+    check: str
+    action: str
+    columns: tuple
+    violations: int = 0
+    remaining: int = 0
+    dropped: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    def to_dict(self):
+        return {
+            "id": self.rule_id,
+            "check": self.check,
+            "action": self.action,
+            "columns": list(self.columns),
+            "violations": self.violations,
+            "remaining": self.remaining,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "seconds": round(self.seconds, 6),
+        }
+
+
+class FixPlan:
+    """Accepted rules compiled into a fused sequence of array kernels."""
+
+    def __init__(self, rules):
+        self.rules = [rule for rule in rules if rule.accepted]
+        self.kernels = [(MASKS[rule.check], ACTIONS[rule.action]) for rule in self.rules]
+        self.stats = [
+            RuleStats(rule.id, rule.check, rule.action, rule.columns) for rule in self.rules
+        ]
+        self.verify_seconds = 0.0
+
+    @property
+    def columns(self):
+        """Columns read or rewritten by at least one rule, in rule order."""
+        return list(dict.fromkeys(name for rule in self.rules for name in rule.columns))
+
+    @property
+    def written_columns(self):
+        """Columns whose values some rule may rewrite."""
+        return list(dict.fromkeys(
+            name for rule in self.rules if rule.action != "drop" for name in
+            (rule.columns if rule.action == "swap" else (rule.column,))
+        ))
+
+    @property
+    def drops_rows(self):
+        return any(rule.action == "drop" for rule in self.rules)
+
+    @property
+    def float_columns(self):
+        """Integer columns that must become float: a rule may null them or clip to a fraction."""
+        return frozenset(rule.column for rule in self.rules
+                         if rule.action == "null" or rule.action == "clip" and any(
+                             _fractional(bound) for bound in (rule.min, rule.max)))
+
+    def active_rules(self, stats, probe=None):
+        """Flag the rules that must run on rows described by footer ``stats``.
+
+        A rule runs when the statistics allow a violation, or when an earlier
+        running rule may rewrite one of its columns. Footer bounds cannot
+        clear an order check whose column ranges overlap, or NaN in a float
+        column, so ``probe(columns)``, if given, yields the rows of just those
+        columns and a rule the statistics leave open is checked on them.
+        """
+        active, written = [], set()
+        for rule in self.rules:
+            runs = not written.isdisjoint(rule.columns) or could_violate(rule, stats) and (
+                probe is None or _violates(rule, stats, probe))
+            if runs and rule.action != "drop":
+                written.update(rule.columns if rule.action == "swap" else (rule.column,))
+            active.append(runs)
+        return tuple(active)
+
+    def apply(self, frame, diff=None, active=None, tracer=None):
+        """Run every rule over one chunk and return the cleaned chunk.
+
+        ``frame`` is a :class:`~datamender.chunk.Chunk` or a DataFrame; the
+        result has the same type. After the actions ran, every check is
+        evaluated once more on the in-memory arrays of the kept rows, which
+        yields the post-clean violation counts without re-reading anything.
+
+        If ``diff`` is a list, one :class:`CellChanges` per rule and column
+        is appended to it, describing exactly which cells the rule changed
+        (or, for ``drop``, which rows it removed).
+
+        ``active`` (from :meth:`active_rules`) skips the rules flagged False;
+        they are still verified if a running rule rewrote one of their columns.
+        A ``tracer`` records each rule's time and violations on this chunk.
+        """
+        tracer = tracer or NULL_TRACER
+        work = Workspace(Chunk.wrap(frame), self.float_columns)
+        active = active or (True,) * len(self.rules)
+        written = set()
+        for rule, (check, action), stats, runs in zip(self.rules, self.kernels, self.stats,
+                                                      active):
+            if not runs:
+                stats.skipped += len(work.drop)
+                continue
+            if rule.action != "drop":
+                written.update(rule.columns if rule.action == "swap" else (rule.column,))
+            started = time.perf_counter()
+            mask = check(rule, work)
+            violations = int(mask.sum())
+            if violations:
+                if rule.action == "drop":
+                    stats.dropped += int(np.count_nonzero(mask & ~work.drop))
+                before = _capture(rule, work, mask) if diff is not None else None
+                action(rule, work, mask)
+                if before is not None:
+                    diff.extend(_changes(rule, work, before))
+            stats.violations += violations
+            elapsed = time.perf_counter() - started
+            stats.seconds += elapsed
+            tracer.record(rule.id, started, elapsed, "rule", rows=len(work.drop),
+                          violations=violations)
+
+        started = time.perf_counter()
+        for rule, (check, _), stats, runs in zip(self.rules, self.kernels, self.stats, active):
+            if runs or not written.isdisjoint(rule.columns):
+                stats.remaining += int(np.count_nonzero(check(rule, work) & ~work.drop))
+        elapsed = time.perf_counter() - started
+        self.verify_seconds += elapsed
+        tracer.record("fix.verify", started, elapsed, rows=len(work.drop))
+        for name in self.float_columns:
+            work.array(name)
+        cleaned = work.result()
+        return cleaned.to_pandas() if isinstance(frame, pd.DataFrame) else cleaned
+
+    def passthrough(self, frame):
+        """Return a chunk no rule can fire on, typed as :meth:`apply` would type it."""
+        work = Workspace(Chunk.wrap(frame), self.float_columns)
+        for name in self.float_columns:
+            work.array(name)
+        for stats in self.stats:
+            stats.skipped += len(work.drop)
+        cleaned = work.result()
+        return cleaned.to_pandas() if isinstance(frame, pd.DataFrame) else cleaned
+
+    def anomalies(self):
+        """Return before/after violation totals and the share removed."""
+        before = sum(stats.violations for stats in self.stats)
+        after = sum(stats.remaining for stats in self.stats)
+        removed = 100.0 * (before - after) / before if before else 0.0
+        return {"before": before, "after": after, "removed_pct": round(removed, 4)}
+
+
+def compile_plan(rules, cache=None):
+    """Compile rules (or a path to an accepted-rules YAML file) into a FixPlan.
+
+    A :class:`~datamender.cache.PlanCache` keeps the plan of a rules file
+    until the file changes.
+    """
+    if isinstance(rules, (str, os.PathLike)):
+        if cache is not None:
+            return cache.get("plan", rules, lambda: FixPlan(load_rules(rules)))
+        rules = load_rules(rules)
+    return FixPlan(rules)
+
+
+def iter_plan_batches(partition, plan, chunksize=DEFAULT_CHUNKSIZE, workers=1, tracer=None,
+                      columns=None):
+    """Yield ``(chunk, active)`` pairs for a :class:`~datamender.io.Partition`.
+
+    For Parquet input ``active`` flags the rules the row group's footer
+    statistics, or a read of just the rule's columns where the statistics
+    are inconclusive, cannot clear (see :meth:`FixPlan.active_rules`);
+    other formats carry no statistics and get None, meaning every rule runs.
+    A whole CSV file with a pinned schema is parsed by ``workers`` processes.
+    ``columns`` restricts the chunks to those columns.
+    """
+    if partition.format != "parquet":
+        if partition.start is None and partition.schema is not None:
+            chunks = iter_batches(partition.path, chunksize, columns, schema=partition.schema,
+                                  workers=workers, tracer=tracer)
+        else:
+            chunks = partition.iter_batches(chunksize, columns)
+        for chunk in chunks:
+            yield chunk, None
+        return
+    groups = row_group_stats(partition.path, plan.columns)
+    if partition.row_groups is not None:
+        groups = [groups[index] for index in partition.row_groups]
+    for group in groups:
+        active = plan.active_rules(group.columns, lambda names: iter_parquet_batches(
+            partition.path, chunksize, names, [group.index]))
+        for chunk in iter_parquet_batches(partition.path, chunksize, columns, [group.index]):
+            yield chunk, active
+
+
+def fix_file(input_path, rules, output_path, chunksize=DEFAULT_CHUNKSIZE, profile=None,
+             schema=None, workers=1, tracer=None):
+    """Apply accepted rules to a CSV/Parquet file in a single streaming pass.
+
+    ``rules`` may be a list of :class:`~datamender.rules.Rule`, a compiled
+    :class:`FixPlan` or a path to a rules YAML file. The output format follows
+    the extension of ``output_path``. Returns a report with row counts and
+    read/transform/write timings, including the time spent in each rule.
+
+    For Parquet input, a rule's kernel is skipped on row groups where it
+    cannot fire: footer min/max and null counts show it, or, when they
+    cannot (overlapping order columns, NaN in floats), a read of only the
+    rule's columns does. Each rule reports these rows as ``skipped``. Row
+    groups no rule can touch skip the rules and their verification and are
+    counted in ``rows_skipped``; they are still decoded and written again.
+
+    A ``schema`` pins the column types of CSV input, which is then parsed by
+    ``workers`` processes (see :func:`~datamender.io.iter_csv_parallel`).
+
+    When the pre-clean ``profile`` is given, the post-clean profile is built
+    from the cleaned chunks while they are still in memory and returned under
+    ``"profile"``. Only columns a rule can rewrite are re-accumulated (all
+    columns if some rule drops rows); the rest keep their original summary.
+
+    A :class:`~datamender.trace.Tracer` records the read, transform, write
+    and re-profile time of every chunk and the time of every rule.
+    """
+    plan = rules if isinstance(rules, FixPlan) else compile_plan(rules)
+    tracer = tracer or NULL_TRACER
+    started = time.perf_counter()
+    read_seconds = write_seconds = profile_seconds = 0.0
+    rows_in = rows_skipped = chunks = 0
+
+    reprofiler = reprofile_columns = None
+    if profile is not None:
+        reprofiler = Profiler(bins=profile.get("bins", DEFAULT_BINS),
+                              top_k=profile.get("top_k", DEFAULT_TOP_K))
+        if not plan.drops_rows:
+            reprofile_columns = plan.written_columns
+
+    with ChunkWriter(output_path) as writer:
+        partition = Partition(os.fspath(input_path), detect_format(input_path),
+                              schema=schema_pairs(schema))
+        reader = iter_plan_batches(partition, plan, chunksize, workers, tracer)
+        while True:
+            tick = time.perf_counter()
+            frame, active = next(reader, (None, None))
+            elapsed = time.perf_counter() - tick
+            read_seconds += elapsed
+            if frame is None:
+                break
+            rows = len(frame)
+            tracer.record("fix.read", tick, elapsed, rows=rows)
+            rows_in += rows
+            chunks += 1
+            tick = time.perf_counter()
+            if active is not None and not any(active):
+                rows_skipped += rows
+                cleaned = plan.passthrough(frame)
+            else:
+                cleaned = plan.apply(frame, active=active, tracer=tracer)
+            tracer.record("fix.transform", tick, time.perf_counter() - tick, rows=rows)
+            tick = time.perf_counter()
+            writer.write(cleaned)
+            elapsed = time.perf_counter() - tick
+            write_seconds += elapsed
+            tracer.record("fix.write", tick, elapsed, rows=len(cleaned))
+            if reprofiler is not None:
+                tick = time.perf_counter()
+                if reprofile_columns is None:
+                    reprofiler.update(cleaned)
+                else:
+                    reprofiler.update(cleaned.select(reprofile_columns))
+                elapsed = time.perf_counter() - tick
+                profile_seconds += elapsed
+                tracer.record("reprofile", tick, elapsed, rows=len(cleaned))
+        rows_out = writer.rows
+
+    report = {
+        "input": os.fspath(input_path),
+        "output": os.fspath(output_path),
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "rows_dropped": rows_in - rows_out,
+        "rows_skipped": rows_skipped,
+        "chunks": chunks,
+        "elapsed_seconds": round(time.perf_counter() - started, 6),
+        "read_seconds": round(read_seconds, 6),
+        "write_seconds": round(write_seconds, 6),
+        "verify_seconds": round(plan.verify_seconds, 6),
+        "anomalies": plan.anomalies(),
+        "rules": [stats.to_dict() for stats in plan.stats],
+    }
+    if reprofiler is not None:
+        report["profile_seconds"] = round(profile_seconds, 6)
+        report["profile"] = reprofiler.patch(profile, path=output_path)
+    tracer.record("fix", started, time.perf_counter() - started, rows=rows_in,
+                  bytes_read=os.path.getsize(input_path), bytes_written=os.path.getsize(output_path))
+    return report
+
+
+def main(argv=None):
+    """Apply an accepted-rules YAML file to a CSV/Parquet file."""
+    parser = argparse.ArgumentParser(description="Apply accepted cleaning rules to a file.")
+    parser.add_argument("input", help="CSV or Parquet file to clean")
+    parser.add_argument("rules", help="accepted-rules YAML file")
+    parser.add_argument("-o", "--output", required=True, help="cleaned CSV or Parquet file")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--profile", help="pre-clean JSON profile to update incrementally")
+    parser.add_argument("--profile-output", help="write the post-clean profile here")
+    parser.add_argument("--report", help="write the run report (timings, per-rule counts) as JSON")
+    parser.add_argument("--schema", nargs="?", const="",
+                        help="pin CSV column types from this schema YAML, inferring it when "
+                             "missing (default: <rules>.schema.yaml)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parse a schema-pinned CSV in this many processes")
+    add_trace_arguments(parser)
+    args = parser.parse_args(argv)
+
+    profile = load_profile(args.profile) if args.profile else None
+    cache = plan_cache()
+    schema = None
+    if args.schema is not None and detect_format(args.input) == "csv":
+        schema = pinned_schema(args.input, args.schema or schema_path(args.rules), cache)
+    tracer = tracer_from_args(args)
+    report = fix_file(args.input, compile_plan(args.rules, cache), args.output,
+                      chunksize=args.chunksize, profile=profile, schema=schema,
+                      workers=args.workers, tracer=tracer)
+    print(f"✅ Cleaned {report['rows_in']:,} rows → {report['rows_out']:,} rows "
+          f"in {report['elapsed_seconds']:.2f}s")
+    if report["rows_skipped"]:
+        print(f"   {report['rows_skipped']:,} rows in clean row groups skipped the rules")
+    for rule in report["rules"]:
+        print(f"   {rule['id']:<40} {rule['violations']:>10,} violations  "
+              f"{rule['seconds'] * 1000:8.1f} ms")
+    anomalies = report["anomalies"]
+    print(f"   {anomalies['removed_pct']:.1f}% of {anomalies['before']:,} anomalies removed")
+    if args.profile_output and "profile" in report:
+        save_profile(report["profile"], args.profile_output)
+        print(f"✅ Post-clean profile → {args.profile_output}")
+    if args.report:
+        save_profile(report, args.report)
+        print(f"✅ Report → {args.report}")
+    save_trace(tracer, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,656 @@
+"""
+Chunked readers for CSV, Parquet and Arrow IPC/Feather input.
+
+Every stage of DataMender walks the input as a stream of bounded chunks so
+that memory use depends on the chunk size, never on the file size. The
+``iter_batches`` readers yield Arrow-backed :class:`~datamender.chunk.Chunk`
+objects that the profiler, the fix engine and the writers share without
+copying; Arrow IPC/Feather files are memory-mapped, so their chunks are
+views of the page cache. The ``iter_chunks`` readers yield DataFrames.
+
+CSV input is read by pandas with per-chunk type guessing unless a schema is
+pinned. :func:`infer_csv_schema` infers column types once, from samples
+spread over the file, and :func:`save_schema` stores them (by convention
+next to the rules YAML, see :func:`schema_path`). With a pinned schema
+every chunk is parsed by Arrow straight into those types, and
+:func:`iter_csv_parallel` parses quote-aware byte ranges of the file in a
+process pool while still yielding chunks in file order.
+"""
+
+import io
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import yaml
+
+from datamender.chunk import Chunk
+from datamender.trace import NULL_TRACER, traced_call
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Byte ranges smaller than this are not worth a separate worker task.
+MIN_PARTITION_BYTES = 16 * 1024 * 1024
+
+# Schema inference parses this many samples of this many bytes each.
+SCHEMA_SAMPLES = 8
+SCHEMA_SAMPLE_BYTES = 1024 * 1024
+
+# Byte range parsed by one task of the parallel CSV reader.
+PARALLEL_RANGE_BYTES = 32 * 1024 * 1024
+
+_SCAN_BYTES = 16 * 1024 * 1024
+
+CSV_EXTENSIONS = (".csv", ".tsv", ".txt", ".csv.gz", ".csv.bz2", ".csv.zst")
+PARQUET_EXTENSIONS = (".parquet", ".pq", ".parq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+
+def detect_format(path):
+    """Return ``"csv"``, ``"parquet"`` or ``"arrow"`` based on the file extension."""
+    lowered = os.fspath(path).lower()
+    if lowered.endswith(PARQUET_EXTENSIONS):
+        return "parquet"
+    if lowered.endswith(ARROW_EXTENSIONS):
+        return "arrow"
+    if lowered.endswith(CSV_EXTENSIONS):
+        return "csv"
+    raise ValueError(f"Unsupported input format: {path}")
+
+
+def iter_csv_chunks(path, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """Yield DataFrames of at most ``chunksize`` rows from a CSV file."""
+    reader = pd.read_csv(
+        path, sep=_csv_separator(path), chunksize=chunksize,
+        usecols=columns, low_memory=False,
+    )
+    with reader:
+        for frame in reader:
+            yield frame
+
+
+def iter_parquet_batches(path, chunksize=DEFAULT_CHUNKSIZE, columns=None, row_groups=None):
+    """Yield Chunks from a Parquet file, one row group at a time.
+
+    Row groups larger than ``chunksize`` are split into several batches so a
+    single oversized row group cannot blow the memory budget.
+    """
+    parquet_file = pq.ParquetFile(path)
+    if row_groups is None:
+        row_groups = range(parquet_file.num_row_groups)
+    for row_group in row_groups:
+        for batch in parquet_file.iter_batches(
+            batch_size=chunksize, row_groups=[row_group], columns=columns
+        ):
+            yield Chunk(batch)
+
+
+def iter_parquet_chunks(path, chunksize=DEFAULT_CHUNKSIZE, columns=None, row_groups=None):
+    """Yield DataFrames from a Parquet file, one row group at a time."""
+    for chunk in iter_parquet_batches(path, chunksize, columns, row_groups):
+        yield chunk.to_pandas()
+
+
+def iter_arrow_batches(path, chunksize=DEFAULT_CHUNKSIZE, columns=None, batches=None):
+    """Yield zero-copy Chunks from a memory-mapped Arrow IPC/Feather file.
+
+    Record batches are sliced to at most ``chunksize`` rows; slices and
+    column selections are views, so nothing is read until it is touched.
+    """
+    with pa.memory_map(os.fspath(path)) as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            records = (reader.get_batch(i) for i in (
+                range(reader.num_record_batches) if batches is None else batches))
+        except pa.ArrowInvalid:
+            # Streaming format: no footer, so batches can only be read in order.
+            source.seek(0)
+            records = pa.ipc.open_stream(source)
+        for batch in records:
+            if columns is not None:
+                batch = batch.select(columns)
+            for offset in range(0, batch.num_rows, chunksize):
+                yield Chunk(batch.slice(offset, chunksize))
+
+
+def iter_batches(path, chunksize=DEFAULT_CHUNKSIZE, columns=None, schema=None, workers=1,
+                 tracer=None):
+    """Yield Arrow-backed Chunks from a CSV, Parquet or Arrow IPC file.
+
+    ``schema`` pins the column types of CSV input; with it, ``workers > 1``
+    parses an uncompressed CSV in that many processes (traced by ``tracer``).
+    """
+    path, schema = os.fspath(path), schema_pairs(schema)
+    if workers > 1 and schema is not None and detect_format(path) == "csv" \
+            and path.lower().endswith((".csv", ".tsv", ".txt")):
+        return iter_csv_parallel(path, schema, chunksize, columns, workers, tracer=tracer)
+    return Partition(path, detect_format(path), schema=schema).iter_batches(chunksize, columns)
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """Yield DataFrame chunks from a CSV, Parquet or Arrow IPC file."""
+    if detect_format(path) == "csv":
+        return iter_csv_chunks(path, chunksize=chunksize, columns=columns)
+    return (chunk.to_pandas() for chunk in iter_batches(path, chunksize, columns))
+
+
+def _csv_separator(path):
+    return "\t" if os.fspath(path).lower().endswith(".tsv") else ","
+
+
+def read_csv_header(path):
+    """Return the column names from the first line of a CSV file."""
+    return list(pd.read_csv(path, sep=_csv_separator(path), nrows=0).columns)
+
+
+def csv_byte_ranges(path, parts):
+    """Split the body of an uncompressed CSV into record-aligned byte ranges.
+
+    The header line is excluded; every range starts at the beginning of a
+    record and ends just after a newline (or at end of file). Newlines
+    inside quoted fields are not record boundaries: the quote bytes before
+    each candidate boundary are counted (an escaped ``""`` counts twice, so
+    it never flips the parity) and a boundary is only placed where that
+    count is even.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.readline()
+        body = f.tell()
+        step = max(1, (size - body) // max(1, parts))
+        boundaries = [body]
+        position, quotes = body, 0
+        for i in range(1, parts):
+            target = body + i * step
+            if target <= position:
+                continue
+            quotes += _count_quotes(f, position, target)
+            position, quotes = _next_record(f, target, quotes)
+            if position >= size:
+                break
+            boundaries.append(position)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def _count_quotes(f, start, end):
+    f.seek(start)
+    count = 0
+    while start < end:
+        block = f.read(min(_SCAN_BYTES, end - start))
+        if not block:
+            break
+        count += block.count(b'"')
+        start += len(block)
+    return count
+
+
+def _next_record(f, position, quotes):
+    """Offset just after the first unquoted newline at or after ``position``.
+
+    ``quotes`` counts the quote bytes before ``position``; the count up to
+    the returned offset is returned with it.
+    """
+    f.seek(position)
+    while True:
+        block = f.read(_SCAN_BYTES)
+        if not block:
+            return position, quotes
+        start = 0
+        while True:
+            newline = block.find(b"\n", start)
+            if newline < 0:
+                quotes += block.count(b'"', start)
+                position += len(block)
+                break
+            quotes += block.count(b'"', start, newline)
+            start = newline + 1
+            if quotes % 2 == 0:
+                return position + start, quotes
+
+
+def _record_end(data):
+    """Length of the complete records at the start of ``data`` (which starts a record)."""
+    end = quotes = start = 0
+    while True:
+        newline = data.find(b"\n", start)
+        if newline < 0:
+            return end
+        quotes += data.count(b'"', start, newline)
+        start = newline + 1
+        if quotes % 2 == 0:
+            end = start
+
+
+class _ByteRange(io.RawIOBase):
+    """Read-only file view limited to ``[start, end)``."""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def iter_csv_range_chunks(path, start, end, names, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """Yield DataFrame chunks parsed from one byte range of a CSV file."""
+    stream = io.BufferedReader(_ByteRange(path, start, end), buffer_size=1 << 20)
+    reader = pd.read_csv(
+        stream, sep=_csv_separator(path), names=names, header=None,
+        chunksize=chunksize, usecols=columns, low_memory=False,
+    )
+    with stream, reader:
+        for frame in reader:
+            yield frame
+
+
+class SchemaError(ValueError):
+    """The data does not match a pinned schema."""
+
+
+def _csv_options(path, names, schema, columns):
+    types = {name: pa.type_for_alias(alias) for name, alias in schema}
+    return dict(
+        read_options=pacsv.ReadOptions(column_names=list(names), block_size=1 << 22),
+        parse_options=pacsv.ParseOptions(delimiter=_csv_separator(path), newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(column_types=types, strings_can_be_null=True,
+                                             include_columns=columns),
+    )
+
+
+def _rechunk(batches, chunksize):
+    """Regroup record batches into Chunks of ``chunksize`` rows (the last may be shorter)."""
+    pending, rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= chunksize:
+            table = pa.Table.from_batches(pending)
+            yield Chunk.wrap(table.slice(0, chunksize))
+            rest = table.slice(chunksize)
+            pending, rows = rest.to_batches(), rest.num_rows
+    if rows:
+        yield Chunk.wrap(pa.Table.from_batches(pending))
+
+
+def _schema_record_batches(path, schema, start=None, end=None, names=None, columns=None):
+    if start is None:
+        stream = pa.input_stream(os.fspath(path), compression="detect")
+        options = _csv_options(path, read_csv_header(path), schema, columns)
+        options["read_options"].skip_rows = 1
+    else:
+        stream = io.BufferedReader(_ByteRange(path, start, end), buffer_size=1 << 20)
+        options = _csv_options(path, names, schema, columns)
+    with stream:
+        try:
+            yield from pacsv.open_csv(stream, **options)
+        except pa.ArrowInvalid as error:
+            if "Empty CSV file" in str(error):
+                return
+            raise SchemaError(f"{path}: {error}; re-infer the schema if the data changed") \
+                from error
+
+
+def iter_csv_schema_batches(path, schema, start=None, end=None, names=None,
+                            chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """Yield Chunks parsed by Arrow with a pinned ``schema`` (``(name, type)`` pairs).
+
+    Without ``start`` the whole file is read, compressed or not; otherwise
+    the byte range ``[start, end)`` of an uncompressed CSV, whose columns
+    are ``names``.
+    """
+    return _rechunk(_schema_record_batches(path, schema, start, end, names, columns), chunksize)
+
+
+def _parse_range(path, start, end, names, schema, columns):
+    return list(_schema_record_batches(path, schema, start, end, names, columns))
+
+
+def iter_csv_parallel(path, schema, chunksize=DEFAULT_CHUNKSIZE, columns=None, workers=2,
+                      range_bytes=PARALLEL_RANGE_BYTES, tracer=None):
+    """Yield Chunks of an uncompressed CSV parsed by ``workers`` processes.
+
+    The file is cut into quote-aware byte ranges of about ``range_bytes``
+    that are parsed with the pinned ``schema``; at most two ranges per
+    worker are in flight, and chunks come out in file order. A ``tracer``
+    gets each range's parse span and the number of ranges in flight.
+    """
+    return _rechunk(_parallel_record_batches(path, schema_pairs(schema), columns, workers,
+                                             range_bytes, tracer or NULL_TRACER), chunksize)
+
+
+def _parallel_record_batches(path, schema, columns, workers, range_bytes, tracer):
+    path = os.fspath(path)
+    names = tuple(read_csv_header(path))
+    parts = max(1, math.ceil(os.path.getsize(path) / range_bytes))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start, end in csv_byte_ranges(path, parts):
+            pending.append(pool.submit(traced_call, "csv.parse", _parse_range,
+                                       path, start, end, names, schema, columns))
+            if len(pending) >= 2 * workers:
+                yield from _parsed(pending, tracer)
+        while pending:
+            yield from _parsed(pending, tracer)
+
+
+def _parsed(pending, tracer):
+    tracer.queue("csv.parse", len(pending))
+    batches, span = pending.popleft().result()
+    span.add(rows=sum(batch.num_rows for batch in batches))
+    tracer.add(span)
+    return batches
+
+
+def infer_csv_schema(path, samples=SCHEMA_SAMPLES, sample_bytes=SCHEMA_SAMPLE_BYTES):
+    """Infer column types once from samples spread over a CSV file.
+
+    Returns an ordered ``{column: Arrow type name}`` dict. Each sample is a
+    run of whole records at the start of one quote-aware byte range
+    (compressed files only sample their head); the types inferred per
+    sample are widened to one that fits them all.
+    """
+    path = os.fspath(path)
+    names = read_csv_header(path)
+    compressed = not path.lower().endswith((".csv", ".tsv", ".txt"))
+    if compressed:
+        with pa.input_stream(path, compression="detect") as stream:
+            head = stream.read(sample_bytes)
+        blocks = [head[head.index(b"\n") + 1:] if b"\n" in head else b""]
+    else:
+        blocks = []
+        with open(path, "rb") as f:
+            for start, end in csv_byte_ranges(path, samples):
+                f.seek(start)
+                blocks.append(f.read(min(sample_bytes, end - start)))
+    found = {name: [] for name in names}
+    options = _csv_options(path, names, (), None)
+    for block in blocks:
+        block = block[:_record_end(block)] if len(block) == sample_bytes else block
+        if not block.strip():
+            continue
+        table = pacsv.read_csv(pa.BufferReader(block), **options)
+        for field in table.schema:
+            found[field.name].append(field.type)
+    return {name: str(_widen(types)) for name, types in found.items()}
+
+
+def _widen(types):
+    types = [kind for kind in types if not pa.types.is_null(kind)]
+    if not types:
+        return pa.string()
+    if all(kind == types[0] for kind in types):
+        return types[0]
+    if all(pa.types.is_integer(kind) or pa.types.is_floating(kind) for kind in types):
+        return pa.float64()
+    if all(pa.types.is_timestamp(kind) for kind in types):
+        return pa.timestamp("ns")
+    return pa.string()
+
+
+def schema_path(rules_path):
+    """Where the pinned schema of the data a rules YAML applies to is kept."""
+    root, _ = os.path.splitext(os.fspath(rules_path))
+    return f"{root}.schema.yaml"
+
+
+def save_schema(schema, path):
+    """Write an inferred schema as YAML."""
+    with open(path, "w") as f:
+        yaml.safe_dump({"columns": dict(schema)}, f, sort_keys=False)
+
+
+def load_schema(path):
+    """Read a schema written by :func:`save_schema`."""
+    with open(path) as f:
+        columns = (yaml.safe_load(f) or {}).get("columns") or {}
+    for alias in columns.values():
+        try:
+            pa.type_for_alias(alias)
+        except ValueError as error:
+            raise SchemaError(f"{path}: unknown column type {alias!r}") from error
+    return columns
+
+
+def schema_pairs(schema):
+    """A schema dict (or pairs, e.g. read back from JSON) as a tuple of ``(name, type)``."""
+    if schema is None:
+        return None
+    items = schema.items() if isinstance(schema, dict) else schema
+    return tuple((name, alias) for name, alias in items)
+
+
+def pinned_schema(path, schema_file, cache=None):
+    """Load ``schema_file`` if it exists, else infer the schema of ``path`` and save it there.
+
+    A :class:`~datamender.cache.PlanCache` keeps loaded schema files and
+    inferred schemas until the file they come from changes.
+    """
+    if os.path.exists(schema_file):
+        if cache is not None:
+            return cache.get("schema", schema_file, lambda: load_schema(schema_file))
+        return load_schema(schema_file)
+    if cache is not None:
+        schema = cache.get("inferred-schema", path, lambda: infer_csv_schema(path))
+    else:
+        schema = infer_csv_schema(path)
+    save_schema(schema, schema_file)
+    return schema
+
+
+@dataclass(frozen=True)
+class Partition:
+    """An independently readable slice of an input file.
+
+    CSV partitions are newline-aligned byte ranges, Parquet partitions are
+    lists of row groups and Arrow IPC partitions lists of record batches
+    (also stored in ``row_groups``). ``schema`` pins the column types of a
+    CSV partition as ``(name, type)`` pairs. Partitions are small picklable
+    descriptions, so they can be shipped to worker processes.
+    """
+
+    path: str
+    format: str
+    start: int = None
+    end: int = None
+    names: tuple = None
+    row_groups: tuple = None
+    schema: tuple = None
+
+    def iter_chunks(self, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+        """Yield the partition as DataFrames."""
+        if self.format != "csv" or self.schema is not None:
+            return (chunk.to_pandas() for chunk in self.iter_batches(chunksize, columns))
+        if self.start is None:
+            return iter_csv_chunks(self.path, chunksize, columns)
+        return iter_csv_range_chunks(
+            self.path, self.start, self.end, list(self.names), chunksize, columns
+        )
+
+    def iter_batches(self, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+        """Yield the partition as Arrow-backed Chunks."""
+        if self.format == "parquet":
+            return iter_parquet_batches(self.path, chunksize, columns, self.row_groups)
+        if self.format == "arrow":
+            return iter_arrow_batches(self.path, chunksize, columns, self.row_groups)
+        if self.schema is not None:
+            return iter_csv_schema_batches(self.path, self.schema, self.start, self.end,
+                                           self.names, chunksize, columns)
+        return (Chunk.from_pandas(frame) for frame in self.iter_chunks(chunksize, columns))
+
+
+def partition_file(path, parts, schema=None):
+    """Split a file into at most ``parts`` partitions of similar size.
+
+    Compressed CSV cannot be split at byte offsets and always yields a
+    single partition covering the whole file. A ``schema`` is pinned on
+    every CSV partition.
+    """
+    path, schema = os.fspath(path), schema_pairs(schema)
+    file_format = detect_format(path)
+    if file_format in ("parquet", "arrow"):
+        if file_format == "parquet":
+            row_groups = pq.ParquetFile(path).num_row_groups
+        else:
+            try:
+                with pa.memory_map(path) as source:
+                    row_groups = pa.ipc.open_file(source).num_record_batches
+            except pa.ArrowInvalid:
+                return [Partition(path, "arrow")]
+        parts = max(1, min(parts, row_groups))
+        bounds = [round(i * row_groups / parts) for i in range(parts + 1)]
+        return [
+            Partition(path, file_format, row_groups=tuple(range(low, high)))
+            for low, high in zip(bounds, bounds[1:])
+        ]
+    if not path.lower().endswith((".csv", ".tsv", ".txt")):
+        return [Partition(path, "csv", schema=schema)]
+    parts = max(1, min(parts, math.ceil(os.path.getsize(path) / MIN_PARTITION_BYTES)))
+    if parts == 1:
+        return [Partition(path, "csv", schema=schema)]
+    names = tuple(read_csv_header(path))
+    return [
+        Partition(path, "csv", start=start, end=end, names=names, schema=schema)
+        for start, end in csv_byte_ranges(path, parts)
+    ]
+
+
+@dataclass(frozen=True)
+class RowGroupStats:
+    """Footer statistics of one Parquet row group.
+
+    ``columns`` maps a column name to ``(min, max, nulls, kind)``, where
+    ``kind`` is "integer", "float", "datetime" or None. Timestamps are
+    given in nanoseconds; bounds are None when the writer stored no
+    statistics or the column is not numeric or temporal, and ``nulls`` is
+    None when the null count is unknown. Parquet does not count NaN as
+    null, so ``nulls`` says nothing about NaN in "float" columns.
+    """
+
+    index: int
+    offset: int
+    rows: int
+    columns: dict
+
+
+def row_group_stats(path, columns=None):
+    """Return a :class:`RowGroupStats` per row group of a Parquet file."""
+    parquet = pq.ParquetFile(path)
+    metadata = parquet.metadata
+    kinds = {field.name: _stat_kind(field.type) for field in parquet.schema_arrow}
+    groups = []
+    offset = 0
+    for index in range(metadata.num_row_groups):
+        row_group = metadata.row_group(index)
+        stats = {}
+        for position in range(row_group.num_columns):
+            column = row_group.column(position)
+            name = column.path_in_schema
+            if columns is not None and name not in columns:
+                continue
+            statistics = column.statistics
+            low = high = nulls = None
+            if statistics is not None:
+                if statistics.has_min_max:
+                    low, high = _orderable(statistics.min), _orderable(statistics.max)
+                    if low is None or high is None:
+                        low = high = None
+                if statistics.has_null_count:
+                    nulls = statistics.null_count
+            stats[name] = (low, high, nulls, kinds.get(name))
+        groups.append(RowGroupStats(index, offset, row_group.num_rows, stats))
+        offset += row_group.num_rows
+    return groups
+
+
+def _stat_kind(kind):
+    if pa.types.is_integer(kind):
+        return "integer"
+    if pa.types.is_floating(kind):
+        return "float"
+    if pa.types.is_temporal(kind):
+        return "datetime"
+    return None
+
+
+def _orderable(value):
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if hasattr(value, "year"):
+        return pd.Timestamp(value).value
+    return None
+
+
+class ChunkWriter:
+    """Append DataFrame or Arrow chunks to a CSV, Parquet or Arrow IPC file.
+
+    Arrow chunks go to Parquet/IPC as they are, without a pandas round trip.
+    The first chunk fixes the output schema; later chunks are cast to it so
+    that per-chunk dtype drift in CSV input does not break the writer.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.format = detect_format(self.path)
+        self.rows = 0
+        self._file = None
+        self._writer = None
+        self._schema = None
+
+    def write(self, frame):
+        if self.format != "csv":
+            chunk = Chunk.wrap(frame)
+            table = pa.Table.from_batches([chunk.batch])
+            if self._writer is None:
+                self._schema = table.schema
+                if self.format == "parquet":
+                    self._writer = pq.ParquetWriter(self.path, self._schema)
+                else:
+                    self._writer = pa.ipc.new_file(self.path, self._schema)
+            elif not table.schema.equals(self._schema):
+                table = table.cast(self._schema)
+            self._writer.write_table(table)
+            self.rows += len(chunk)
+            return
+        if isinstance(frame, Chunk):
+            frame = frame.to_pandas()
+        if self._file is None:
+            self._file = open(self.path, "w", newline="")
+            frame.to_csv(self._file, sep=_csv_separator(self.path), index=False)
+        else:
+            frame.to_csv(self._file, sep=_csv_separator(self.path), index=False, header=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,295 @@
+"""
+Language-model backends for rule discovery.
+
+A model is anything with a ``name`` and a ``complete(prompt) -> str`` method.
+Real backends (GPT-4, Claude, local models) wrap their SDKs behind this
+interface. :class:`StubModel` is a deterministic local stand-in that
+answers from the profile embedded in the prompt. It is used for tests,
+benchmarks and offline runs.
+
+:class:`HTTPModel` talks to a completion endpoint over plain HTTP, and
+:class:`FakeModelServer` serves stub models on such an endpoint, with
+configurable latency, failures and hangs, for exercising the concurrent
+discovery stage without network access::
+
+    python -m datamender.llm --port 8765 --models 3 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+PROFILE_MARKER = "PROFILE:"
+
+
+class ModelError(RuntimeError):
+    """Raised when a model backend returns an error instead of an answer."""
+
+
+class Model:
+    """Base class for rule-suggestion models."""
+
+    name = "model"
+
+    def complete(self, prompt):
+        """Return the model's raw text answer to ``prompt``."""
+        raise NotImplementedError
+
+    async def acomplete(self, prompt):
+        """Async variant of :meth:`complete`; runs it in a worker thread by default."""
+        return await asyncio.to_thread(self.complete, prompt)
+
+
+class StubModel(Model):
+    """Heuristic offline model that mimics an LLM's rule suggestions.
+
+    ``latency`` seconds are slept per call to emulate a remote round-trip.
+    ``margin`` widens the suggested ranges, so several stubs with different
+    margins behave like models that roughly, but not exactly, agree.
+    """
+
+    def __init__(self, name="stub", latency=0.0, margin=0.1):
+        self.name = name
+        self.latency = latency
+        self.margin = margin
+        self.calls = 0
+
+    def complete(self, prompt):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.answer(prompt)
+
+    async def acomplete(self, prompt):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.answer(prompt)
+
+    def answer(self, prompt):
+        column, summary = parse_prompt(prompt)
+        return json.dumps(self.suggest(column, summary))
+
+    def suggest(self, column, summary):
+        """Return rule dicts for one column summary."""
+        rules = []
+        kind = summary.get("kind")
+        quantiles = summary.get("quantiles") or {}
+        if kind in ("integer", "float"):
+            low, high = quantiles.get("p01"), quantiles.get("p99")
+            if summary.get("negatives") and (low is None or low >= 0):
+                rules.append({"check": "non_negative", "action": "abs", "confidence": 0.7,
+                              "reason": "only a small tail of values is negative"})
+            if low is not None and high is not None and high > low:
+                span = (high - low) * self.margin
+                bounds = {"min": _nice(low - span), "max": _nice(high + span)}
+                if low >= 0 or not summary.get("negatives"):
+                    bounds["min"] = max(0, bounds["min"])
+                rules.append({"check": "range", **bounds, "action": "clip", "confidence": 0.6,
+                              "reason": "values outside the 1st-99th percentile band"})
+            if summary.get("missing_pct") and quantiles.get("p50") is not None:
+                rules.append({"check": "not_null", "action": "fill",
+                              "value": _nice(quantiles["p50"]), "confidence": 0.5,
+                              "reason": "fill gaps with the median"})
+        elif kind == "string" and summary.get("missing_pct") and summary.get("top_values"):
+            top = summary["top_values"][0]
+            value = top[0] if isinstance(top, list) else top["value"]
+            rules.append({"check": "not_null", "action": "fill", "value": value,
+                          "confidence": 0.4, "reason": "fill gaps with the most common value"})
+        return rules
+
+
+class HTTPModel(Model):
+    """Model behind an HTTP endpoint taking ``{"prompt"}`` and returning ``{"text"}``.
+
+    Uses a bare asyncio connection per call, so no HTTP client library is
+    needed and cancelling the calling task closes the socket.
+    """
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+
+    def complete(self, prompt):
+        return asyncio.run(self.acomplete(prompt))
+
+    async def acomplete(self, prompt):
+        body = json.dumps({"model": self.name, "prompt": prompt}).encode()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(
+                f"POST {self.path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            status, _, payload = await _read_http(reader)
+        finally:
+            writer.close()
+        if status != 200:
+            raise ModelError(f"{self.name}: HTTP {status} {payload[:200].decode(errors='replace')}")
+        return json.loads(payload)["text"]
+
+
+class FakeModelServer:
+    """Local HTTP server answering for several stub models.
+
+    Requests go to ``/v1/models/<name>/complete``. ``failure_rate`` of them
+    get an HTTP 503 and ``hang_rate`` never get an answer, so clients must
+    retry and time out. Use it as an async context manager.
+    """
+
+    def __init__(self, models, host="127.0.0.1", port=0, failure_rate=0.0,
+                 hang_rate=0.0, seed=0):
+        self.models = {model.name: model for model in models}
+        self.host = host
+        self.port = port
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.hangs = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def url(self, name):
+        return f"http://{self.host}:{self.port}/v1/models/{name}/complete"
+
+    def clients(self):
+        """Return an :class:`HTTPModel` for every served model."""
+        return [HTTPModel(name, self.url(name)) for name in self.models]
+
+    async def _handle(self, reader, writer):
+        try:
+            _, path, body = await _read_http(reader, request=True)
+            self.requests += 1
+            name = path.strip("/").split("/")[2] if path.count("/") >= 3 else None
+            roll = self.random.random()
+            if name not in self.models:
+                status, payload = 404, {"error": f"unknown model {name!r}"}
+            elif roll < self.failure_rate:
+                self.failures += 1
+                status, payload = 503, {"error": "overloaded"}
+            elif roll < self.failure_rate + self.hang_rate:
+                self.hangs += 1
+                try:
+                    await asyncio.sleep(3600)
+                except asyncio.CancelledError:
+                    # Server shutdown; the client gave up on this call long ago.
+                    pass
+                return
+            else:
+                prompt = json.loads(body)["prompt"]
+                status, payload = 200, {"text": await self.models[name].acomplete(prompt)}
+            data = json.dumps(payload).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+        except (ConnectionError, ModelError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _read_http(reader, request=False):
+    """Read one HTTP/1.1 message; returns (status or method, path, body).
+
+    A missing or malformed start line and a body shorter than its
+    Content-Length raise ModelError.
+    """
+    line = await reader.readline()
+    start = line.decode(errors="replace").split()
+    if len(start) < 2 or not request and not start[1].isdigit():
+        raise ModelError(f"Malformed HTTP start line {line[:80]!r}")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode(errors="replace").partition(":")
+        if name.strip().lower() == "content-length":
+            if not value.strip().isdigit():
+                raise ModelError(f"Malformed Content-Length {value.strip()!r}")
+            length = int(value)
+    try:
+        body = await reader.readexactly(length) if length else b""
+    except asyncio.IncompleteReadError as exc:
+        raise ModelError(f"HTTP body truncated after {len(exc.partial)} of {length} bytes") \
+            from exc
+    if request:
+        return start[0], start[1], body
+    return int(start[1]), None, body
+
+
+def parse_prompt(prompt):
+    """Extract ``(column, summary)`` from a discovery prompt."""
+    column = None
+    for line in prompt.splitlines():
+        if line.startswith("COLUMN:"):
+            column = line.split(":", 1)[1].strip()
+    body = prompt.split(PROFILE_MARKER, 1)[1]
+    summary, _ = json.JSONDecoder().raw_decode(body.strip())
+    return column, summary
+
+
+def _nice(value):
+    """Round to 3 significant digits, like a human (or an LLM) would."""
+    if not value:
+        return 0
+    return float(f"{value:.3g}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve offline stub models over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--models", type=int, default=3, help="number of stub models to serve")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per answer")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    models = [StubModel(f"stub-{i}", latency=args.latency, margin=0.05 * (i + 1))
+              for i in range(args.models)]
+
+    async def serve():
+        async with FakeModelServer(models, args.host, args.port, args.failure_rate,
+                                   args.hang_rate) as server:
+            for name in server.models:
+                print(f"✅ Serving {name} at {server.url(name)}")
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
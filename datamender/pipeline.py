@@ -0,0 +1,403 @@
+"""
+Lazy pipelines: describe input → rules → outputs, run them in one scan.
+
+Run one after the other, profiling, validating, fixing, re-profiling and
+exporting each read the file again (plan.md, Weeks 2–6). A
+:class:`Pipeline` only records what is wanted. :meth:`Pipeline.plan`
+works out the columns each step needs and fuses all steps into a single
+read of the input, with one write per export::
+
+    pipeline = (Pipeline("trips.csv")
+                .profile("pre.json")
+                .validate("constraints.json", constraints="rules.yaml")
+                .fix("rules.yaml")
+                .profile("post.json")
+                .export("clean.parquet"))
+    print(pipeline.plan().explain())
+    report = pipeline.run()
+
+Steps see the data as it is at their place in the pipeline: before
+:meth:`~Pipeline.fix` the raw input, after it the cleaned rows. Only the
+columns some step needs are read (projection pruning). A post-clean
+profile that follows a pre-clean profile of the same columns, in a
+pipeline whose rules drop no rows, only re-accumulates the columns the
+rules rewrite and patches the pre-clean profile. Pipelines can also be
+written in YAML and run from the command line::
+
+    input: trips.csv
+    schema: trips.schema.yaml      # optional, pins CSV column types
+    steps:
+      - profile: pre.json
+      - validate: constraints.json
+        constraints: rules.yaml    # default: the rules of the fix step
+      - fix: rules.yaml
+      - profile: post.json
+      - export: clean.parquet
+        columns: [trip_id, fare_amount, total_amount]
+
+    python -m datamender.pipeline job.yaml --explain
+"""
+
+import argparse
+import json
+import os
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+import yaml
+
+from datamender.cache import plan_cache
+from datamender.constraints import ConstraintSuite, constraint_columns, load_constraints
+from datamender.fixer import compile_plan, iter_plan_batches
+from datamender.io import (
+    DEFAULT_CHUNKSIZE, ChunkWriter, Partition, detect_format, iter_batches, pinned_schema,
+    schema_pairs,
+)
+from datamender.profiler import DEFAULT_BINS, DEFAULT_TOP_K, Profiler, save_profile
+from datamender.trace import NULL_TRACER, add_trace_arguments, save_trace, tracer_from_args
+
+STEPS = ("profile", "validate", "fix", "export")
+
+
+class PipelineError(ValueError):
+    """A pipeline description that cannot be planned."""
+
+
+@dataclass
+class Step:
+    """One requested output of a pipeline.
+
+    ``cleaned`` steps come after the fix step and see the cleaned rows.
+    ``columns`` is the projection the step asked for (None for all).
+    """
+
+    kind: str
+    path: str = None
+    columns: tuple = None
+    cleaned: bool = False
+    options: dict = field(default_factory=dict)
+
+
+@dataclass
+class PipelinePlan:
+    """How a pipeline runs: one scan of ``read_columns`` feeding every step in order.
+
+    ``constraints`` maps the index of a validate step to its constraints;
+    ``reprofile`` maps the index of a post-clean profile step to the index
+    of the pre-clean profile it patches and the columns it re-accumulates.
+    """
+
+    input: str
+    format: str
+    steps: list
+    read_columns: tuple = None
+    fix: object = None
+    constraints: dict = field(default_factory=dict)
+    reprofile: dict = field(default_factory=dict)
+
+    @property
+    def scans(self):
+        return 1
+
+    @property
+    def writes(self):
+        return sum(step.kind == "export" for step in self.steps)
+
+    def step_columns(self, index):
+        """The columns step ``index`` reads (None for all)."""
+        step = self.steps[index]
+        if index in self.reprofile:
+            return self.reprofile[index][1]
+        if step.kind == "validate":
+            return tuple(constraint_columns(self.constraints[index]))
+        if step.kind == "fix":
+            return tuple(self.fix.columns)
+        return step.columns
+
+    def explain(self):
+        """A readable description of the plan."""
+        read = ", ".join(self.read_columns) if self.read_columns is not None else "all"
+        lines = [f"Pipeline over {self.input} ({self.format}): {len(self.steps)} steps in "
+                 f"{self.scans} scan (instead of {len(self.steps)}), {self.writes} "
+                 f"write{'s' if self.writes != 1 else ''}",
+                 f"  read columns: {read}"]
+        for index, step in enumerate(self.steps):
+            columns = self.step_columns(index)
+            detail = ", ".join(columns) if columns is not None else "all columns"
+            if step.kind == "fix":
+                detail = f"{len(self.fix.rules)} rules on {detail}"
+            elif index in self.reprofile:
+                detail = f"re-accumulates {detail or 'nothing'} " \
+                         f"(patches step {self.reprofile[index][0] + 1})"
+            target = f" → {step.path}" if step.path else ""
+            lines.append(f"  {index + 1}. {step.kind:<9}{'cleaned' if step.cleaned else 'raw':<9}"
+                         f"{detail}{target}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            "scans": self.scans,
+            "writes": self.writes,
+            "read_columns": list(self.read_columns) if self.read_columns is not None else None,
+            "steps": [{"step": step.kind, "path": step.path, "cleaned": step.cleaned,
+                       "columns": _listed(self.step_columns(index))}
+                      for index, step in enumerate(self.steps)],
+        }
+
+
+class Pipeline:
+    """A lazily built chain of profile, validate, fix and export steps over one input."""
+
+    def __init__(self, input_path, chunksize=DEFAULT_CHUNKSIZE, schema=None, workers=1,
+                 cache=None):
+        self.input = os.fspath(input_path)
+        self.chunksize = chunksize
+        self.schema = schema
+        self.workers = workers
+        self.cache = cache
+        self.steps = []
+
+    def profile(self, path=None, columns=None, bins=DEFAULT_BINS, top_k=DEFAULT_TOP_K):
+        """Profile the data at this point (written as JSON to ``path``)."""
+        return self._add("profile", path, columns, bins=bins, top_k=top_k)
+
+    def validate(self, path=None, constraints=None):
+        """Check constraints (a list or rules YAML; default the fix rules) on the data here."""
+        return self._add("validate", path, constraints=constraints)
+
+    def fix(self, rules):
+        """Apply accepted rules (a list, FixPlan or rules YAML); later steps see the result."""
+        if any(step.kind == "fix" for step in self.steps):
+            raise PipelineError("A pipeline has at most one fix step")
+        return self._add("fix", rules=rules)
+
+    def export(self, path, columns=None):
+        """Write the data at this point (format from the extension of ``path``)."""
+        return self._add("export", path, columns)
+
+    def _add(self, kind, path=None, columns=None, **options):
+        cleaned = any(step.kind == "fix" for step in self.steps)
+        columns = tuple(columns) if columns is not None else None
+        self.steps.append(Step(kind, os.fspath(path) if path else None, columns, cleaned,
+                               options))
+        return self
+
+    @classmethod
+    def from_dict(cls, document, cache=None):
+        """Build a pipeline from a YAML/JSON description (see the module docstring).
+
+        A :class:`~datamender.cache.PlanCache` keeps its rule plan and schema.
+        """
+        if "input" not in document:
+            raise PipelineError("A pipeline needs an 'input'")
+        schema = document.get("schema")
+        if schema and detect_format(document["input"]) == "csv":
+            schema = pinned_schema(document["input"], schema, cache)
+        pipeline = cls(document["input"], chunksize=document.get("chunksize", DEFAULT_CHUNKSIZE),
+                       schema=schema or None, workers=document.get("workers", 1), cache=cache)
+        for entry in document.get("steps") or []:
+            kinds = [kind for kind in STEPS if kind in entry]
+            if len(kinds) != 1:
+                raise PipelineError(f"Step {entry!r} must have exactly one of {', '.join(STEPS)}")
+            kind = kinds[0]
+            options = {key: value for key, value in entry.items() if key != kind}
+            if kind == "fix":
+                pipeline.fix(entry[kind])
+            else:
+                getattr(pipeline, kind)(entry[kind], **options)
+        return pipeline
+
+    def plan(self):
+        """Resolve rules and constraints and plan the single fused scan."""
+        fmt = detect_format(self.input)
+        plan = PipelinePlan(self.input, fmt, list(self.steps))
+        fix_rules = None
+        for step in self.steps:
+            if step.kind == "fix":
+                fix_rules = step.options["rules"]
+                plan.fix = compile_plan(fix_rules, self.cache)
+        for index, step in enumerate(self.steps):
+            if step.kind != "validate":
+                continue
+            constraints = step.options.get("constraints")
+            if constraints is None:
+                if not isinstance(fix_rules, (str, os.PathLike)):
+                    raise PipelineError("A validate step needs 'constraints' unless the fix "
+                                        "step reads a rules YAML file")
+                constraints = fix_rules
+            if isinstance(constraints, (str, os.PathLike)):
+                constraints = load_constraints(constraints)
+            plan.constraints[index] = constraints
+
+        if plan.fix is not None and not plan.fix.drops_rows:
+            for index, step in enumerate(self.steps):
+                if step.kind != "profile" or not step.cleaned:
+                    continue
+                for base, earlier in enumerate(self.steps[:index]):
+                    if earlier.kind == "profile" and not earlier.cleaned \
+                            and earlier.columns == step.columns:
+                        written = tuple(name for name in plan.fix.written_columns
+                                        if step.columns is None or name in step.columns)
+                        plan.reprofile[index] = (base, written)
+                        break
+
+        needed = [plan.step_columns(index) for index in range(len(self.steps))]
+        if needed and all(columns is not None for columns in needed):
+            plan.read_columns = tuple(dict.fromkeys(name for columns in needed
+                                                    for name in columns))
+        return plan
+
+    def run(self, tracer=None):
+        """Plan the pipeline and run it in one scan; returns a report per step."""
+        tracer = tracer or NULL_TRACER
+        started = time.perf_counter()
+        plan = self.plan()
+        seconds = [0.0] * len(plan.steps)
+        profilers, suites, writers = {}, {}, {}
+        rows_in = rows_skipped = 0
+        with ExitStack() as stack:
+            for index, step in enumerate(plan.steps):
+                if step.kind == "profile":
+                    profilers[index] = Profiler(bins=step.options["bins"],
+                                                top_k=step.options["top_k"])
+                elif step.kind == "validate":
+                    suites[index] = stack.enter_context(ConstraintSuite(plan.constraints[index]))
+                elif step.kind == "export":
+                    writers[index] = stack.enter_context(ChunkWriter(step.path))
+            reader = self._reader(plan, tracer)
+            while True:
+                tick = time.perf_counter()
+                chunk, active = next(reader, (None, None))
+                if chunk is None:
+                    break
+                tracer.record("pipeline.read", tick, time.perf_counter() - tick, rows=len(chunk))
+                rows_in += len(chunk)
+                data = chunk
+                for index, step in enumerate(plan.steps):
+                    tick = time.perf_counter()
+                    columns = plan.step_columns(index)
+                    if step.kind == "fix":
+                        if active is not None and not any(active):
+                            rows_skipped += len(data)
+                            data = plan.fix.passthrough(data)
+                        else:
+                            data = plan.fix.apply(data, active=active, tracer=tracer)
+                    elif step.kind == "profile":
+                        profilers[index].update(data if columns is None else data.select(columns))
+                    elif step.kind == "validate":
+                        suites[index].update(data)
+                    else:
+                        writers[index].write(data if columns is None else data.select(columns))
+                    elapsed = time.perf_counter() - tick
+                    seconds[index] += elapsed
+                    tracer.record(step.kind, tick, elapsed, rows=len(data))
+            validated = {index: suite.finish() for index, suite in suites.items()}
+
+        rows_out = rows_in
+        profiles, steps = {}, []
+        for index, step in enumerate(plan.steps):
+            entry = {"step": step.kind, "path": step.path, "cleaned": step.cleaned,
+                     "seconds": round(seconds[index], 6)}
+            if step.kind == "fix":
+                rows_out = rows_in - sum(stats.dropped for stats in plan.fix.stats)
+                entry.update(rows_dropped=rows_in - rows_out, rows_skipped=rows_skipped,
+                             verify_seconds=round(plan.fix.verify_seconds, 6),
+                             anomalies=plan.fix.anomalies(),
+                             rules=[stats.to_dict() for stats in plan.fix.stats])
+            elif step.kind == "profile":
+                profiles[index] = profile = self._profile(plan, index, profilers, profiles)
+                profile["elapsed_seconds"] = entry["seconds"]
+                entry.update(rows=profile["rows"], profile=profile)
+                if step.path:
+                    save_profile(profile, step.path)
+            elif step.kind == "validate":
+                entry["results"] = [result.to_dict() for result in validated[index]]
+                if step.path:
+                    with open(step.path, "w") as f:
+                        json.dump(entry["results"], f, indent=2)
+            else:
+                entry["rows"] = writers[index].rows
+            steps.append(entry)
+
+        report = {
+            "input": self.input,
+            "plan": plan.to_dict(),
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "steps": steps,
+            "elapsed_seconds": round(time.perf_counter() - started, 6),
+        }
+        written = sum(os.path.getsize(step.path) for step in plan.steps if step.kind == "export")
+        tracer.record("pipeline", started, report["elapsed_seconds"], rows=rows_in,
+                      bytes_read=os.path.getsize(self.input), bytes_written=written)
+        return report
+
+    def _reader(self, plan, tracer):
+        if plan.fix is None:
+            return ((chunk, None) for chunk in iter_batches(
+                self.input, self.chunksize, plan.read_columns, schema=self.schema,
+                workers=self.workers, tracer=tracer))
+        partition = Partition(self.input, plan.format, schema=schema_pairs(self.schema))
+        return iter_plan_batches(partition, plan.fix, self.chunksize, self.workers, tracer,
+                                 plan.read_columns)
+
+    def _profile(self, plan, index, profilers, profiles):
+        step, profiler = plan.steps[index], profilers[index]
+        source = self.input
+        if step.cleaned:
+            source = next((other.path for other in plan.steps
+                           if other.kind == "export" and other.cleaned), self.input)
+        if index in plan.reprofile:
+            return profiler.patch(profiles[plan.reprofile[index][0]], path=source)
+        profile = {"path": source, "format": detect_format(source),
+                   "bins": profiler.bins, "top_k": profiler.top_k}
+        profile.update(profiler.to_dict())
+        return profile
+
+
+def load_pipeline(path, cache=None):
+    """Read a pipeline description from a YAML file."""
+    with open(path) as f:
+        return Pipeline.from_dict(yaml.safe_load(f) or {}, cache)
+
+
+def _listed(columns):
+    return list(columns) if columns is not None else None
+
+
+def main(argv=None):
+    """Plan and run a pipeline described in YAML."""
+    parser = argparse.ArgumentParser(description="Run profile/validate/fix/export in one scan.")
+    parser.add_argument("pipeline", help="pipeline YAML file")
+    parser.add_argument("--explain", action="store_true", help="print the plan and stop")
+    parser.add_argument("--chunksize", type=int, help="override the pipeline's chunk size")
+    parser.add_argument("--workers", type=int, help="parse a schema-pinned CSV in this many "
+                                                    "processes")
+    parser.add_argument("--report", help="write the run report as JSON")
+    add_trace_arguments(parser)
+    args = parser.parse_args(argv)
+
+    pipeline = load_pipeline(args.pipeline, plan_cache())
+    if args.chunksize:
+        pipeline.chunksize = args.chunksize
+    if args.workers:
+        pipeline.workers = args.workers
+    print(pipeline.plan().explain())
+    if args.explain:
+        return
+    tracer = tracer_from_args(args)
+    report = pipeline.run(tracer=tracer)
+    print(f"✅ {report['rows_in']:,} rows → {report['rows_out']:,} rows in "
+          f"{report['elapsed_seconds']:.2f}s")
+    for entry in report["steps"]:
+        target = f" → {entry['path']}" if entry["path"] else ""
+        print(f"   {entry['step']:<9} {entry['seconds']:8.2f}s{target}")
+    if args.report:
+        save_profile(report, args.report)
+        print(f"✅ Report → {args.report}")
+    save_trace(tracer, args)
+
+
+if __name__ == "__main__":
+    main()
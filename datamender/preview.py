@@ -0,0 +1,434 @@
+"""
+Rule impact preview without reading the data (plan.md, Week 7).
+
+Reviewers tune thresholds interactively, so a preview cannot afford a pass
+over a 10 GB file. :func:`preview_rules` answers from what profiling
+already captured:
+
+* ``not_null`` and numeric ``non_negative`` rules use the exact missing and
+  negative counters of the profile;
+* ``range`` rules (and datetime ``non_negative``) integrate the column
+  histogram up to the bounds, assuming values spread evenly inside a bin;
+  the bins a bound cuts through give the lower and upper bound reported
+  next to the estimate;
+* ``order`` rules compare two columns, which no per-column summary can
+  answer, so they are evaluated on the uniform stratum of the profiling
+  sample (``python -m datamender.profiler --sample``), with a 95% Wilson
+  interval.
+
+Each rule is previewed on the raw data, independently of the rules before
+it. The estimated shift of the column (count, missing %, mean, and the
+extremes after a clip) comes from the same histogram, and rows of the
+stratified sample the rule would touch are listed as examples.
+
+:func:`exact_impact` counts affected rows exactly. For Parquet input it
+reads only the row groups whose footer min/max and null counts say they
+could contain a violation::
+
+    python -m datamender.preview profile.json rules.yaml --sample sample.parquet
+    python -m datamender.preview profile.json rules.yaml --exact trips.parquet
+"""
+
+import argparse
+import json
+import math
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from datamender.chunk import Chunk
+from datamender.fixer import MASKS, Workspace, could_violate
+from datamender.io import DEFAULT_CHUNKSIZE, detect_format, iter_batches, iter_parquet_batches, \
+    row_group_stats
+from datamender.profiler import load_profile
+from datamender.rules import load_rules
+
+DEFAULT_EXAMPLES = 5
+# Two-sided 95% normal quantile for the Wilson interval on sample estimates.
+Z_95 = 1.959964
+UNIFORM_STRATUM = "*"
+
+
+@dataclass
+class Impact:
+    """Estimated (or, with ``method="scan"``, exact) effect of one rule.
+
+    ``affected`` is the number of rows the rule's check flags, with
+    ``low``/``high`` bounding the estimate. ``method`` says where the number
+    came from: ``profile`` (exact counters), ``histogram``, ``sample``,
+    ``scan`` or ``unavailable``.
+    """
+
+    rule_id: str
+    check: str
+    action: str
+    columns: tuple
+    method: str
+    affected: int = None
+    low: int = None
+    high: int = None
+    rows: int = 0
+    shift: dict = field(default_factory=dict)
+    examples: list = field(default_factory=list)
+    row_groups: list = None
+    seconds: float = 0.0
+
+    @property
+    def affected_pct(self):
+        if self.affected is None or not self.rows:
+            return None
+        return round(100.0 * self.affected / self.rows, 4)
+
+    @property
+    def dropped(self):
+        return self.affected if self.action == "drop" else 0
+
+    def to_dict(self):
+        data = {
+            "id": self.rule_id,
+            "check": self.check,
+            "action": self.action,
+            "columns": list(self.columns),
+            "method": self.method,
+            "affected": self.affected,
+            "affected_pct": self.affected_pct,
+            "bounds": [self.low, self.high],
+            "dropped": self.dropped,
+            "shift": self.shift,
+            "examples": self.examples,
+            "seconds": round(self.seconds, 6),
+        }
+        if self.row_groups is not None:
+            data["row_groups"] = self.row_groups
+        return data
+
+
+def preview_rules(profile, rules, sample=None, examples=DEFAULT_EXAMPLES):
+    """Estimate the impact of each rule from a profile and optional sample.
+
+    ``profile`` is a profile dict or JSON path, ``rules`` a list of rules or
+    a rules YAML path (every rule that is not rejected is previewed) and
+    ``sample`` the stratified sample as a DataFrame or CSV/Parquet path.
+    """
+    if isinstance(profile, str):
+        profile = load_profile(profile)
+    rules = _load(rules)
+    if isinstance(sample, str):
+        sample = next(iter_batches(sample, chunksize=10 ** 9), None)
+        sample = sample.to_pandas() if sample is not None else None
+    uniform = None
+    if sample is not None and "__strata" in sample.columns:
+        strata = sample["__strata"].astype(str).str.split(";")
+        uniform = sample[strata.map(lambda keys: UNIFORM_STRATUM in keys)]
+        sample = sample.drop(columns="__strata")
+        uniform = uniform.drop(columns="__strata")
+    elif sample is not None:
+        uniform = sample
+
+    impacts = []
+    for rule in rules:
+        started = time.perf_counter()
+        impact = Impact(rule.id, rule.check, rule.action, rule.columns, "unavailable",
+                        rows=profile["rows"])
+        summary = profile["columns"].get(rule.column)
+        if summary is not None and all(name in profile["columns"] for name in rule.columns):
+            if rule.check == "order":
+                _from_sample(impact, rule, uniform)
+            else:
+                _from_profile(impact, rule, summary)
+        if sample is not None and examples:
+            impact.examples = _examples(rule, sample, examples)
+        impact.seconds = time.perf_counter() - started
+        impacts.append(impact)
+    return impacts
+
+
+def _load(rules):
+    if isinstance(rules, str):
+        rules = load_rules(rules, accepted_only=False)
+    return [rule for rule in rules if rule.status != "rejected"]
+
+
+def _from_profile(impact, rule, summary):
+    missing, count = summary.get("missing", 0), summary.get("count", 0)
+    shift = {"count": [count, count], "missing_pct": [summary.get("missing_pct", 0.0)] * 2}
+    impact.shift = shift
+    if rule.check == "not_null":
+        impact.method = "profile"
+        impact.affected = impact.low = impact.high = missing
+        if rule.action == "fill":
+            shift["count"][1] = count + missing
+            mean = _value(summary, "mean")
+            if mean is not None and count + missing:
+                filled = _scalar(summary, rule.value)
+                if filled is not None:
+                    shift["mean"] = _pair(summary, mean, (mean * count + filled * missing)
+                                          / (count + missing))
+        shift["missing_pct"][1] = 0.0
+        return
+
+    histogram = summary.get("histogram")
+    if summary.get("kind") not in ("integer", "float", "datetime") or not histogram \
+            or not histogram["counts"]:
+        return
+    edges = np.array([_scalar(summary, edge) for edge in histogram["edges"]], dtype=np.float64)
+    counts = np.array(histogram["counts"], dtype=np.float64)
+    if rule.check == "non_negative":
+        low_bound, high_bound = 0.0, None
+    else:
+        low_bound, high_bound = _scalar(summary, rule.min), _scalar(summary, rule.max)
+    minimum, maximum = _value(summary, "min"), _value(summary, "max")
+    if low_bound is not None and minimum is not None and low_bound <= minimum:
+        low_bound = None
+    if high_bound is not None and maximum is not None and high_bound >= maximum:
+        high_bound = None
+
+    knots = _knots(summary, edges, counts)
+    estimate, lower, upper = _outside(edges, counts, knots, low_bound, high_bound)
+    impact.method = "histogram"
+    if rule.check == "non_negative" and "negatives" in summary:
+        impact.method = "profile"
+        estimate = lower = upper = summary["negatives"]
+    impact.affected, impact.low, impact.high = (int(round(estimate)), int(lower),
+                                                int(math.ceil(upper)))
+
+    mean = _value(summary, "mean")
+    before_mean, after_mean = _shifted(knots, low_bound, high_bound, rule.action)
+    if mean is not None and before_mean is not None and after_mean is not None:
+        shift["mean"] = _pair(summary, mean, mean + after_mean - before_mean)
+    if rule.action in ("drop", "null"):
+        removed = impact.affected
+        shift["count"][1] = count - removed
+        if rule.action == "null":
+            rows = count + missing
+            shift["missing_pct"][1] = round(100.0 * (missing + removed) / rows, 4) if rows else 0.0
+    elif rule.action == "clip" and minimum is not None:
+        low_after = max(minimum, low_bound) if low_bound is not None else minimum
+        high_after = min(maximum, high_bound) if high_bound is not None else maximum
+        shift["min"] = _pair(summary, minimum, low_after)
+        shift["max"] = _pair(summary, maximum, high_after)
+
+
+def _knots(summary, edges, counts):
+    """A piecewise-linear CDF: the histogram edges refined by quantiles and extremes.
+
+    Outliers can stretch the bins until one bin holds most of the column;
+    the KLL quantiles and the exact min/max then say where inside that bin
+    the mass sits. Their ranks are clamped to the bin they fall in, so the
+    knots never contradict the exact histogram counts.
+    """
+    cumulative = np.concatenate([[0.0], np.cumsum(counts)])
+    total = cumulative[-1]
+    points = [(_value(summary, "min"), 0.0), (_value(summary, "max"), total)]
+    points += [(_scalar(summary, value), float(key[1:]) / 100 * total)
+               for key, value in summary.get("quantiles", {}).items()]
+    values, ranks = [edges], [cumulative]
+    for value, rank in points:
+        if value is None:
+            continue
+        position = int(np.clip(np.searchsorted(edges, value, side="right") - 1, 0, counts.size - 1))
+        values.append([value])
+        ranks.append([np.clip(rank, cumulative[position], cumulative[position + 1])])
+    values, ranks = np.concatenate(values), np.concatenate(ranks)
+    order = np.lexsort((ranks, values))
+    return values[order], np.maximum.accumulate(ranks[order])
+
+
+def _outside(edges, counts, knots, low, high):
+    """Mass below ``low`` and above ``high``: (estimate, lower, upper).
+
+    The bounds count only the bins that lie wholly (lower) or partly
+    (upper) beyond a bound; the estimate interpolates the knots.
+    """
+    starts, ends = edges[:-1], edges[1:]
+    total = float(counts.sum())
+    estimate = lower = upper = 0.0
+    if low is not None:
+        estimate += float(np.interp(low, *knots))
+        lower += float(counts[ends <= low].sum())
+        upper += float(counts[starts < low].sum())
+    if high is not None:
+        estimate += total - float(np.interp(high, *knots))
+        lower += float(counts[starts > high].sum())
+        upper += float(counts[ends > high].sum())
+    return min(max(estimate, lower), upper), lower, upper
+
+
+def _shifted(knots, low, high, action):
+    """Means before and after the action (None when nothing is left).
+
+    The CDF is cut at the bounds first, so whole pieces fall on either
+    side; each piece is represented by its midpoint.
+    """
+    values, ranks = knots
+    cuts = [bound for bound in (low, high) if bound is not None and values[0] < bound < values[-1]]
+    fine = np.union1d(values, cuts)
+    cumulative = np.interp(fine, values, ranks)
+    mass = np.diff(cumulative)
+    points = (fine[:-1] + fine[1:]) / 2
+    total = mass.sum()
+    if not total:
+        return None, None
+    below = points < low if low is not None else np.zeros(points.size, dtype=bool)
+    above = points > high if high is not None else np.zeros(points.size, dtype=bool)
+    after = points.copy()
+    kept = mass.copy()
+    if action in ("drop", "null"):
+        kept[below | above] = 0.0
+    elif action == "abs":
+        after[below] = -after[below]
+    else:
+        after[below] = low
+        after[above] = high
+    left = kept.sum()
+    mean_after = float((after * kept).sum() / left) if left else None
+    return float((points * mass).sum() / total), mean_after
+
+
+def _from_sample(impact, rule, uniform):
+    if uniform is None or uniform.empty:
+        return
+    mask = _mask(rule, uniform)
+    if mask is None:
+        return
+    size, hits = len(mask), int(mask.sum())
+    share = hits / size
+    centre = (share + Z_95 ** 2 / (2 * size)) / (1 + Z_95 ** 2 / size)
+    margin = Z_95 * math.sqrt(share * (1 - share) / size + Z_95 ** 2 / (4 * size ** 2)) \
+        / (1 + Z_95 ** 2 / size)
+    impact.method = "sample"
+    impact.affected = int(round(share * impact.rows))
+    impact.low = int(max(0.0, centre - margin) * impact.rows)
+    impact.high = int(math.ceil(min(1.0, centre + margin) * impact.rows))
+    impact.shift = {"sample_rows": size, "sample_hits": hits}
+
+
+def _mask(rule, frame):
+    if any(name not in frame.columns for name in rule.columns):
+        return None
+    work = Workspace(Chunk.from_pandas(frame[list(rule.columns)].reset_index(drop=True)))
+    return MASKS[rule.check](rule, work)
+
+
+def _examples(rule, sample, limit):
+    mask = _mask(rule, sample)
+    if mask is None:
+        return []
+    rows = sample.iloc[np.flatnonzero(mask)[:limit]]
+    return json.loads(rows.to_json(orient="records", date_format="iso"))
+
+
+def _scalar(summary, value):
+    """A bound or profile value as a float (nanoseconds for datetime columns)."""
+    if value is None:
+        return None
+    if summary.get("kind") == "datetime":
+        return float(pd.Timestamp(value).value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _value(summary, key):
+    return _scalar(summary, summary.get(key))
+
+
+def _pair(summary, before, after):
+    if summary.get("kind") == "datetime":
+        return [pd.Timestamp(int(value)).floor("s").isoformat() for value in (before, after)]
+    return [round(before, 6), round(after, 6)]
+
+
+def exact_impact(path, rules, chunksize=DEFAULT_CHUNKSIZE, examples=DEFAULT_EXAMPLES):
+    """Count the rows each rule flags by reading the data.
+
+    Parquet row groups whose footer statistics rule out every violation of
+    a rule are not evaluated for it, and row groups no rule needs are not
+    read at all. ``examples`` row ids (counted from 0) are kept per rule.
+    """
+    rules = _load(rules)
+    columns = list(dict.fromkeys(name for rule in rules for name in rule.columns))
+    impacts = [Impact(rule.id, rule.check, rule.action, rule.columns, "scan") for rule in rules]
+    started = time.perf_counter()
+    for impact in impacts:
+        impact.affected = 0
+
+    if detect_format(path) == "parquet":
+        groups = row_group_stats(path, columns)
+        wanted = [[could_violate(rule, group.columns) for group in groups] for rule in rules]
+        for impact, flags in zip(impacts, wanted):
+            impact.rows = sum(group.rows for group in groups)
+            impact.row_groups = [sum(flags), len(groups)]
+        for position, group in enumerate(groups):
+            active = [i for i, flags in enumerate(wanted) if flags[position]]
+            if not active:
+                continue
+            offset = group.offset
+            for chunk in iter_parquet_batches(path, chunksize, columns, [group.index]):
+                _count(chunk, offset, [(rules[i], impacts[i]) for i in active], examples)
+                offset += len(chunk)
+    else:
+        offset = 0
+        for chunk in iter_batches(path, chunksize=chunksize, columns=columns):
+            _count(chunk, offset, list(zip(rules, impacts)), examples)
+            offset += len(chunk)
+        for impact in impacts:
+            impact.rows = offset
+
+    for impact in impacts:
+        impact.low = impact.high = impact.affected
+        impact.seconds = time.perf_counter() - started
+    return impacts
+
+
+def _count(chunk, offset, pairs, examples):
+    work = Workspace(chunk)
+    for rule, impact in pairs:
+        mask = MASKS[rule.check](rule, work)
+        impact.affected += int(mask.sum())
+        room = examples - len(impact.examples)
+        if room > 0:
+            impact.examples += (np.flatnonzero(mask)[:room] + offset).tolist()
+
+
+def main(argv=None):
+    """Preview the impact of rules from a profile (and sample) or an exact scan."""
+    parser = argparse.ArgumentParser(description="Preview how many rows each rule would affect.")
+    parser.add_argument("profile", help="profile JSON written by datamender.profiler")
+    parser.add_argument("rules", help="rules YAML (all rules that are not rejected)")
+    parser.add_argument("--sample", help="stratified sample from datamender.profiler --sample")
+    parser.add_argument("--exact", metavar="DATA",
+                        help="count exactly on this file instead of estimating")
+    parser.add_argument("--examples", type=int, default=DEFAULT_EXAMPLES)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("-o", "--output", help="write the preview as JSON")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.exact:
+        impacts = exact_impact(args.exact, args.rules, args.chunksize, args.examples)
+    else:
+        impacts = preview_rules(args.profile, args.rules, args.sample, args.examples)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Previewed {len(impacts)} rules in {elapsed * 1000:.1f} ms")
+    for impact in impacts:
+        if impact.affected is None:
+            print(f"   {impact.rule_id:<40} {'?':>12}  ({impact.method})")
+            continue
+        scanned = ""
+        if impact.row_groups is not None:
+            scanned = f", {impact.row_groups[0]}/{impact.row_groups[1]} row groups"
+        print(f"   {impact.rule_id:<40} {impact.affected:>12,} rows "
+              f"({impact.affected_pct:.3f}%, {impact.low:,}–{impact.high:,}; "
+              f"{impact.method}{scanned})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([impact.to_dict() for impact in impacts], f, indent=2)
+        print(f"✅ Preview → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+"""
+Streaming single-pass column profiler (plan.md, Week 2).
+
+The profiler walks the input chunk by chunk and folds every chunk into a set
+of per-column accumulators: row count, inferred type, % missing, min/max,
+moments, a histogram and the most frequent values. None of the accumulators
+keeps anything proportional to the number of rows, so profiling a 10 GB file
+needs roughly one chunk of memory.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from datamender.cache import plan_cache
+from datamender.chunk import Chunk, as_arrow, column_kind, nanoseconds, numeric, pandas_dtype, text
+from datamender.io import (
+    DEFAULT_CHUNKSIZE, ChunkWriter, Partition, detect_format, partition_file, pinned_schema,
+    schema_pairs,
+)
+from datamender.sampling import (
+    DEFAULT_PER_STRATUM, DEFAULT_TOKEN_BUDGET, StratifiedSampler, build_digest,
+)
+from datamender.sketches import DEFAULT_BINS, HyperLogLog, KLLSketch, StreamingHistogram
+from datamender.trace import (
+    NULL_TRACER, add_trace_arguments, save_trace, traced_call, tracer_from_args,
+)
+
+DEFAULT_TOP_K = 20
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# Number of leading values used to decide whether a text column holds dates.
+DATETIME_SNIFF_ROWS = 100
+
+# Each worker gets several partitions so that uneven ones balance out.
+PARTITIONS_PER_WORKER = 4
+
+
+class NumericStats:
+    """Count, extrema, mean/variance and histogram of a numeric column."""
+
+    def __init__(self, bins=DEFAULT_BINS):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.zeros = 0
+        self.negatives = 0
+        self.infinite = 0
+        self.histogram = StreamingHistogram(bins)
+        self.quantiles = KLLSketch()
+
+    def update(self, values):
+        """Add a 1-d array of non-null numeric values."""
+        if values.dtype.kind == "f":
+            finite = np.isfinite(values)
+            if not finite.all():
+                self.infinite += int(values.size - finite.sum())
+                values = values[finite]
+        if values.size == 0:
+            return
+        as_float = values.astype(np.float64, copy=False)
+        count = values.size
+        mean = float(as_float.mean())
+        m2 = float(np.square(as_float - mean).sum())
+        # Chan et al. pairwise update keeps the variance numerically stable.
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+        low = values.min().item()
+        high = values.max().item()
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.zeros += int(np.count_nonzero(as_float == 0))
+        self.negatives += int(np.count_nonzero(as_float < 0))
+        self.histogram.update(as_float)
+        self.quantiles.update(as_float)
+
+    def merge(self, other):
+        """Fold the statistics of another partial profile into this one."""
+        if other.count:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+            self.mean += delta * other.count / total
+            self.count = total
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.zeros += other.zeros
+        self.negatives += other.negatives
+        self.infinite += other.infinite
+        self.histogram.merge(other.histogram)
+        self.quantiles.merge(other.quantiles)
+        return self
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+class TextStats:
+    """String lengths and approximate top values of a text column.
+
+    Frequent values are tracked with a Misra-Gries summary holding at most
+    ``capacity`` counters, so high-cardinality columns such as trip ids do
+    not grow the accumulator.
+    """
+
+    def __init__(self, top_k=DEFAULT_TOP_K):
+        self.top_k = top_k
+        self.capacity = top_k * 5
+        self.counts = pd.Series(dtype=np.int64)
+        self.min_length = None
+        self.max_length = None
+
+    def update(self, values):
+        """Add an Arrow array of non-null strings; returns its value counts."""
+        if len(values) == 0:
+            return pd.Series(dtype=np.int64)
+        lengths = pc.min_max(pc.utf8_length(values))
+        self._update_lengths(lengths["min"].as_py(), lengths["max"].as_py())
+        counted = pc.value_counts(values)
+        counts = pd.Series(
+            counted.field("counts").to_numpy(),
+            index=counted.field("values").to_numpy(zero_copy_only=False),
+        )
+        self._add_counts(counts)
+        return counts
+
+    def merge(self, other):
+        """Fold another Misra-Gries summary into this one."""
+        if other.min_length is not None:
+            self._update_lengths(other.min_length, other.max_length)
+        self._add_counts(other.counts)
+        return self
+
+    def _update_lengths(self, low, high):
+        self.min_length = low if self.min_length is None else min(self.min_length, low)
+        self.max_length = high if self.max_length is None else max(self.max_length, high)
+
+    def _add_counts(self, counts):
+        counts = counts.add(self.counts, fill_value=0)
+        if len(counts) > self.capacity:
+            threshold = counts.nlargest(self.capacity + 1).iloc[-1]
+            counts = counts[counts > threshold] - threshold
+        self.counts = counts.astype(np.int64)
+
+    def top_values(self):
+        top = self.counts.nlargest(self.top_k)
+        return [{"value": value, "count": int(count)} for value, count in top.items()]
+
+
+class ColumnProfile:
+    """Single-pass accumulator for one column."""
+
+    def __init__(self, name, bins=DEFAULT_BINS, top_k=DEFAULT_TOP_K):
+        self.name = name
+        self.bins = bins
+        self.top_k = top_k
+        self.kind = None
+        self.dtype = None
+        self.rows = 0
+        self.missing = 0
+        self.invalid = 0
+        self.mixed_types = False
+        self.numeric = None
+        self.text = None
+        self.distinct = HyperLogLog()
+
+    def update(self, values):
+        """Fold one chunk of the column (an Arrow array or a Series) into the accumulator.
+
+        Numeric and timestamp columns without nulls are read straight from
+        the Arrow buffers.
+        """
+        array = as_arrow(values)
+        self.rows += len(array)
+        self.dtype = pandas_dtype(array.type)
+        if pa.types.is_dictionary(array.type):
+            array = array.dictionary_decode()
+        if array.null_count or pa.types.is_floating(array.type):
+            nulls = pc.is_null(array, nan_is_null=True)
+            missing = pc.sum(nulls).as_py() or 0
+            if missing:
+                self.missing += missing
+                array = array.filter(pc.invert(nulls))
+        if len(array) == 0:
+            return
+
+        kind = self._resolve_kind(_chunk_kind(array, self.kind))
+        if kind == "string":
+            counts = self.text.update(text(array))
+            # HyperLogLog ignores repeats, so each distinct value is hashed once.
+            self.distinct.update(counts.index.to_numpy(dtype=object))
+            return
+        if kind == "datetime":
+            if column_kind(array.type) == "datetime":
+                values = nanoseconds(array)
+            else:
+                values = datetime_ns(array.to_pandas())
+            invalid = values == np.iinfo(np.int64).min
+            if invalid.any():
+                self.invalid += int(invalid.sum())
+                values = values[~invalid]
+        elif kind == "integer":
+            values = array.to_numpy()
+        else:
+            values = numeric(array).astype(np.float64, copy=False)
+        # Integers are hashed as floats so int and float chunks of the same
+        # column agree on what a distinct value is.
+        self.distinct.update(values if kind == "datetime" else values.astype(np.float64))
+        self.numeric.update(values)
+
+    def merge(self, other):
+        """Fold a partial profile of the same column into this one."""
+        self.rows += other.rows
+        self.missing += other.missing
+        self.invalid += other.invalid
+        self.mixed_types = self.mixed_types or other.mixed_types
+        self.dtype = self.dtype or other.dtype
+        self.distinct.merge(other.distinct)
+        if other.kind is None:
+            return self
+        kind = self._resolve_kind(other.kind)
+        if kind == "string":
+            if other.text is not None:
+                self.text.merge(other.text)
+            else:
+                self.mixed_types = True
+        elif other.numeric is not None:
+            self.numeric.merge(other.numeric)
+        return self
+
+    def _resolve_kind(self, kind):
+        if self.kind is None:
+            self.kind = kind
+        elif kind != self.kind:
+            if {kind, self.kind} == {"integer", "float"}:
+                self.kind = "float"
+            elif self.kind != "string":
+                # Incompatible chunks: keep counting, but only as text.
+                self.kind = "string"
+                self.mixed_types = True
+                self.numeric = None
+            else:
+                self.mixed_types = True
+        if self.kind == "string" and self.text is None:
+            self.text = TextStats(self.top_k)
+        elif self.kind != "string" and self.numeric is None:
+            self.numeric = NumericStats(self.bins)
+        return self.kind
+
+    def to_dict(self):
+        """Return the JSON-serialisable summary for this column."""
+        summary = {
+            "kind": self.kind or "empty",
+            "dtype": self.dtype,
+            "rows": self.rows,
+            "count": self.rows - self.missing,
+            "missing": self.missing,
+            "missing_pct": _pct(self.missing, self.rows),
+            "distinct": self.distinct.estimate(),
+        }
+        if self.invalid:
+            summary["invalid"] = self.invalid
+        if self.mixed_types:
+            summary["mixed_types"] = True
+        if self.numeric is not None and self.numeric.count:
+            summary.update(self._numeric_summary())
+        if self.text is not None:
+            summary["min_length"] = self.text.min_length
+            summary["max_length"] = self.text.max_length
+            summary["top_values"] = self.text.top_values()
+        return summary
+
+    def _numeric_summary(self):
+        stats = self.numeric
+        histogram = stats.histogram.to_dict()
+        cuts = stats.quantiles.quantiles(QUANTILES)
+        if self.kind == "datetime":
+            histogram["edges"] = [_iso(edge) for edge in histogram["edges"]]
+            return {
+                "min": _iso(stats.min),
+                "max": _iso(stats.max),
+                "mean": _iso(stats.mean),
+                "std_seconds": stats.std / 1e9,
+                "quantiles": {_quantile_key(q): _iso(v) for q, v in zip(QUANTILES, cuts)},
+                "histogram": histogram,
+            }
+        summary = {
+            "min": stats.min,
+            "max": stats.max,
+            "mean": stats.mean,
+            "std": stats.std,
+            "zeros": stats.zeros,
+            "negatives": stats.negatives,
+            "quantiles": {_quantile_key(q): float(v) for q, v in zip(QUANTILES, cuts)},
+            "histogram": histogram,
+        }
+        if stats.infinite:
+            summary["infinite"] = stats.infinite
+        if self.kind == "boolean":
+            summary = {"true_pct": round(100.0 * stats.mean, 4)}
+        return summary
+
+
+def _chunk_kind(array, current):
+    kind = column_kind(array.type)
+    if kind != "string":
+        return kind
+    if current == "datetime" or (
+        current is None and looks_like_datetime(array.slice(0, DATETIME_SNIFF_ROWS).to_pandas())
+    ):
+        return "datetime"
+    return "string"
+
+
+def looks_like_datetime(series):
+    """Return True if the leading non-null text values parse as ISO dates."""
+    sample = series.iloc[:DATETIME_SNIFF_ROWS].astype(str)
+    if sample.empty or not sample.str.contains(r"\d{2}[-/:]\d{2}", regex=True).all():
+        return False
+    parsed = pd.to_datetime(sample, errors="coerce", format="ISO8601")
+    return bool(parsed.notna().all())
+
+
+def datetime_ns(series):
+    """Convert a Series to int64 epoch nanoseconds; unparseable values are NaT."""
+    if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+        series = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    if getattr(series.dt, "tz", None) is not None:
+        series = series.dt.tz_convert(None)
+    return series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def _quantile_key(fraction):
+    return f"p{round(fraction * 100):02d}"
+
+
+def _iso(nanoseconds):
+    return pd.Timestamp(int(nanoseconds)).isoformat()
+
+
+def _pct(part, whole):
+    return round(100.0 * part / whole, 4) if whole else 0.0
+
+
+class Profiler:
+    """Profile accumulator for a whole table, fed one chunk at a time.
+
+    Chunks may be :class:`~datamender.chunk.Chunk` objects (read straight
+    from Arrow buffers) or DataFrames.
+
+    An optional :class:`~datamender.sampling.StratifiedSampler` is fed the
+    same chunks, so the LLM sample costs no extra pass over the data.
+    """
+
+    def __init__(self, bins=DEFAULT_BINS, top_k=DEFAULT_TOP_K, sampler=None):
+        self.bins = bins
+        self.top_k = top_k
+        self.sampler = sampler
+        self.rows = 0
+        self.chunks = 0
+        self.columns = {}
+
+    def update(self, frame):
+        """Fold one chunk into the per-column accumulators."""
+        chunk = Chunk.wrap(frame)
+        self.rows += len(chunk)
+        self.chunks += 1
+        for name in chunk.columns:
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = ColumnProfile(name, self.bins, self.top_k)
+            column.update(chunk.array(name))
+        if self.sampler is not None:
+            self.sampler.update(chunk.to_pandas())
+
+    def merge(self, other):
+        """Fold a partial profile (e.g. from another worker) into this one."""
+        self.rows += other.rows
+        self.chunks += other.chunks
+        if self.sampler is not None and other.sampler is not None:
+            self.sampler.merge(other.sampler)
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        return self
+
+    def patch(self, profile, path=None):
+        """Return a copy of ``profile`` with the columns seen here replaced.
+
+        Used for incremental re-profiling: only columns that were actually
+        re-accumulated change, all others keep their original summary.
+        """
+        fresh = self.to_dict()
+        patched = {key: value for key, value in profile.items() if key != "elapsed_seconds"}
+        patched["columns"] = dict(profile.get("columns", {}))
+        patched["columns"].update(fresh["columns"])
+        patched["rows"] = self.rows
+        patched["reprofiled_columns"] = list(fresh["columns"])
+        if path is not None:
+            patched["path"] = os.fspath(path)
+            patched["format"] = detect_format(path)
+        return patched
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "columns": {name: column.to_dict() for name, column in self.columns.items()},
+        }
+
+
+def profile_partition(partition, chunksize=DEFAULT_CHUNKSIZE, columns=None,
+                      bins=DEFAULT_BINS, top_k=DEFAULT_TOP_K, sampler=None):
+    """Profile one :class:`~datamender.io.Partition` and return its Profiler."""
+    sampler = sampler.spawn() if sampler is not None else None
+    profiler = Profiler(bins=bins, top_k=top_k, sampler=sampler)
+    for chunk in partition.iter_batches(chunksize=chunksize, columns=columns):
+        profiler.update(chunk)
+    return profiler
+
+
+def profile_file(path, chunksize=DEFAULT_CHUNKSIZE, columns=None,
+                 bins=DEFAULT_BINS, top_k=DEFAULT_TOP_K, workers=1, sampler=None, schema=None,
+                 tracer=None):
+    """Profile a CSV or Parquet file in one streaming pass.
+
+    With ``workers > 1`` the file is split into byte ranges (CSV) or row
+    group sets (Parquet) that are profiled in a process pool; the partial
+    profiles are merged in file order. Returns a JSON-serialisable dict
+    with file-level counters and one summary per column under ``"columns"``.
+
+    If a ``sampler`` is given it is filled with a stratified sample of the
+    rows during the same pass. A ``schema`` pins the column types of CSV
+    input (see :func:`~datamender.io.infer_csv_schema`). A
+    :class:`~datamender.trace.Tracer` gets the time of every partition and
+    the number of partitions waiting for a worker.
+    """
+    tracer = tracer or NULL_TRACER
+    started = time.perf_counter()
+    task = partial(profile_partition, chunksize=chunksize, columns=columns,
+                   bins=bins, top_k=top_k, sampler=sampler)
+    partitions = [Partition(os.fspath(path), detect_format(path), schema=schema_pairs(schema))]
+    if workers > 1:
+        partitions = partition_file(path, workers * PARTITIONS_PER_WORKER, schema)
+
+    profiler = Profiler(bins=bins, top_k=top_k, sampler=sampler)
+    if len(partitions) == 1:
+        with tracer.span("profile.partition") as span:
+            profiler.merge(task(partitions[0]))
+            span.add(rows=profiler.rows)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(traced_call, "profile.partition", task, partition)
+                       for partition in partitions]
+            for future in futures:
+                tracer.queue("profile.partitions", sum(not other.done() for other in futures))
+                partial_profile, span = future.result()
+                span.add(rows=partial_profile.rows)
+                tracer.add(span)
+                profiler.merge(partial_profile)
+
+    profile = {"path": os.fspath(path), "format": detect_format(path),
+               "bins": bins, "top_k": top_k}
+    profile.update(profiler.to_dict())
+    profile["elapsed_seconds"] = round(time.perf_counter() - started, 6)
+    tracer.record("profile", started, profile["elapsed_seconds"], rows=profile["rows"],
+                  bytes_read=os.path.getsize(path))
+    return profile
+
+
+def save_profile(profile, path):
+    """Write a profile dict as pretty-printed JSON."""
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2, default=_json_default)
+
+
+def load_profile(path):
+    """Read a profile previously written by :func:`save_profile`."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def main(argv=None):
+    """Profile a file from the command line and print or save the JSON summary."""
+    parser = argparse.ArgumentParser(description="Profile a large CSV/Parquet file.")
+    parser.add_argument("path", help="CSV or Parquet file to profile")
+    parser.add_argument("-o", "--output", help="write the JSON profile here")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--columns", nargs="+", help="only profile these columns")
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="profile partitions of the file in this many processes")
+    parser.add_argument("--digest", help="write an LLM prompt digest (profile + sample) here")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    parser.add_argument("--sample", help="write the stratified sample (CSV/Parquet) here, "
+                                         "e.g. for rule impact previews")
+    parser.add_argument("--per-stratum", type=int, default=DEFAULT_PER_STRATUM,
+                        help="rows kept per sample stratum")
+    parser.add_argument("--schema", help="pin CSV column types from this schema YAML, "
+                                         "inferring and saving it when missing")
+    add_trace_arguments(parser)
+    args = parser.parse_args(argv)
+
+    sampler = None
+    if args.digest or args.sample:
+        sampler = StratifiedSampler(per_stratum=args.per_stratum)
+    schema = None
+    if args.schema and detect_format(args.path) == "csv":
+        schema = pinned_schema(args.path, args.schema, plan_cache())
+    tracer = tracer_from_args(args)
+    profile = profile_file(args.path, chunksize=args.chunksize, columns=args.columns,
+                           bins=args.bins, workers=args.workers, sampler=sampler, schema=schema,
+                           tracer=tracer)
+    if args.digest:
+        digest = build_digest(profile, sampler, token_budget=args.token_budget)
+        with open(args.digest, "w") as f:
+            f.write(digest["text"])
+        print(f"✅ Digest: {digest['tokens']:,} tokens, {digest['sample_rows']} sample rows "
+              f"→ {args.digest}")
+    if args.sample:
+        with ChunkWriter(args.sample) as writer:
+            writer.write(sampler.sample())
+        print(f"✅ Sample: {writer.rows:,} rows → {args.sample}")
+    if args.output:
+        save_profile(profile, args.output)
+        print(f"✅ Profiled {profile['rows']:,} rows in "
+              f"{profile['elapsed_seconds']:.2f}s → {args.output}")
+    else:
+        print(json.dumps(profile, indent=2, default=_json_default))
+    save_trace(tracer, args)
+
+
+if __name__ == "__main__":
+    main()
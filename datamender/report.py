@@ -0,0 +1,285 @@
+"""
+Templated LaTeX reports built from benchmark and cleaning-run metrics.
+
+A document is a preamble plus a list of :class:`Section` templates. Each
+section names the metrics it reads; it is re-rendered only when the hash of
+its template and those metrics changes, and is written to its own ``.tex``
+file that the main document ``\\input``s. pdflatex is skipped altogether
+when the document hash matches the last successful build, so the nightly
+report rebuild only pays for what actually changed.
+
+Metrics come from the JSON files the pipeline already writes
+(:mod:`datamender.benchmark` results, the ``fix_file`` report and the
+pre-clean profile) and are boiled down by :func:`collect_metrics` to the
+few numbers the tables and pgfplots charts show.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from string import Template
+
+from datamender.cache import atomic_write
+
+# Bump when a renderer below changes its output, so cached sections rebuild.
+RENDER_VERSION = 1
+
+PDFLATEX = ("pdflatex", "-interaction=nonstopmode", "-halt-on-error")
+STAGE_COLORS = {"generate": "gray", "profile": "primaryblue", "discover": "warningorange",
+                "fix": "accentgreen", "export": "darkgray"}
+
+_LATEX_SPECIALS = {
+    "\\": r"\textbackslash{}", "&": r"\&", "%": r"\%", "$": r"\$", "#": r"\#", "_": r"\_",
+    "{": r"\{", "}": r"\}", "~": r"\textasciitilde{}", "^": r"\textasciicircum{}",
+}
+
+
+@dataclass
+class Section:
+    """One ``\\input``-ed part of a document.
+
+    ``template`` is used verbatim unless ``fill`` is given, in which case it
+    is a :class:`string.Template` filled with ``fill(metrics)`` (write a
+    literal dollar as ``$$``). A section whose ``inputs`` are not all present
+    in the metrics is left out of the document.
+    """
+
+    name: str
+    template: str
+    inputs: tuple = ()
+    fill: object = None
+
+    def available(self, metrics):
+        return all(metrics.get(name) is not None for name in self.inputs)
+
+    def key(self, metrics):
+        data = [RENDER_VERSION, self.template, {name: metrics.get(name) for name in self.inputs}]
+        return _digest(json.dumps(data, sort_keys=True, default=str))
+
+    def render(self, metrics):
+        if self.fill is None:
+            return self.template
+        return Template(self.template).substitute(self.fill(metrics))
+
+
+@dataclass
+class BuildResult:
+    """What :func:`build_document` rendered, reused and compiled."""
+
+    tex: str
+    pdf: str
+    rendered: list = field(default_factory=list)
+    reused: list = field(default_factory=list)
+    compiled: bool = False
+    error: str = None
+
+
+def build_document(name, preamble, sections, metrics, directory, compile=True, passes=1,
+                   force=False):
+    """Render ``<directory>/<name>.tex`` and, if its content changed, the PDF.
+
+    Rendered sections are cached in ``<name>-sections/`` and copied into the
+    document, which therefore compiles on its own; a ``<name>.build.json``
+    file next to the document keeps the section and document hashes between
+    runs. ``force`` ignores those hashes and rebuilds everything.
+    """
+    section_dir = os.path.join(directory, f"{name}-sections")
+    os.makedirs(section_dir, exist_ok=True)
+    cache_path = os.path.join(directory, f"{name}.build.json")
+    cache = {} if force else _load_cache(cache_path)
+    previous = cache.get("sections", {})
+    result = BuildResult(os.path.join(directory, f"{name}.tex"),
+                         os.path.join(directory, f"{name}.pdf"))
+
+    hashes = {}
+    lines = [preamble.strip("\n"), r"\begin{document}"]
+    for section in sections:
+        if not section.available(metrics):
+            continue
+        key = section.key(metrics)
+        path = os.path.join(section_dir, f"{section.name}.tex")
+        if previous.get(section.name) == key and os.path.exists(path):
+            text = _read(path)
+            result.reused.append(section.name)
+        else:
+            text = section.render(metrics).strip("\n") + "\n"
+            atomic_write(path, text)
+            result.rendered.append(section.name)
+        hashes[section.name] = key
+        lines.append(text.rstrip("\n"))
+    lines.append(r"\end{document}")
+    for stale in set(previous) - set(hashes):
+        stale_path = os.path.join(section_dir, f"{stale}.tex")
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    document = "\n\n".join(lines) + "\n"
+    if not os.path.exists(result.tex) or _read(result.tex) != document:
+        atomic_write(result.tex, document)
+    content = _digest(json.dumps([document, hashes], sort_keys=True))
+    cache = {"sections": hashes, "document": cache.get("document")}
+
+    if compile and (cache["document"] != content or not os.path.exists(result.pdf)):
+        result.error = _pdflatex(result.tex, passes)
+        result.compiled = result.error is None
+        if result.compiled:
+            cache["document"] = content
+    atomic_write(cache_path, json.dumps(cache, indent=2))
+    return result
+
+
+def collect_metrics(benchmark=None, fix_report=None, profile=None):
+    """Load metrics JSON files and reduce them to what the reports show.
+
+    ``benchmark`` is a :mod:`datamender.benchmark` results file,
+    ``fix_report`` a ``fix_file`` report (``python -m datamender.fixer
+    --report``) and ``profile`` the pre-clean profile. Missing inputs leave
+    their metrics out, which drops the sections that need them.
+    """
+    metrics = {}
+    if benchmark:
+        runs = _load_json(benchmark).get("runs", [])
+        metrics["throughput"] = [
+            {"size_mb": run["size_mb"], "format": run.get("format", "csv"),
+             "stages": {name: {key: stage.get(key) for key in
+                               ("seconds", "rows_per_second", "mb_per_second", "peak_rss_mb")}
+                        for name, stage in run["stages"].items()}}
+            for run in runs
+        ] or None
+    if fix_report:
+        report = _load_json(fix_report)
+        metrics["anomalies"] = report.get("anomalies")
+        metrics["rows"] = {key: report.get(key) for key in ("rows_in", "rows_out", "rows_dropped")}
+        metrics["rules"] = [{"id": rule["id"], "violations": rule["violations"],
+                             "remaining": rule["remaining"], "dropped": rule["dropped"]}
+                            for rule in report.get("rules", [])] or None
+        after = report.get("profile")
+        before = _load_json(profile) if profile else None
+        if before and after:
+            metrics["missing"] = {
+                column: [summary.get("missing_pct", 0.0),
+                         after["columns"].get(column, {}).get("missing_pct", 0.0)]
+                for column, summary in before.get("columns", {}).items()
+            }
+    return metrics
+
+
+def latex_escape(text):
+    """Escape LaTeX special characters in plain text."""
+    return "".join(_LATEX_SPECIALS.get(char, char) for char in str(text))
+
+
+def throughput_table(runs, font=r"\footnotesize"):
+    """A tabular of seconds, rows/s, MB/s and peak RSS per size and stage."""
+    lines = [
+        r"\begin{center}", font,
+        r"\begin{tabular}{|r|l|r|r|r|r|}", r"\hline",
+        r"\textbf{Size (MB)} & \textbf{Stage} & \textbf{Time (s)} & \textbf{Rows/s} & "
+        r"\textbf{MB/s} & \textbf{Peak RSS (MB)} \\", r"\hline",
+    ]
+    for run in runs:
+        for name, stage in run["stages"].items():
+            lines.append(
+                f"{run['size_mb']:g} & {latex_escape(name)} & {_number(stage['seconds'], '.2f')} & "
+                f"{_number(stage.get('rows_per_second'), ',.0f')} & "
+                f"{_number(stage.get('mb_per_second'), '.1f')} & "
+                f"{_number(stage.get('peak_rss_mb'), '.0f')} \\\\"
+            )
+        lines.append(r"\hline")
+    lines += [r"\end{tabular}", r"\end{center}"]
+    return "\n".join(lines)
+
+
+def timing_chart(runs, width=r"0.8\textwidth", height="6cm"):
+    """A pgfplots log-log chart of processing time against file size, per stage."""
+    stages = list(dict.fromkeys(name for run in runs for name in run["stages"]))
+    lines = [
+        r"\begin{center}", r"\begin{tikzpicture}",
+        rf"\begin{{axis}}[width={width}, height={height}, xmode=log, ymode=log, "
+        r"xlabel={File size (MB)}, ylabel={Seconds}, legend pos=outer north east, "
+        r"legend style={font=\footnotesize}, grid=major]",
+    ]
+    for name in stages:
+        points = " ".join(f"({run['size_mb']:g},{max(run['stages'][name]['seconds'], 1e-3):g})"
+                          for run in runs if name in run["stages"])
+        color = STAGE_COLORS.get(name, "black")
+        lines.append(rf"\addplot[mark=*, color={color}] coordinates {{{points}}};")
+        lines.append(rf"\addlegendentry{{{latex_escape(name)}}}")
+    lines += [r"\end{axis}", r"\end{tikzpicture}", r"\end{center}"]
+    return "\n".join(lines)
+
+
+def before_after_chart(labels, before, after, ylabel, width=r"0.9\textwidth", height="6cm"):
+    """A pgfplots grouped bar chart comparing two values per label."""
+    ticks = ",".join("{" + latex_escape(label) + "}" for label in labels)
+    lines = [
+        r"\begin{center}", r"\begin{tikzpicture}",
+        rf"\begin{{axis}}[ybar, width={width}, height={height}, bar width=5pt, ymin=0, "
+        rf"xtick=data, xticklabels={{{ticks}}}, "
+        r"xticklabel style={rotate=45, anchor=east, font=\scriptsize}, "
+        rf"ylabel={{{ylabel}}}, legend style={{font=\footnotesize}}, legend pos=north east]",
+    ]
+    for values, color, legend in ((before, "warningorange", "before"),
+                                  (after, "accentgreen", "after")):
+        points = " ".join(f"({i},{value:g})" for i, value in enumerate(values))
+        lines.append(rf"\addplot[fill={color}, draw={color}] coordinates {{{points}}};")
+        lines.append(rf"\addlegendentry{{{legend}}}")
+    lines += [r"\end{axis}", r"\end{tikzpicture}", r"\end{center}"]
+    return "\n".join(lines)
+
+
+def rule_chart(rules, **options):
+    """Violations before and after cleaning, per rule."""
+    return before_after_chart([rule["id"] for rule in rules],
+                              [rule["violations"] for rule in rules],
+                              [rule["remaining"] for rule in rules], "Rows violating", **options)
+
+
+def missing_chart(missing, **options):
+    """Missing-value percentage before and after cleaning, per column."""
+    columns = [column for column, (before, after) in missing.items() if before or after]
+    if not columns:
+        return "No column had missing values before or after cleaning."
+    return before_after_chart(columns, [missing[column][0] for column in columns],
+                              [missing[column][1] for column in columns], r"Missing (\%)",
+                              **options)
+
+
+def _number(value, spec):
+    return "--" if value is None else format(value, spec)
+
+
+def _pdflatex(tex, passes):
+    directory, filename = os.path.split(tex)
+    for _ in range(passes):
+        try:
+            completed = subprocess.run([*PDFLATEX, filename], cwd=directory or ".",
+                                       capture_output=True, text=True)
+        except FileNotFoundError:
+            return "pdflatex not found"
+        if completed.returncode != 0:
+            return completed.stdout[-2000:] or completed.stderr
+    return None
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _load_cache(path):
+    try:
+        return _load_json(path)
+    except (FileNotFoundError, ValueError):
+        return {}
@@ -0,0 +1,143 @@
+"""
+Cleaning rules and the accepted-rules YAML file (plan.md, Weeks 4-5).
+
+A rules file is a YAML document with a top-level ``rules`` list::
+
+    rules:
+      - id: fare_amount.range
+        check: range
+        column: fare_amount
+        min: 0
+        max: 500
+        action: clip
+      - id: tip_amount.non_negative
+        check: non_negative
+        column: tip_amount
+        action: abs
+      - id: passenger_count.not_null
+        check: not_null
+        column: passenger_count
+        action: fill
+        value: 1
+      - id: trip.order
+        check: order
+        column: pickup_datetime
+        other: dropoff_datetime
+        action: swap
+
+Rules carry a ``status`` set during human review; only ``accepted`` rules
+(the default when the field is absent) are applied by the fix engine.
+"""
+
+from dataclasses import dataclass, field
+
+import yaml
+
+# check -> actions it supports; the first action is the default.
+CHECKS = {
+    "range": ("clip", "drop", "null"),
+    "non_negative": ("abs", "clip", "drop", "null"),
+    "not_null": ("fill", "drop"),
+    "order": ("swap", "drop"),
+}
+
+STATUSES = ("accepted", "suggested", "rejected")
+
+_FIELD_ORDER = ("id", "check", "column", "other", "min", "max", "value",
+                "strict", "action", "status")
+
+
+class RuleError(ValueError):
+    """Raised for a malformed or inconsistent rule definition."""
+
+
+@dataclass
+class Rule:
+    """One validated cleaning rule."""
+
+    check: str
+    column: str
+    action: str = None
+    id: str = None
+    min: float = None
+    max: float = None
+    value: object = None
+    other: str = None
+    strict: bool = False
+    status: str = "accepted"
+    extra: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.check not in CHECKS:
+            raise RuleError(f"Unknown check {self.check!r}; expected one of {sorted(CHECKS)}")
+        actions = CHECKS[self.check]
+        if self.action is None:
+            self.action = actions[0]
+        if self.action not in actions:
+            raise RuleError(
+                f"Check {self.check!r} does not support action {self.action!r}; "
+                f"expected one of {list(actions)}"
+            )
+        if self.status not in STATUSES:
+            raise RuleError(f"Unknown rule status {self.status!r}")
+        if self.check == "range" and self.min is None and self.max is None:
+            raise RuleError(f"Range rule on {self.column!r} needs min and/or max")
+        if self.check == "order" and not self.other:
+            raise RuleError(f"Order rule on {self.column!r} needs an 'other' column")
+        if self.check == "not_null" and self.action == "fill" and self.value is None:
+            raise RuleError(f"Fill rule on {self.column!r} needs a 'value'")
+        if self.id is None:
+            self.id = f"{self.column}.{self.check}"
+
+    @property
+    def columns(self):
+        """Columns the rule reads and may rewrite."""
+        return (self.column, self.other) if self.other else (self.column,)
+
+    @property
+    def accepted(self):
+        return self.status == "accepted"
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        known = {name for name in cls.__dataclass_fields__ if name != "extra"}
+        extra = {key: data.pop(key) for key in list(data) if key not in known}
+        if "check" not in data or "column" not in data:
+            raise RuleError(f"Rule needs at least 'check' and 'column': {data}")
+        return cls(extra=extra, **data)
+
+    def to_dict(self):
+        data = {key: getattr(self, key) for key in _FIELD_ORDER
+                if getattr(self, key) is not None}
+        if not self.strict:
+            del data["strict"]
+        data.update(self.extra)
+        return data
+
+
+def load_rules(path, accepted_only=True):
+    """Load rules from a YAML file, optionally keeping only accepted ones."""
+    with open(path) as f:
+        document = yaml.safe_load(f) or {}
+    return parse_rules(document, accepted_only=accepted_only)
+
+
+def parse_rules(document, accepted_only=True):
+    """Build Rule objects from a parsed YAML/JSON document."""
+    entries = document.get("rules", []) if isinstance(document, dict) else document
+    rules = [Rule.from_dict(entry) for entry in entries or []]
+    seen = set()
+    for rule in rules:
+        if rule.id in seen:
+            raise RuleError(f"Duplicate rule id {rule.id!r}")
+        seen.add(rule.id)
+    if accepted_only:
+        rules = [rule for rule in rules if rule.accepted]
+    return rules
+
+
+def save_rules(rules, path):
+    """Write rules to a YAML file in the format :func:`load_rules` reads."""
+    with open(path, "w") as f:
+        yaml.safe_dump({"rules": [rule.to_dict() for rule in rules]}, f, sort_keys=False)
@@ -0,0 +1,529 @@
+"""
+Checkpointed, resumable fix runs with a reversible operation log.
+
+:func:`~datamender.fixer.fix_file` cleans a file in one pass, so a crash at
+90% of a 10 GB file means starting over. A checkpointed run splits the
+input into *segments* (Parquet row groups, Arrow record batches or ~64 MB
+newline-aligned CSV byte ranges) and commits each one on its own into a
+run directory::
+
+    clean.parquet.run/
+        oplog.jsonl            append-only log, one JSON record per line
+        parts/00000.parquet    cleaned rows of segment 0
+        diffs/00000.parquet    cells changed (and rows dropped) per rule
+        profiles/00000.pkl     partial post-clean profile (with --profile)
+
+The part, diff and profile of a segment are written and fsync'd before its
+``segment`` record is appended, so a segment is either fully committed or
+redone. An interrupted run resumes after the last committed segment, and
+the output file is assembled from the parts once all segments are done.
+
+Rolling back a rule re-cleans, without that rule, only the segments whose
+diff shows the rule changed something, then re-assembles the output::
+
+    python -m datamender.runlog run input.parquet rules.yaml -o clean.parquet
+    python -m datamender.runlog status clean.parquet.run
+    python -m datamender.runlog rollback clean.parquet.run fare_amount.range
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import pickle
+import shutil
+import time
+from dataclasses import asdict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from datamender.cache import plan_cache
+from datamender.chunk import from_numpy
+from datamender.fixer import FixPlan, compile_plan, iter_plan_batches
+from datamender.io import (
+    DEFAULT_CHUNKSIZE, ChunkWriter, Partition, csv_byte_ranges, detect_format, iter_batches,
+    pinned_schema, read_csv_header, schema_pairs, schema_path,
+)
+from datamender.profiler import DEFAULT_BINS, DEFAULT_TOP_K, Profiler, load_profile, save_profile
+from datamender.rules import Rule
+from datamender.trace import NULL_TRACER, add_trace_arguments, save_trace, tracer_from_args
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+OPLOG = "oplog.jsonl"
+
+
+class RunLogError(RuntimeError):
+    """Raised when a run directory does not match the requested run."""
+
+
+class OpLog:
+    """Append-only JSON-lines log; every record is fsync'd before returning."""
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+
+    def records(self):
+        """Return all complete records; a torn last line from a crash is ignored."""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        return records
+
+    def append(self, record):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def segment_file(path, segment_bytes=DEFAULT_SEGMENT_BYTES, schema=None):
+    """Split an input file into the segments a checkpointed run commits.
+
+    Compressed CSV cannot be split and is a single segment. A ``schema``
+    is pinned on every CSV segment.
+    """
+    path, schema = os.fspath(path), schema_pairs(schema)
+    file_format = detect_format(path)
+    if file_format == "parquet":
+        count = pq.ParquetFile(path).num_row_groups
+        return [Partition(path, "parquet", row_groups=(i,)) for i in range(count)]
+    if file_format == "arrow":
+        with pa.memory_map(path) as source:
+            try:
+                count = pa.ipc.open_file(source).num_record_batches
+            except pa.ArrowInvalid:
+                return [Partition(path, "arrow")]
+        return [Partition(path, "arrow", row_groups=(i,)) for i in range(count)]
+    if not path.lower().endswith((".csv", ".tsv", ".txt")):
+        return [Partition(path, "csv", schema=schema)]
+    parts = max(1, math.ceil(os.path.getsize(path) / segment_bytes))
+    if parts == 1:
+        return [Partition(path, "csv", schema=schema)]
+    names = tuple(read_csv_header(path))
+    return [Partition(path, "csv", start=start, end=end, names=names, schema=schema)
+            for start, end in csv_byte_ranges(path, parts)]
+
+
+def run_checkpointed(input_path, rules, output_path, run_dir=None,
+                     chunksize=DEFAULT_CHUNKSIZE, profile=None,
+                     segment_bytes=DEFAULT_SEGMENT_BYTES, schema=None, tracer=None):
+    """Clean a file segment by segment, resuming a previous run if there is one.
+
+    Takes the same ``rules``, ``profile``, ``schema`` and ``tracer`` as
+    :func:`~datamender.fixer.fix_file` and returns a report of the same shape, plus run-log counters. Raises
+    :class:`RunLogError` if ``run_dir`` holds a run of a different input,
+    rule set or segmentation.
+    """
+    started = time.perf_counter()
+    tracer = tracer or NULL_TRACER
+    input_path, output_path = os.fspath(input_path), os.fspath(output_path)
+    run_dir = os.fspath(run_dir or output_path + ".run")
+    plan = rules if isinstance(rules, FixPlan) else compile_plan(rules)
+    segments = segment_file(input_path, segment_bytes, schema)
+    header = {
+        "op": "start",
+        "input": input_path,
+        "output": output_path,
+        "input_fingerprint": _fingerprint(input_path),
+        "rules": [rule.to_dict() for rule in plan.rules],
+        "rules_digest": _rules_digest(plan.rules),
+        "chunksize": chunksize,
+        "segments": [asdict(segment) for segment in segments],
+        "profile": profile,
+        # Every segment, including ones replayed by a rollback, profiles the
+        # same columns, so the partial profiles can be merged.
+        "reprofile_columns": None if plan.drops_rows else plan.written_columns,
+    }
+
+    log = OpLog(os.path.join(run_dir, OPLOG))
+    records = log.records()
+    if records:
+        _check_header(records[0], header)
+        header = records[0]
+    else:
+        for name in ("parts", "diffs", "profiles"):
+            os.makedirs(os.path.join(run_dir, name), exist_ok=True)
+        log.append(header)
+        records = [header]
+
+    state = _replay(records)
+    resumed = len(state["segments"])
+    rules = _active_rules(header, state["rolled_back"])
+    for index, segment in enumerate(segments):
+        if index in state["segments"]:
+            continue
+        rows_before = sum(state["segments"][i]["rows_in"] for i in range(index))
+        with tracer.span("fix.segment") as span:
+            record = _clean_segment(run_dir, index, segment, rules, header, rows_before, tracer)
+            span.add(rows=record["rows_in"])
+        log.append(record)
+        state["segments"][index] = record
+
+    with tracer.span("fix.assemble"):
+        report = _finish(run_dir, header, state, log)
+    report.update({
+        "run_dir": run_dir,
+        "segments": len(segments),
+        "resumed_segments": resumed,
+        "elapsed_seconds": round(time.perf_counter() - started, 6),
+    })
+    tracer.record("fix", started, report["elapsed_seconds"], rows=report["rows_in"],
+                  bytes_read=os.path.getsize(input_path), bytes_written=os.path.getsize(output_path))
+    return report
+
+
+def rollback_rule(run_dir, rule_id):
+    """Undo one rule of a finished or interrupted run.
+
+    Only segments in which the rule changed cells or dropped rows are
+    cleaned again (from the original input segment, with the remaining
+    rules); the output is then re-assembled from the parts.
+    """
+    started = time.perf_counter()
+    run_dir = os.fspath(run_dir)
+    log = OpLog(os.path.join(run_dir, OPLOG))
+    records = log.records()
+    if not records:
+        raise RunLogError(f"No operation log in {run_dir}")
+    header = records[0]
+    state = _replay(records)
+    active = _active_rules(header, state["rolled_back"])
+    if rule_id not in {rule.id for rule in active}:
+        raise RunLogError(f"Rule {rule_id!r} is not active in this run")
+
+    rolled_back = state["rolled_back"] | {rule_id}
+    rules = _active_rules(header, rolled_back)
+    affected = sorted(index for index, record in state["segments"].items()
+                      if record["changes"].get(rule_id))
+    for index in affected:
+        segment = Partition(**{key: tuple(value) if isinstance(value, list) else value
+                               for key, value in header["segments"][index].items()})
+        rows_before = state["segments"][index]["rows_before"]
+        record = _clean_segment(run_dir, index, segment, rules, header, rows_before)
+        record["replay"] = True
+        log.append(record)
+        state["segments"][index] = record
+    log.append({"op": "rollback", "rule": rule_id, "segments": affected})
+    state["rolled_back"] = rolled_back
+
+    report = {"rule": rule_id, "replayed_segments": affected,
+              "segments": len(header["segments"])}
+    if len(state["segments"]) == len(header["segments"]):
+        report["run"] = _finish(run_dir, header, state, log)
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 6)
+    return report
+
+
+def load_diff(run_dir, rule_id=None):
+    """Return the logged cell changes as one DataFrame.
+
+    Rows are numbered from the start of the input file. Dropped rows have
+    no ``column``.
+    """
+    run_dir = os.fspath(run_dir)
+    state = _replay(OpLog(os.path.join(run_dir, OPLOG)).records())
+    frames = []
+    for index in sorted(state["segments"]):
+        record = state["segments"][index]
+        if record["diff"] is None:
+            continue
+        table = pq.read_table(os.path.join(run_dir, record["diff"]))
+        if rule_id is not None:
+            table = table.filter(pc.equal(table["rule"], rule_id))
+        frame = table.to_pandas()
+        frame["row"] += record["rows_before"]
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["rule", "row", "column", "before", "after"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _clean_segment(run_dir, index, segment, rules, header, rows_before, tracer=None):
+    """Clean one segment into its part, diff and profile files; return its log record."""
+    started = time.perf_counter()
+    plan = FixPlan(rules)
+    extension = _extension(header["output"])
+    part = os.path.join("parts", f"{index:05d}{extension}")
+    profile = header["profile"]
+    profiler = None
+    reprofile_columns = header.get("reprofile_columns")
+    if profile is not None:
+        profiler = Profiler(bins=profile.get("bins", DEFAULT_BINS),
+                            top_k=profile.get("top_k", DEFAULT_TOP_K))
+
+    changes = []
+    rows_in = 0
+    temporary = os.path.join(run_dir, "parts", f"{index:05d}.partial{extension}")
+    with ChunkWriter(temporary) as writer:
+        for chunk, active in iter_plan_batches(segment, plan, header["chunksize"]):
+            diff = []
+            cleaned = plan.apply(chunk, diff=diff, active=active, tracer=tracer)
+            for change in diff:
+                change.rows = change.rows + rows_in
+            changes.extend(diff)
+            rows_in += len(chunk)
+            writer.write(cleaned)
+            if profiler is not None:
+                profiler.update(cleaned if reprofile_columns is None
+                                else cleaned.select(reprofile_columns))
+        rows_out = writer.rows
+    if os.path.exists(temporary):
+        _commit(temporary, os.path.join(run_dir, part))
+    else:
+        part = None
+
+    diff_path = None
+    if changes:
+        diff_path = os.path.join("diffs", f"{index:05d}.parquet")
+        temporary = os.path.join(run_dir, "diffs", f"{index:05d}.partial.parquet")
+        pq.write_table(_diff_table(changes), temporary)
+        _commit(temporary, os.path.join(run_dir, diff_path))
+
+    profile_path = None
+    if profiler is not None:
+        profile_path = os.path.join("profiles", f"{index:05d}.pkl")
+        temporary = os.path.join(run_dir, "profiles", f"{index:05d}.partial.pkl")
+        with open(temporary, "wb") as f:
+            pickle.dump(profiler, f)
+        _commit(temporary, os.path.join(run_dir, profile_path))
+
+    counts = {}
+    for change in changes:
+        counts[change.rule_id] = counts.get(change.rule_id, 0) + int(change.rows.size)
+    return {
+        "op": "segment",
+        "index": index,
+        "rows_before": rows_before,
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "part": part,
+        "diff": diff_path,
+        "profile": profile_path,
+        "changes": counts,
+        "rules": [stats.to_dict() for stats in plan.stats],
+        "verify_seconds": round(plan.verify_seconds, 6),
+        "seconds": round(time.perf_counter() - started, 6),
+    }
+
+
+def _diff_table(changes):
+    rules, rows, columns, before, after = [], [], [], [], []
+    for change in changes:
+        size = change.rows.size
+        rules.append(pa.array([change.rule_id] * size, pa.string()))
+        rows.append(pa.array(change.rows, pa.int64()))
+        columns.append(pa.array([change.column] * size, pa.string()))
+        before.append(_as_text(change.kind, change.before, size))
+        after.append(_as_text(change.kind, change.after, size))
+    return pa.table({
+        "rule": pa.concat_arrays(rules).dictionary_encode(),
+        "row": pa.concat_arrays(rows),
+        "column": pa.concat_arrays(columns).dictionary_encode(),
+        "before": pa.concat_arrays(before),
+        "after": pa.concat_arrays(after),
+    })
+
+
+def _as_text(kind, values, size):
+    if values is None:
+        return pa.nulls(size, pa.string())
+    try:
+        return pc.cast(from_numpy(kind, values), pa.string())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        return pa.array([None if pd.isna(value) else str(value) for value in values], pa.string())
+
+
+def _finish(run_dir, header, state, log):
+    """Assemble the output from the parts and build the run report."""
+    output_path = header["output"]
+    segments = [state["segments"][i] for i in sorted(state["segments"])]
+    tick = time.perf_counter()
+    _assemble(run_dir, segments, output_path)
+    assemble_seconds = time.perf_counter() - tick
+
+    stats = {}
+    for record in segments:
+        for rule in record["rules"]:
+            if rule["id"] in state["rolled_back"]:
+                continue
+            total = stats.setdefault(rule["id"], dict(rule, violations=0, remaining=0,
+                                                      dropped=0, seconds=0.0))
+            for key in ("violations", "remaining", "dropped", "seconds"):
+                total[key] += rule[key]
+    before = sum(rule["violations"] for rule in stats.values())
+    after = sum(rule["remaining"] for rule in stats.values())
+    rows_in = sum(record["rows_in"] for record in segments)
+    rows_out = sum(record["rows_out"] for record in segments)
+    report = {
+        "input": header["input"],
+        "output": output_path,
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "rows_dropped": rows_in - rows_out,
+        "assemble_seconds": round(assemble_seconds, 6),
+        "verify_seconds": round(sum(record["verify_seconds"] for record in segments), 6),
+        "anomalies": {"before": before, "after": after,
+                      "removed_pct": round(100.0 * (before - after) / before, 4) if before else 0.0},
+        "rules": [dict(rule, seconds=round(rule["seconds"], 6)) for rule in stats.values()],
+        "rolled_back": sorted(state["rolled_back"]),
+    }
+    if header["profile"] is not None:
+        profiler = None
+        for record in segments:
+            with open(os.path.join(run_dir, record["profile"]), "rb") as f:
+                partial = pickle.load(f)
+            profiler = partial if profiler is None else profiler.merge(partial)
+        report["profile"] = profiler.patch(header["profile"], path=output_path)
+    log.append({"op": "finish", "rows_out": rows_out, "rolled_back": report["rolled_back"]})
+    return report
+
+
+def _assemble(run_dir, segments, output_path):
+    """Concatenate the committed parts into the output file (atomically)."""
+    extension = _extension(output_path)
+    temporary = os.path.join(run_dir, f"output.partial{extension}")
+    parts = [os.path.join(run_dir, record["part"]) for record in segments if record["part"]]
+    if detect_format(output_path) == "csv":
+        # Parts are complete CSV files; keep the first header only.
+        with open(temporary, "wb") as out:
+            for position, part in enumerate(parts):
+                with open(part, "rb") as f:
+                    if position:
+                        f.readline()
+                    shutil.copyfileobj(f, out, 1 << 20)
+    else:
+        with ChunkWriter(temporary) as writer:
+            for part in parts:
+                for chunk in iter_batches(part):
+                    writer.write(chunk)
+    if os.path.exists(temporary):
+        _commit(temporary, output_path)
+
+
+def _replay(records):
+    """Fold the log into the latest record per segment and the rolled-back rules."""
+    state = {"segments": {}, "rolled_back": set()}
+    for record in records:
+        if record["op"] == "segment":
+            state["segments"][record["index"]] = record
+        elif record["op"] == "rollback":
+            state["rolled_back"].add(record["rule"])
+    return state
+
+
+def _active_rules(header, rolled_back):
+    return [Rule.from_dict(data) for data in header["rules"] if data["id"] not in rolled_back]
+
+
+def _check_header(previous, header):
+    for key in ("input", "output", "input_fingerprint", "rules_digest", "chunksize", "segments"):
+        if json.loads(json.dumps(previous.get(key), default=str)) != json.loads(
+            json.dumps(header[key], default=str)
+        ):
+            raise RunLogError(
+                f"Run directory belongs to a different run ({key} changed); "
+                "remove it or choose another run directory"
+            )
+
+
+def _fingerprint(path):
+    info = os.stat(path)
+    return {"size": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def _rules_digest(rules):
+    text = json.dumps([rule.to_dict() for rule in rules], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _extension(path):
+    return os.path.splitext(os.fspath(path))[1]
+
+
+def _commit(temporary, path):
+    with open(temporary, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def main(argv=None):
+    """Run, inspect or roll back checkpointed cleaning runs."""
+    parser = argparse.ArgumentParser(description="Checkpointed, resumable cleaning runs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="clean a file, resuming an interrupted run")
+    run.add_argument("input", help="CSV, Parquet or Arrow file to clean")
+    run.add_argument("rules", help="accepted-rules YAML file")
+    run.add_argument("-o", "--output", required=True, help="cleaned output file")
+    run.add_argument("--run-dir", help="checkpoint directory (default: <output>.run)")
+    run.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    run.add_argument("--segment-mb", type=int, default=DEFAULT_SEGMENT_BYTES >> 20,
+                     help="CSV segment size between checkpoints")
+    run.add_argument("--profile", help="pre-clean JSON profile to update incrementally")
+    run.add_argument("--profile-output", help="write the post-clean profile here")
+    run.add_argument("--schema", nargs="?", const="",
+                     help="pin CSV column types from this schema YAML, inferring it when "
+                          "missing (default: <rules>.schema.yaml)")
+    add_trace_arguments(run)
+    status = commands.add_parser("status", help="show the progress of a run")
+    status.add_argument("run_dir")
+    rollback = commands.add_parser("rollback", help="undo one rule of a run")
+    rollback.add_argument("run_dir")
+    rollback.add_argument("rule", help="id of the rule to roll back")
+    diff = commands.add_parser("diff", help="export the cells changed by a run")
+    diff.add_argument("run_dir")
+    diff.add_argument("-o", "--output", required=True, help="CSV or Parquet file to write")
+    diff.add_argument("--rule", help="only changes made by this rule")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        profile = load_profile(args.profile) if args.profile else None
+        cache = plan_cache()
+        schema = None
+        if args.schema is not None and detect_format(args.input) == "csv":
+            schema = pinned_schema(args.input, args.schema or schema_path(args.rules), cache)
+        tracer = tracer_from_args(args)
+        report = run_checkpointed(args.input, compile_plan(args.rules, cache), args.output,
+                                  run_dir=args.run_dir, chunksize=args.chunksize,
+                                  profile=profile, segment_bytes=args.segment_mb << 20,
+                                  schema=schema, tracer=tracer)
+        print(f"✅ Cleaned {report['rows_in']:,} rows → {report['rows_out']:,} rows in "
+              f"{report['elapsed_seconds']:.2f}s ({report['resumed_segments']} of "
+              f"{report['segments']} segments resumed from {report['run_dir']})")
+        if args.profile_output and "profile" in report:
+            save_profile(report["profile"], args.profile_output)
+            print(f"✅ Post-clean profile → {args.profile_output}")
+        save_trace(tracer, args)
+    elif args.command == "status":
+        records = OpLog(os.path.join(args.run_dir, OPLOG)).records()
+        if not records:
+            raise RunLogError(f"No operation log in {args.run_dir}")
+        state = _replay(records)
+        total = len(records[0]["segments"])
+        finished = records[-1]["op"] == "finish"
+        print(f"✅ {len(state['segments'])} of {total} segments committed"
+              f"{', output assembled' if finished else ''}")
+        for rule in sorted(state["rolled_back"]):
+            print(f"   rolled back: {rule}")
+    elif args.command == "rollback":
+        report = rollback_rule(args.run_dir, args.rule)
+        print(f"✅ Rolled back {args.rule}: replayed {len(report['replayed_segments'])} of "
+              f"{report['segments']} segments in {report['elapsed_seconds']:.2f}s")
+    else:
+        frame = load_diff(args.run_dir, rule_id=args.rule)
+        with ChunkWriter(args.output) as writer:
+            writer.write(frame)
+        print(f"✅ {len(frame):,} changed cells → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Stratified sampling and prompt digests for LLM rule discovery.
+
+The sampler rides along with the profiling pass. Every row gets a priority
+derived from a hash of its contents, and each stratum keeps the ``k`` rows
+with the smallest priorities (bottom-k reservoir sampling). Strata are:
+
+* the whole table,
+* per column: null rows,
+* per numeric column: order-of-magnitude bins, so rare outliers are kept,
+* per low-cardinality text column: one stratum per category, so rare
+  categories are as well represented as common ones.
+
+Because priorities depend only on row contents, the sample does not depend
+on chunk boundaries or on how partial samplers were merged. Re-profiling
+the same file always yields the same sample. :func:`build_digest` then packs
+the profile and sample into a text block that fits a prompt-token budget,
+so rule discovery costs the same for a 100 MB file as for a 10 GB one.
+"""
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PER_STRATUM = 20
+DEFAULT_MAX_CATEGORIES = 50
+DEFAULT_TOKEN_BUDGET = 4000
+
+# Rough characters-per-token ratio for English/JSON text in current LLM tokenizers.
+CHARS_PER_TOKEN = 4
+
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+class StratifiedSampler:
+    """Deterministic bottom-k stratified sample, mergeable across workers."""
+
+    def __init__(self, per_stratum=DEFAULT_PER_STRATUM, seed=0,
+                 max_categories=DEFAULT_MAX_CATEGORIES):
+        self.per_stratum = per_stratum
+        self.seed = seed
+        self.max_categories = max_categories
+        self.strata = {}
+        self.rows = {}
+        self.categories = {}
+        self.columns = None
+
+    def spawn(self):
+        """Return an empty sampler with the same configuration."""
+        return StratifiedSampler(self.per_stratum, self.seed, self.max_categories)
+
+    def update(self, frame):
+        """Offer every row of a chunk to the strata it belongs to."""
+        if frame.empty:
+            return
+        if self.columns is None:
+            self.columns = list(frame.columns)
+        priorities = self._priorities(frame)
+        self._offer(("*",), priorities, frame)
+        for name in frame.columns:
+            series = frame[name]
+            nulls = series.isna().to_numpy()
+            if nulls.any():
+                self._offer((name, "null"), priorities, frame, nulls)
+            if pd.api.types.is_bool_dtype(series.dtype):
+                continue
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                self._offer_magnitudes(name, series, priorities, frame)
+            elif not pd.api.types.is_datetime64_any_dtype(series.dtype):
+                self._offer_categories(name, series, priorities, frame)
+
+    def merge(self, other):
+        """Fold another sampler (e.g. from a worker process) into this one."""
+        if self.columns is None:
+            self.columns = other.columns
+        self.rows.update(other.rows)
+        for name, values in other.categories.items():
+            if values is None or self.categories.get(name, set()) is None:
+                self._fold_categories(name)
+            else:
+                self.categories.setdefault(name, set()).update(values)
+                if len(self.categories[name]) > self.max_categories:
+                    self._fold_categories(name)
+        for key, priorities in other.strata.items():
+            if key[1:2] == ("cat",) and self.categories.get(key[0]) is None:
+                key = (key[0], "cat", "*")
+            self._keep(key, priorities)
+        self._prune()
+        return self
+
+    def sample(self):
+        """Return the sampled rows as a DataFrame, ordered by priority.
+
+        The ``__strata`` column lists the strata each row was kept for.
+        """
+        membership = {}
+        for key in sorted(self.strata):
+            for priority in self.strata[key].tolist():
+                membership.setdefault(priority, []).append(key)
+        order = sorted(membership)
+        frame = pd.DataFrame([self.rows[p] for p in order], columns=self.columns)
+        frame["__strata"] = [
+            ";".join(":".join(map(str, key)) for key in membership[p]) for p in order
+        ]
+        return frame
+
+    def ranked_sample(self):
+        """Return sampled rows ordered so that every stratum is covered early.
+
+        Rows are taken round-robin: the best row of every stratum first, then
+        the second best, and so on. Truncating the result keeps the strata
+        as balanced as possible.
+        """
+        seen = set()
+        order = []
+        columns = [self.strata[key].tolist() for key in sorted(self.strata)]
+        for rank in range(self.per_stratum):
+            for priorities in columns:
+                if rank < len(priorities) and priorities[rank] not in seen:
+                    seen.add(priorities[rank])
+                    order.append(priorities[rank])
+        return pd.DataFrame([self.rows[p] for p in order], columns=self.columns)
+
+    def _priorities(self, frame):
+        hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+        mix = np.uint64((self.seed * _GOLDEN + _GOLDEN) & 0xFFFFFFFFFFFFFFFF)
+        with np.errstate(over="ignore"):
+            return (hashes ^ mix) * np.uint64(_GOLDEN)
+
+    def _offer_magnitudes(self, name, series, priorities, frame):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = np.isfinite(values)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            magnitude = np.floor(np.log10(np.abs(values)))
+            bins = np.where(values == 0, 0, np.sign(values) * (magnitude + 1))
+        bins = np.where(finite, bins, np.nan)
+        for label in np.unique(bins[finite]):
+            self._offer((name, "mag", f"{int(label):+d}"), priorities, frame, bins == label)
+        infinite = np.isinf(values)
+        if infinite.any():
+            self._offer((name, "mag", "inf"), priorities, frame, infinite)
+
+    def _offer_categories(self, name, series, priorities, frame):
+        values = series.astype(str).to_numpy(dtype=object)
+        nulls = series.isna().to_numpy()
+        known = self.categories.setdefault(name, set())
+        if known is None:
+            self._offer((name, "cat", "*"), priorities, frame, ~nulls)
+            return
+        uniques = pd.unique(values[~nulls])
+        known.update(uniques[:self.max_categories + 1].tolist())
+        if len(known) > self.max_categories:
+            self._fold_categories(name)
+            self._offer((name, "cat", "*"), priorities, frame, ~nulls)
+            return
+        for category in uniques:
+            self._offer((name, "cat", category), priorities, frame, (values == category) & ~nulls)
+
+    def _fold_categories(self, name):
+        """Collapse the per-category strata of a high-cardinality column into one."""
+        self.categories[name] = None
+        folded = (name, "cat", "*")
+        for key in [key for key in self.strata if key[:2] == (name, "cat") and key != folded]:
+            self._keep(folded, self.strata.pop(key))
+
+    def _offer(self, key, priorities, frame, mask=None):
+        """Offer the rows selected by ``mask`` (all rows if None) to one stratum."""
+        positions = np.flatnonzero(mask) if mask is not None else np.arange(priorities.size)
+        candidates = priorities[positions]
+        current = self.strata.get(key)
+        if current is not None and current.size >= self.per_stratum:
+            better = candidates < current[-1]
+            positions, candidates = positions[better], candidates[better]
+        if candidates.size == 0:
+            return
+        if candidates.size > self.per_stratum:
+            keep = np.argpartition(candidates, self.per_stratum - 1)[:self.per_stratum]
+            positions, candidates = positions[keep], candidates[keep]
+        rows = frame.iloc[positions].itertuples(index=False, name=None)
+        for priority, row in zip(candidates.tolist(), rows):
+            self.rows.setdefault(priority, row)
+        self._keep(key, candidates)
+        self._prune()
+
+    def _keep(self, key, priorities):
+        current = self.strata.get(key)
+        if current is not None:
+            priorities = np.union1d(current, priorities)
+        else:
+            priorities = np.unique(priorities)
+        self.strata[key] = priorities[:self.per_stratum]
+
+    def _prune(self):
+        # Drop rows no stratum references any more, so memory stays bounded.
+        if len(self.rows) <= 2 * self.per_stratum * max(1, len(self.strata)):
+            return
+        alive = set()
+        for priorities in self.strata.values():
+            alive.update(priorities.tolist())
+        self.rows = {p: row for p, row in self.rows.items() if p in alive}
+
+
+def estimate_tokens(text):
+    """Cheap, tokenizer-free token estimate used for budgeting prompts."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def build_digest(profile, sampler=None, token_budget=DEFAULT_TOKEN_BUDGET,
+                 count_tokens=estimate_tokens):
+    """Pack a profile and stratified sample into a prompt-sized digest.
+
+    Detail is shed step by step until the rendered digest fits in
+    ``token_budget`` tokens: histograms first, then most quantiles and top
+    values, then sample rows (fewest strata lost first). Returns a dict with
+    the ``text`` to embed in a prompt, its estimated ``tokens`` and the
+    ``level`` of detail that fit.
+    """
+    rows = sampler.ranked_sample() if sampler is not None else pd.DataFrame()
+    records = json.loads(rows.to_json(orient="values", date_format="iso")) if len(rows) else []
+    header = list(rows.columns)
+
+    for level in range(3):
+        columns = {name: compact_column(summary, level)
+                   for name, summary in profile.get("columns", {}).items()}
+        limit = len(records)
+        while True:
+            text = _render(profile, columns, header, records[:limit])
+            tokens = count_tokens(text)
+            # Only the last level gives up sample rows; earlier ones shed
+            # profile detail first.
+            if tokens <= token_budget or level < 2 or limit == 0:
+                break
+            limit //= 2
+        if tokens <= token_budget or level == 2:
+            return {"text": text, "tokens": tokens, "level": level,
+                    "sample_rows": limit, "fits": tokens <= token_budget}
+
+
+def _render(profile, columns, header, records):
+    document = {"rows": profile.get("rows"), "columns": columns}
+    if records:
+        document["sample"] = {"columns": header, "rows": records}
+    return json.dumps(document, separators=(",", ":"), default=str)
+
+
+def compact_column(summary, level=0):
+    """Return a rounded, trimmed copy of a column summary.
+
+    Level 0 keeps everything useful to a model, including a coarse
+    histogram; higher levels drop histograms, quantiles and top values.
+    """
+    keep = ["kind", "missing_pct", "distinct", "min", "max", "mean", "std",
+            "negatives", "zeros", "invalid", "min_length", "max_length"]
+    compact = {key: _round(summary[key]) for key in keep if key in summary}
+    quantiles = summary.get("quantiles")
+    if quantiles:
+        names = list(quantiles) if level == 0 else ["p01", "p50", "p99"]
+        compact["quantiles"] = {name: _round(quantiles[name]) for name in names
+                                if name in quantiles}
+    top = summary.get("top_values")
+    if top:
+        compact["top_values"] = [[item["value"], item["count"]]
+                                 for item in top[:10 if level == 0 else 3]]
+    histogram = summary.get("histogram")
+    if histogram and histogram.get("counts") and level == 0:
+        compact["histogram"] = _downsample(histogram, 8)
+    return compact
+
+
+def _downsample(histogram, bins):
+    counts = histogram["counts"]
+    edges = histogram["edges"]
+    step = max(1, math.ceil(len(counts) / bins))
+    return {
+        "edges": [_round(edge) for edge in edges[::step]] + (
+            [_round(edges[-1])] if (len(edges) - 1) % step else []),
+        "counts": [sum(counts[i:i + step]) for i in range(0, len(counts), step)],
+    }
+
+
+def _round(value, digits=4):
+    if isinstance(value, float) and math.isfinite(value) and value != 0:
+        return round(value, digits - 1 - int(math.floor(math.log10(abs(value)))))
+    return value
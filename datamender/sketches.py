@@ -0,0 +1,278 @@
+"""
+Mergeable summaries used by the profiler.
+
+Every sketch here supports ``update`` with a NumPy array and ``merge`` with
+another sketch of the same configuration. Merging partial sketches gives
+the same guarantees as one sketch built over all the data. That is what
+lets a large file be profiled as independent byte ranges or row groups
+and combined at the end.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BINS = 64
+DEFAULT_HLL_PRECISION = 14
+DEFAULT_KLL_K = 400
+
+
+class StreamingHistogram:
+    """Histogram with a fixed number of bins and an adaptive bin width.
+
+    Bins are aligned to integer multiples of a power-of-two width. When new
+    values fall outside the range the bins can cover, neighbouring bins are
+    merged pairwise and the width doubles. Because every grid nests inside
+    the next coarser one, two histograms can always be merged exactly. The
+    result matches a single histogram built over the concatenated data.
+    """
+
+    def __init__(self, bins=DEFAULT_BINS):
+        self.bins = bins
+        self.width = None
+        self.start = 0
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, values):
+        """Add an array of numeric values; non-finite values are ignored."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        low = float(values.min())
+        high = float(values.max())
+        if self.width is None:
+            self.width = _initial_width(low, high, self.bins)
+            self.start = math.floor(low / self.width)
+        self._fit(math.floor(low / self.width), math.floor(high / self.width))
+        index = (np.floor(values / self.width) - self.start).astype(np.int64)
+        self.counts += np.bincount(index, minlength=self.bins)
+
+    def merge(self, other):
+        """Fold another histogram with the same bin count into this one."""
+        if other.bins != self.bins:
+            raise ValueError("Cannot merge histograms with different bin counts")
+        first, last = other._occupied()
+        if first is None:
+            return self
+        if self.width is None:
+            self.width = other.width
+            self.start = other.start
+            self.counts = other.counts.copy()
+            return self
+        other = other.copy()
+        while other.width < self.width:
+            other._coarsen()
+        while self.width < other.width:
+            self._coarsen()
+        first, last = other._occupied()
+        self._fit(first, last)
+        while other.width < self.width:
+            other._coarsen()
+        first, last = other._occupied()
+        self.counts[first - self.start:last - self.start + 1] += (
+            other.counts[first - other.start:last - other.start + 1]
+        )
+        return self
+
+    def copy(self):
+        clone = StreamingHistogram(self.bins)
+        clone.width = self.width
+        clone.start = self.start
+        clone.counts = self.counts.copy()
+        return clone
+
+    def to_dict(self):
+        """Return the occupied bins as ``{"edges": [...], "counts": [...]}``."""
+        first, last = self._occupied()
+        if first is None:
+            return {"edges": [], "counts": []}
+        edges = [(first + i) * self.width for i in range(last - first + 2)]
+        counts = self.counts[first - self.start:last - self.start + 1]
+        return {"edges": edges, "counts": [int(c) for c in counts]}
+
+    def _fit(self, begin, end):
+        """Coarsen and re-anchor so bins ``begin..end`` are all covered."""
+        first, last = self._occupied()
+        if first is not None:
+            begin = min(begin, first)
+            end = max(end, last)
+        while end - begin + 1 > self.bins:
+            self._coarsen()
+            begin //= 2
+            end //= 2
+        self._shift(begin, end)
+
+    def _occupied(self):
+        nonzero = np.flatnonzero(self.counts)
+        if nonzero.size == 0:
+            return None, None
+        return self.start + int(nonzero[0]), self.start + int(nonzero[-1])
+
+    def _coarsen(self):
+        absolute = self.start + np.arange(self.bins)
+        start = self.start // 2
+        merged = np.bincount(
+            absolute // 2 - start, weights=self.counts, minlength=self.bins
+        )
+        self.counts = merged[:self.bins].astype(np.int64)
+        self.start = start
+        self.width *= 2
+
+    def _shift(self, begin, end):
+        if begin >= self.start and end < self.start + self.bins:
+            return
+        first, last = self._occupied()
+        counts = np.zeros(self.bins, dtype=np.int64)
+        if first is not None:
+            counts[first - begin:last - begin + 1] = (
+                self.counts[first - self.start:last - self.start + 1]
+            )
+        self.counts = counts
+        self.start = begin
+
+
+def _initial_width(low, high, bins):
+    span = high - low
+    scale = span / bins if span > 0 else max(abs(low), 1.0) / bins
+    return 2.0 ** math.ceil(math.log2(scale))
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count estimator (Flajolet et al., 2007).
+
+    Uses ``2 ** precision`` one-byte registers; the default of 14 gives a
+    standard error of about 0.8% in 16 KiB. Merging is a register-wise max.
+    """
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        """Add values; anything ``pandas.util.hash_array`` accepts works."""
+        values = np.asarray(values)
+        if values.size:
+            self.update_hashes(pd.util.hash_array(values))
+
+    def update_hashes(self, hashes):
+        """Add pre-computed 64-bit hashes."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes << np.uint64(p)
+        # Rank = leading zeros + 1 of the remaining bits. Shifting right by 11
+        # leaves 53 significant bits, which float64 represents exactly.
+        top = (rest >> np.uint64(11)).astype(np.float64)
+        with np.errstate(divide="ignore"):
+            msb = np.floor(np.log2(top))
+        rank = np.where(top > 0, 53 - msb, 64 - p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Return the estimated number of distinct values."""
+        m = float(self.registers.size)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction: linear counting is far more accurate.
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang and Liberty, 2016).
+
+    Items live in a stack of compactors; level ``h`` items carry weight
+    ``2 ** h``. When a compactor overflows, it is sorted and every other
+    item (random offset) is promoted to the next level. With the default
+    ``k`` the rank error is below 1% and the sketch holds about a thousand
+    floats, independent of the stream length.
+    """
+
+    def __init__(self, k=DEFAULT_KLL_K, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        if other.k != self.k:
+            raise ValueError("Cannot merge KLL sketches with different k")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantiles(self, fractions):
+        """Return approximate values at the given fractions in ``[0, 1]``."""
+        fractions = np.asarray(fractions, dtype=np.float64)
+        if self.count == 0:
+            return np.full(fractions.shape, np.nan)
+        items, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        targets = fractions * cumulative[-1]
+        index = np.searchsorted(cumulative, targets, side="left")
+        return items[np.clip(index, 0, items.size - 1)]
+
+    def rank(self, value):
+        """Return the approximate fraction of items ``<= value``."""
+        if self.count == 0:
+            return 0.0
+        items, weights = self._weighted()
+        below = weights[:np.searchsorted(items, value, side="right")].sum()
+        return float(below / weights.sum())
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(level.size, 1 << height, dtype=np.int64)
+            for height, level in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            capacity = self._capacity(level)
+            if items.size > capacity:
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(items)
+                # Compact an even-sized sorted run and leave the rest behind,
+                # so a bulk update does not drain the lower levels entirely.
+                retained = capacity // 2 + (items.size - capacity // 2) % 2
+                keep = items[:retained]
+                paired = items[retained:]
+                promoted = paired[int(self._rng.integers(2))::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
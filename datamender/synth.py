@@ -0,0 +1,200 @@
+"""
+Seeded generator of messy taxi / ride-sharing trip data (plan.md, Week 6).
+
+Produces CSV or Parquet files of any size, from a megabyte to tens of
+gigabytes, written chunk by chunk so memory stays flat. Every chunk is
+drawn from its own generator seeded with ``(seed, chunk index)``, so the
+same arguments always give byte-identical files. Known anomalies are
+injected at configurable rates and counted in the returned manifest:
+
+* ``negative`` - negative fares, tips or distances,
+* ``null`` - missing passenger counts, fares or payment types,
+* ``swapped`` - pickup and dropoff timestamps swapped,
+* ``duplicate`` - exact copies of other trips in the same chunk,
+* ``outlier`` - fares x100, distances x1000 or 99 passengers.
+
+::
+
+    python -m datamender.synth trips.csv --size-mb 100 --seed 7
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datamender.io import ChunkWriter, detect_format
+from datamender.rules import Rule, save_rules
+
+CHUNK_ROWS = 250_000
+DEFAULT_SEED = 0
+ANOMALY_RATES = {
+    "negative": 0.01,
+    "null": 0.02,
+    "swapped": 0.005,
+    "duplicate": 0.002,
+    "outlier": 0.001,
+}
+START = np.datetime64("2024-01-01T00:00:00", "s")
+SECONDS_PER_YEAR = 365 * 24 * 3600
+ZONES = 265
+PAYMENT_TYPES = np.array(["card", "cash", "no_charge", "dispute", "unknown"], dtype=object)
+PAYMENT_WEIGHTS = (0.68, 0.27, 0.02, 0.01, 0.02)
+PASSENGER_WEIGHTS = (0.70, 0.15, 0.05, 0.04, 0.04, 0.02)
+
+# Rows used to estimate the on-disk size of one row for --size-mb.
+_CALIBRATION_ROWS = 20_000
+
+
+def trip_chunk(rows, seed=DEFAULT_SEED, index=0, first_id=0, rates=None):
+    """Return ``(frame, injected)``: one chunk of trips and its anomaly counts."""
+    rates = ANOMALY_RATES if rates is None else {**ANOMALY_RATES, **rates}
+    rng = np.random.default_rng([seed, index])
+    pickup = START + rng.integers(0, SECONDS_PER_YEAR, rows).astype("timedelta64[s]")
+    duration = np.clip(rng.lognormal(6.6, 0.6, rows), 60, 3 * 3600).astype(np.int64)
+    dropoff = pickup + duration.astype("timedelta64[s]")
+    distance = np.round(duration / 3600 * rng.gamma(4.0, 3.0, rows), 2)
+    fare = np.round(3.0 + 2.5 * distance + 0.5 * duration / 60, 2)
+    payment = PAYMENT_TYPES[rng.choice(len(PAYMENT_TYPES), rows, p=PAYMENT_WEIGHTS)]
+    tip = np.where(payment == "card", np.round(fare * rng.uniform(0, 0.3, rows), 2), 0.0)
+    frame = pd.DataFrame({
+        "trip_id": np.arange(first_id, first_id + rows, dtype=np.int64),
+        "vendor_id": rng.integers(1, 3, rows),
+        "pickup_datetime": pickup.astype("datetime64[ns]"),
+        "dropoff_datetime": dropoff.astype("datetime64[ns]"),
+        "passenger_count": (rng.choice(6, rows, p=PASSENGER_WEIGHTS) + 1).astype(np.float64),
+        "trip_distance": distance,
+        "pickup_zone": rng.integers(1, ZONES + 1, rows),
+        "dropoff_zone": rng.integers(1, ZONES + 1, rows),
+        "payment_type": payment,
+        "fare_amount": fare,
+        "tip_amount": tip,
+        "total_amount": np.round(fare + tip + 1.0, 2),
+    })
+    frame["payment_type"] = frame["payment_type"].astype(object)
+
+    injected = {}
+    rows_for = {name: np.flatnonzero(rng.random(rows) < rate) for name, rate in rates.items()}
+
+    picked = rows_for["negative"]
+    for column, part in zip(("fare_amount", "tip_amount", "trip_distance"),
+                            np.array_split(rng.permutation(picked), 3)):
+        frame.loc[part, column] = -frame.loc[part, column].abs() - 0.01
+    injected["negative"] = int(picked.size)
+
+    picked = rows_for["null"]
+    for column, part in zip(("passenger_count", "fare_amount", "payment_type"),
+                            np.array_split(rng.permutation(picked), 3)):
+        frame.loc[part, column] = None
+    injected["null"] = int(picked.size)
+
+    picked = rows_for["swapped"]
+    frame.loc[picked, ["pickup_datetime", "dropoff_datetime"]] = (
+        frame.loc[picked, ["dropoff_datetime", "pickup_datetime"]].to_numpy()
+    )
+    injected["swapped"] = int(picked.size)
+
+    picked = rows_for["outlier"]
+    fares, distances, passengers = np.array_split(rng.permutation(picked), 3)
+    frame.loc[fares, "fare_amount"] *= 100
+    frame.loc[distances, "trip_distance"] *= 1000
+    frame.loc[passengers, "passenger_count"] = 99
+    injected["outlier"] = int(picked.size)
+
+    picked = rows_for["duplicate"]
+    if rows > 1 and picked.size:
+        sources = rng.integers(0, rows, picked.size)
+        frame.iloc[picked] = frame.iloc[sources].to_numpy()
+    injected["duplicate"] = int(picked.size)
+    return frame, injected
+
+
+def generate_trips(path, rows=None, size_mb=None, seed=DEFAULT_SEED, rates=None,
+                   chunk_rows=CHUNK_ROWS):
+    """Write a messy trips file (CSV or Parquet, by extension) and return its manifest.
+
+    Give either ``rows`` or an approximate ``size_mb``. The manifest records
+    the arguments, the final row and byte counts, and how many anomalies of
+    each kind were injected.
+    """
+    if rows is None:
+        if size_mb is None:
+            raise ValueError("Give either rows or size_mb")
+        rows = max(1, math.ceil(size_mb * 2 ** 20 / _bytes_per_row(path, seed, rates)))
+    injected = dict.fromkeys(ANOMALY_RATES, 0)
+    with ChunkWriter(path) as writer:
+        for index, first in enumerate(range(0, rows, chunk_rows)):
+            frame, counts = trip_chunk(min(chunk_rows, rows - first), seed, index, first, rates)
+            writer.write(frame)
+            for name, count in counts.items():
+                injected[name] += count
+    return {
+        "path": os.fspath(path),
+        "format": detect_format(path),
+        "seed": seed,
+        "rows": rows,
+        "bytes": os.path.getsize(path),
+        "chunk_rows": chunk_rows,
+        "rates": {**ANOMALY_RATES, **(rates or {})},
+        "injected": injected,
+    }
+
+
+def trip_rules():
+    """Accepted rules that repair the anomalies :func:`trip_chunk` injects."""
+    return [
+        Rule("non_negative", "fare_amount", "abs"),
+        Rule("range", "fare_amount", "clip", min=0, max=500),
+        Rule("non_negative", "tip_amount", "abs"),
+        Rule("non_negative", "trip_distance", "abs"),
+        Rule("range", "trip_distance", "drop", min=0, max=200),
+        Rule("not_null", "passenger_count", "fill", value=1),
+        Rule("range", "passenger_count", "clip", min=1, max=6),
+        Rule("not_null", "payment_type", "fill", value="unknown"),
+        Rule("not_null", "fare_amount", "drop"),
+        Rule("order", "pickup_datetime", "swap", other="dropoff_datetime"),
+    ]
+
+
+def _bytes_per_row(path, seed, rates):
+    frame, _ = trip_chunk(_CALIBRATION_ROWS, seed, 0, 0, rates)
+    if detect_format(path) == "parquet":
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), buffer)
+        return buffer.tell() / _CALIBRATION_ROWS
+    return len(frame.to_csv(index=False).encode()) / _CALIBRATION_ROWS
+
+
+def main(argv=None):
+    """Generate a messy trips file from the command line."""
+    parser = argparse.ArgumentParser(description="Generate messy ride-sharing trip data.")
+    parser.add_argument("path", help="CSV or Parquet file to write")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--rows", type=int)
+    size.add_argument("--size-mb", type=float, help="approximate file size")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--rules", help="also write the matching accepted-rules YAML here")
+    parser.add_argument("--manifest", help="write the manifest JSON here")
+    args = parser.parse_args(argv)
+
+    manifest = generate_trips(args.path, rows=args.rows, size_mb=args.size_mb,
+                              seed=args.seed, chunk_rows=args.chunk_rows)
+    if args.rules:
+        save_rules(trip_rules(), args.rules)
+    if args.manifest:
+        with open(args.manifest, "w") as f:
+            json.dump(manifest, f, indent=2)
+    print(f"✅ {manifest['rows']:,} trips, {manifest['bytes'] / 2 ** 20:.1f} MB → {args.path}")
+    print("   injected: " + ", ".join(f"{count:,} {name}"
+                                     for name, count in manifest["injected"].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Run tracing: where the time, rows, bytes and memory of a pipeline run go.
+
+A :class:`Tracer` is handed to the pipeline stages through their
+``tracer`` argument::
+
+    profile_file → discover_rules_async → check_constraints → fix_file (+ re-profile)
+
+Every stage records timed spans: the stage itself, its read, transform
+and write steps per chunk, every rule and constraint, and every model
+call. Each span carries the rows and bytes it handled and the peak
+resident set size at its end. Parallel stages also sample the depth of
+their work queue. Stages given no tracer record nothing.
+
+:meth:`Tracer.summary` aggregates the spans per stage, rule, constraint
+and model (wall time, rows/s, MB/s, peak RSS). :meth:`Tracer.chrome_trace`
+returns the raw spans as Chrome trace events for chrome://tracing or
+Perfetto::
+
+    python -m datamender.fixer trips.csv rules.yaml -o clean.parquet \\
+        --trace trace.json --chrome-trace trace.events.json
+    python -m datamender.trace trace.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+# Counters turned into rates in the summary.
+RATES = (("rows", "rows_per_second", 1), ("bytes_read", "read_mb_per_second", 2 ** 20),
+         ("bytes_written", "write_mb_per_second", 2 ** 20))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT / 2 ** 20
+
+
+@dataclass
+class Span:
+    """One timed piece of work; ``started`` comes from :func:`time.perf_counter`.
+
+    Spans with an ``async_id`` may overlap others on their thread (e.g.
+    concurrent model calls) and become async events in a Chrome trace.
+    """
+
+    name: str
+    category: str
+    started: float
+    pid: int
+    tid: int
+    seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    async_id: int = None
+    counters: dict = field(default_factory=dict)
+
+    def add(self, **counters):
+        """Add to the span's counters (rows, bytes_read, bytes_written, ...)."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+
+class Tracer:
+    """Collects spans and queue-depth samples of one run."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.queues = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category="stage", **counters):
+        """Time the ``with`` block as a span; yields the :class:`Span` to add counters to."""
+        span = Span(name, category, time.perf_counter(), os.getpid(), threading.get_native_id(),
+                    counters=counters)
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - span.started
+            span.peak_rss_mb = peak_rss_mb()
+            self.add(span)
+
+    def record(self, name, started, seconds, category="stage", async_id=None, **counters):
+        """Add a span the caller timed itself."""
+        self.add(Span(name, category, started, os.getpid(), threading.get_native_id(), seconds,
+                      peak_rss_mb(), async_id, counters))
+
+    def add(self, span):
+        """Add a finished span, e.g. one returned by :func:`traced_call` from a worker."""
+        with self._lock:
+            self.spans.append(span)
+
+    def queue(self, name, depth):
+        """Sample the depth of a work queue."""
+        with self._lock:
+            self.queues.setdefault(name, []).append((time.perf_counter(), depth))
+
+    def summary(self):
+        """Totals per span name, grouped by category, plus queue statistics."""
+        summary = {"elapsed_seconds": round(time.perf_counter() - self.origin, 6),
+                   "peak_rss_mb": round(peak_rss_mb(), 1)}
+        for span in self.spans:
+            group = summary.setdefault(f"{span.category}s", {})
+            totals = group.setdefault(span.name, {"calls": 0, "seconds": 0.0, "peak_rss_mb": 0.0})
+            totals["calls"] += 1
+            totals["seconds"] += span.seconds
+            totals["peak_rss_mb"] = max(totals["peak_rss_mb"], span.peak_rss_mb)
+            for key, value in span.counters.items():
+                totals[key] = totals.get(key, 0) + value
+        for category in {f"{span.category}s" for span in self.spans}:
+            for totals in summary[category].values():
+                for count, rate, unit in RATES:
+                    if count in totals and totals["seconds"] > 0:
+                        totals[rate] = round(totals[count] / unit / totals["seconds"], 3)
+                totals["seconds"] = round(totals["seconds"], 6)
+                totals["peak_rss_mb"] = round(totals["peak_rss_mb"], 1)
+        summary["queues"] = {
+            name: {"samples": len(samples), "max": max(depth for _, depth in samples),
+                   "mean": round(sum(depth for _, depth in samples) / len(samples), 3)}
+            for name, samples in self.queues.items()
+        }
+        return summary
+
+    def chrome_trace(self):
+        """The spans and queue samples in the Chrome trace-event format."""
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": worker,
+                   "args": {"name": "datamender" if worker == pid else f"worker {worker}"}}
+                  for worker in sorted({span.pid for span in self.spans} | {pid})]
+        for span in self.spans:
+            event = {"name": span.name, "cat": span.category, "pid": span.pid, "tid": span.tid,
+                     "ts": self._micros(span.started),
+                     "args": {**span.counters, "peak_rss_mb": round(span.peak_rss_mb, 1)}}
+            if span.async_id is None:
+                events.append({**event, "ph": "X", "dur": round(span.seconds * 1e6, 3)})
+            else:
+                events.append({**event, "ph": "b", "id": span.async_id})
+                events.append({"name": span.name, "cat": span.category, "ph": "e",
+                               "id": span.async_id, "pid": span.pid, "tid": span.tid,
+                               "ts": self._micros(span.started + span.seconds)})
+        for name, samples in self.queues.items():
+            events.extend({"name": name, "cat": "queue", "ph": "C", "pid": pid,
+                           "ts": self._micros(at), "args": {"depth": depth}}
+                          for at, depth in samples)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path=None, chrome_path=None):
+        """Write the summary JSON to ``path`` and the Chrome trace to ``chrome_path``."""
+        for target, document in ((path, self.summary), (chrome_path, self.chrome_trace)):
+            if target:
+                with open(target, "w") as f:
+                    json.dump(document(), f, indent=None if document == self.chrome_trace else 2)
+
+    def _micros(self, moment):
+        return round((moment - self.origin) * 1e6, 3)
+
+
+class NullTracer(Tracer):
+    """A tracer that records nothing; stages use it when given no tracer."""
+
+    def add(self, span):
+        pass
+
+    def record(self, name, started, seconds, category="stage", async_id=None, **counters):
+        pass
+
+    def queue(self, name, depth):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def traced_call(name, function, *args):
+    """Run ``function(*args)`` in a worker process; returns ``(result, span)``."""
+    started = time.perf_counter()
+    result = function(*args)
+    return result, Span(name, "stage", started, os.getpid(), threading.get_native_id(),
+                        time.perf_counter() - started, peak_rss_mb())
+
+
+def add_trace_arguments(parser):
+    """Add the ``--trace`` and ``--chrome-trace`` options to a command-line parser."""
+    parser.add_argument("--trace", help="write a JSON trace (time, rows/s, bytes and peak RSS "
+                                        "per stage and rule) here")
+    parser.add_argument("--chrome-trace", help="write Chrome trace events (chrome://tracing, "
+                                               "Perfetto) here")
+
+
+def tracer_from_args(args):
+    """A Tracer if the command line asked for a trace, else None."""
+    return Tracer() if args.trace or args.chrome_trace else None
+
+
+def save_trace(tracer, args):
+    """Write the traces requested by :func:`add_trace_arguments` options."""
+    if tracer is None:
+        return
+    tracer.save(args.trace, args.chrome_trace)
+    for path in (args.trace, args.chrome_trace):
+        if path:
+            print(f"✅ Trace → {path}")
+
+
+def main(argv=None):
+    """Print the slowest stages and rules of a JSON trace."""
+    parser = argparse.ArgumentParser(description="Summarise a DataMender run trace.")
+    parser.add_argument("trace", help="JSON trace written with --trace")
+    parser.add_argument("--top", type=int, default=10, help="entries shown per category")
+    args = parser.parse_args(argv)
+
+    with open(args.trace) as f:
+        summary = json.load(f)
+    print(f"✅ {summary['elapsed_seconds']:.2f}s, peak RSS {summary['peak_rss_mb']:.0f} MB")
+    for category, entries in summary.items():
+        if not isinstance(entries, dict) or category == "queues":
+            continue
+        print(f"   {category}:")
+        ranked = sorted(entries.items(), key=lambda item: -item[1]["seconds"])
+        for name, totals in ranked[:args.top]:
+            rate = totals.get("rows_per_second")
+            rate = f"{rate:>14,.0f} rows/s" if rate is not None else " " * 21
+            print(f"     {name:<36} {totals['seconds']:>9.3f}s {rate}  "
+                  f"peak {totals['peak_rss_mb']:.0f} MB")
+    for name, queue in summary.get("queues", {}).items():
+        print(f"   queue {name}: max depth {queue['max']}, mean {queue['mean']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,30 @@
 """
 Generate LaTeX Beamer slides for DataMender project presentation.
 Based on the project requirements and documented plans.
+
+Slides are assembled by datamender.report from one template per frame
+group. Results frames are added when benchmark or cleaning-run metrics
+JSON is given; only frames whose inputs changed are re-rendered, and
+pdflatex is skipped when the deck is unchanged since the last build:
+
+    python presentation/generate_slides.py --benchmark benchmark.json --fix-report fix.json
 """
 
+import argparse
 import os
+import sys
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
 
-def create_latex_presentation():
-    """Create the DataMender project presentation as raw LaTeX."""
-    
-    latex_content = r"""
+from datamender.report import (  # noqa: E402
+    Section, build_document, collect_metrics, missing_chart, rule_chart, throughput_table,
+    timing_chart,
+)
+
+DOCUMENT = "datamender_presentation"
+
+PREAMBLE = r"""
 \documentclass{beamer}
 
 % Packages
@@ -19,6 +34,9 @@ def create_latex_presentation():
 \usepackage{graphicx}
 \usepackage{xcolor}
 \usepackage{tikz}
+\usepackage{pgfplots}
+
+\pgfplotsset{compat=1.16}
 
 % Modern theme and colors
 \usetheme{Rochester}
@@ -68,9 +86,66 @@ def create_latex_presentation():
 \author{Group 8}
 \institute{Big Data Systems, Algorithms and Networks}
 \date{September 2025}
+"""
+
+BENCHMARK_TEMPLATE = r"""
+% Benchmark slides
+\begin{frame}
+    \frametitle{Throughput \& Memory}
+
+$table
+\end{frame}
+
+\begin{frame}
+    \frametitle{Processing Time vs.\ File Size}
+
+$chart
+\end{frame}
+"""
+
+CLEANING_TEMPLATE = r"""
+% Cleaning results slide
+\begin{frame}
+    \frametitle{Anomalies Before \& After Cleaning}
+
+    \begin{exampleblock}{Result}
+        $removed\% of $before anomalies removed, $dropped of $rows_in rows dropped
+    \end{exampleblock}
+
+$chart
+\end{frame}
+"""
 
-\begin{document}
+MISSING_TEMPLATE = r"""
+% Missing values slide
+\begin{frame}
+    \frametitle{Missing Values Before \& After Cleaning}
+
+$chart
+\end{frame}
+"""
+
+
+def benchmark_fill(metrics):
+    runs = metrics["throughput"]
+    return {"table": throughput_table(runs, font=r"\tiny"),
+            "chart": timing_chart(runs, width=r"0.85\textwidth", height=r"0.7\textheight")}
 
+
+def cleaning_fill(metrics):
+    anomalies, rows = metrics["anomalies"], metrics["rows"]
+    return {"before": f"{anomalies['before']:,}", "removed": f"{anomalies['removed_pct']:.1f}",
+            "rows_in": f"{rows['rows_in']:,}", "dropped": f"{rows['rows_dropped']:,}",
+            "chart": rule_chart(metrics["rules"], width=r"\textwidth", height=r"0.55\textheight")}
+
+
+def missing_fill(metrics):
+    return {"chart": missing_chart(metrics["missing"], width=r"\textwidth",
+                                   height=r"0.7\textheight")}
+
+
+SECTIONS = [
+    Section("title", r"""
 % Title slide with custom styling
 \begin{frame}[plain]
     \begin{center}
@@ -100,7 +175,8 @@ def create_latex_presentation():
         \end{minipage}
     \end{center}
 \end{frame}
-
+"""),
+    Section("background", r"""
 % Slide 1: Background, Problem Statement, Objectives
 \begin{frame}
     \frametitle{Background \& Problem Statement}
@@ -129,7 +205,8 @@ def create_latex_presentation():
         \end{itemize}
     \end{exampleblock}
 \end{frame}
-
+"""),
+    Section("deliverables", r"""
 % Slide 2: Expected Deliverables and Timeline
 \begin{frame}
     \frametitle{Deliverables \& Timeline}
@@ -161,7 +238,12 @@ def create_latex_presentation():
         \end{column}
     \end{columns}
 \end{frame}
-
+"""),
+    Section("benchmarks", BENCHMARK_TEMPLATE, inputs=("throughput",), fill=benchmark_fill),
+    Section("cleaning", CLEANING_TEMPLATE, inputs=("anomalies", "rows", "rules"),
+            fill=cleaning_fill),
+    Section("missing", MISSING_TEMPLATE, inputs=("missing",), fill=missing_fill),
+    Section("references", r"""
 % References slide
 \begin{frame}[allowframebreaks]
     \frametitle{References}
@@ -178,31 +260,40 @@ def create_latex_presentation():
               \textit{VLDB Endowment}, 2017.
     \end{enumerate}
 \end{frame}
-
-\end{document}
-"""
-    
-    return latex_content
+"""),
+]
 
 
 def main():
-    """Generate the LaTeX presentation file."""
+    """Render the slides from their templates and compile them to PDF."""
+    parser = argparse.ArgumentParser(description="Generate the DataMender presentation.")
+    parser.add_argument("--benchmark", help="datamender.benchmark results JSON")
+    parser.add_argument("--fix-report", help="report JSON written by datamender.fixer --report")
+    parser.add_argument("--profile", help="pre-clean profile JSON, for the missing-value chart")
+    parser.add_argument("--no-pdf", action="store_true", help="only write the .tex files")
+    parser.add_argument("--force", action="store_true", help="ignore cached hashes")
+    args = parser.parse_args()
+
     print("Generating DataMender presentation slides...")
-    
-    # Create the document content
-    latex_content = create_latex_presentation()
-    
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    output_file = os.path.join(script_dir, 'datamender_presentation.tex')
-    
-    # Write to file
-    with open(output_file, 'w') as f:
-        f.write(latex_content)
-    
-    print("✅ Generated datamender_presentation.tex")
-    print("To compile to PDF, run: pdflatex datamender_presentation.tex")
+    metrics = collect_metrics(args.benchmark, args.fix_report, args.profile)
+    # Two passes: Beamer needs the first to count frames for the footer.
+    result = build_document(DOCUMENT, PREAMBLE, SECTIONS, metrics, SCRIPT_DIR,
+                            compile=not args.no_pdf, passes=2, force=args.force)
+    print(f"✅ Generated {DOCUMENT}.tex ({len(result.rendered)} sections rendered, "
+          f"{len(result.reused)} unchanged)")
+
+    if args.no_pdf:
+        print(f"To compile to PDF, run: pdflatex {DOCUMENT}.tex")
+    elif result.compiled:
+        print(f"✅ Generated {DOCUMENT}.pdf")
+    elif result.error == "pdflatex not found":
+        print(f"⚠️  pdflatex not found. To compile to PDF, run: pdflatex {DOCUMENT}.tex")
+    elif result.error:
+        print("❌ PDF compilation failed:")
+        print(result.error)
+    else:
+        print(f"✅ {DOCUMENT}.pdf is up to date, skipped pdflatex")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,15 +2,31 @@
 """
 Generate LaTeX proposal document for DataMender project.
 Based on the project requirements and documented plans.
+
+The document is assembled by datamender.report from one template per
+section. Benchmark and cleaning-run sections are added when their metrics
+JSON is given; only sections whose inputs changed are re-rendered, and
+pdflatex is skipped when the document is unchanged since the last build:
+
+    python proposal/generate_proposal.py --benchmark benchmark.json \
+        --fix-report fix.json --profile profile.json
 """
 
+import argparse
 import os
+import sys
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
 
-def create_latex_proposal():
-    """Create the DataMender project proposal as raw LaTeX."""
-    
-    latex_content = r"""
+from datamender.report import (  # noqa: E402
+    Section, build_document, collect_metrics, missing_chart, rule_chart, throughput_table,
+    timing_chart,
+)
+
+DOCUMENT = "datamender_proposal_polished"
+
+PREAMBLE = r"""
 \documentclass[11pt]{article}
 
 % Packages
@@ -20,11 +36,14 @@ def create_latex_proposal():
 \usepackage{graphicx}
 \usepackage{xcolor}
 \usepackage{tikz}
+\usepackage{pgfplots}
 \usepackage{enumitem}
 \usepackage{amsmath}
 \usepackage{amsfonts}
 \usepackage{hyperref}
 
+\pgfplotsset{compat=1.16}
+
 % Custom colors
 \definecolor{primaryblue}{RGB}{41, 128, 185}
 \definecolor{accentgreen}{RGB}{39, 174, 96}
@@ -43,9 +62,61 @@ def create_latex_proposal():
 \fancyhead[L]{\color{primaryblue}\textbf{DataMender Project Proposal}}
 \fancyhead[R]{\color{darkgray}Group 8}
 \fancyfoot[C]{\thepage}
+"""
+
+BENCHMARK_TEMPLATE = r"""
+% Benchmark results
+\section{\color{primaryblue}Benchmark Results}
+
+Throughput and peak memory of every pipeline stage on generated ride-sharing data of $sizes~MB, measured with \texttt{datamender.benchmark}. Each stage runs in its own process, so peak memory is that of the stage alone.
+
+$table
+
+\begin{figure}[h]
+$chart
+\caption{Processing time versus file size for each pipeline stage}
+\end{figure}
+"""
+
+CLEANING_TEMPLATE = r"""
+% Cleaning results
+\section{\color{primaryblue}Cleaning Results}
+
+The accepted rules found $before anomalies in $rows_in rows. After cleaning $after remain, so $removed\% were removed; $dropped rows were dropped altogether.
+
+\begin{figure}[h]
+$chart
+\caption{Rows violating each rule before and after cleaning}
+\end{figure}
+"""
+
+MISSING_TEMPLATE = r"""
+\begin{figure}[h]
+$chart
+\caption{Missing values per column before and after cleaning}
+\end{figure}
+"""
+
+
+def benchmark_fill(metrics):
+    runs = metrics["throughput"]
+    return {"sizes": ", ".join(f"{run['size_mb']:g}" for run in runs),
+            "table": throughput_table(runs), "chart": timing_chart(runs)}
+
+
+def cleaning_fill(metrics):
+    anomalies, rows = metrics["anomalies"], metrics["rows"]
+    return {"before": f"{anomalies['before']:,}", "after": f"{anomalies['after']:,}",
+            "removed": f"{anomalies['removed_pct']:.1f}", "rows_in": f"{rows['rows_in']:,}",
+            "dropped": f"{rows['rows_dropped']:,}", "chart": rule_chart(metrics["rules"])}
 
-\begin{document}
 
+def missing_fill(metrics):
+    return {"chart": missing_chart(metrics["missing"])}
+
+
+SECTIONS = [
+    Section("title", r"""
 % Title section
 \begin{center}
     {\Huge\color{primaryblue}\textbf{DataMender: Smart Cleaning for Large CSV/Parquet Files}}
@@ -68,7 +139,8 @@ def create_latex_proposal():
 \end{center}
 
 \vspace{0.5cm}
-
+"""),
+    Section("problem", r"""
 % Section 1: Problem Statement and Motivation
 \section{\color{primaryblue}Problem Statement and Motivation}
 
@@ -79,7 +151,8 @@ The scale challenge compounds several fundamental issues. Modern datasets freque
 The consequences of poor data quality cascade throughout entire analytical pipelines. Inconsistent data leads to unreliable statistical analyses, biased machine learning models, and ultimately, flawed business decisions that can cost organizations millions of dollars. In an era where data-driven decision making has become a competitive necessity, organizations cannot afford the luxury of manual, error-prone data cleaning processes.
 
 What the industry desperately needs is an intelligent system that can automatically identify data quality issues, suggest contextually appropriate cleaning strategies, and seamlessly integrate human expertise to validate and refine these suggestions. This represents a fundamental shift from reactive manual cleaning to proactive, AI-assisted data quality management.
-
+"""),
+    Section("related_work", r"""
 % Section 2: Related Work and Current Limitations
 \section{\color{primaryblue}Related Work and Current Limitations}
 
@@ -94,7 +167,8 @@ The second gap involves validation and control. Existing tools provide limited m
 The third limitation addresses the fundamental challenge of LLM hallucination in data cleaning contexts. When language models generate cleaning rules, they may introduce subtle errors, inappropriate transformations, or rules that work well on sample data but fail catastrophically when applied to complete datasets. Current tools provide insufficient safeguards against these failure modes, making them unsuitable for production use.
 
 These limitations create a clear market opportunity for a tool that combines the intelligence of LLM-powered automation with robust human oversight mechanisms, specifically designed to handle enterprise-scale data cleaning challenges.
-
+"""),
+    Section("solution", r"""
 % Section 3: Proposed Solution Architecture
 \section{\color{primaryblue}DataMender: A Human-AI Collaborative Approach}
 
@@ -107,7 +181,8 @@ DataMender addresses these fundamental limitations through a carefully designed
 \textbf{Interactive Validation Interface:} The final component provides an intuitive yet powerful interface for reviewing, editing, and approving suggested cleaning rules before application. Our validation workflow includes side-by-side data previews, impact analysis showing exactly which records will be affected, and reversible operation logging that enables immediate rollback if issues arise. This interface transforms rule validation from a tedious bottleneck into an efficient quality assurance process.
 
 This architecture creates a seamless workflow where machine intelligence handles the computationally intensive tasks of pattern identification and rule generation, while human expertise focuses on the high-value activities of validation, refinement, and strategic decision-making.
-
+"""),
+    Section("innovation", r"""
 % Section 4: Technical Innovation and Risk Mitigation
 \section{\color{primaryblue}Technical Innovation and Reliability Safeguards}
 
@@ -122,7 +197,8 @@ DataMender introduces several key innovations that advance the state-of-the-art
 \textbf{Performance Optimization:} Our system addresses the computational challenges of large-scale data cleaning through several optimization strategies. Memory-mapped file access minimizes RAM requirements, parallel processing pipelines maximize CPU utilization, and incremental transformation capabilities allow users to process datasets in manageable chunks while maintaining consistency across the entire cleaning workflow.
 
 The combination of these innovations creates a robust, production-ready system that maintains the intelligence benefits of LLM-powered automation while providing the reliability guarantees required for enterprise deployment.
-
+"""),
+    Section("competition", r"""
 % Section 5: Competitive Analysis and Market Position
 \section{\color{primaryblue}Competitive Landscape and Differentiation}
 
@@ -159,7 +235,8 @@ Trifacta and Alteryx represent the current enterprise standard, offering sophist
 Emerging LLM-based tools show promise but suffer from the scale and reliability limitations discussed earlier. Most operate as research prototypes rather than production-ready systems, lacking the robust error handling and validation workflows necessary for enterprise deployment.
 
 DataMender uniquely combines advanced LLM automation with enterprise-grade reliability safeguards, all within an open-source framework that ensures broad accessibility. This positions us to capture demand from organizations seeking intelligent automation without the prohibitive costs or reliability risks of current alternatives.
-
+"""),
+    Section("plan", r"""
 % Section 6: Implementation Strategy and Timeline
 \section{\color{primaryblue}Development Plan and Team Coordination}
 
@@ -194,7 +271,12 @@ The final phase emphasizes comprehensive testing, performance benchmarking, and
 \textbf{Tamali Halder} coordinates testing frameworks, performance metrics collection, and technical documentation, ensuring comprehensive validation and clear communication of results.
 
 Cross-team collaboration occurs throughout all phases, with particular emphasis on dataset curation, user experience testing, and presentation development involving all team members.
-
+"""),
+    Section("benchmarks", BENCHMARK_TEMPLATE, inputs=("throughput",), fill=benchmark_fill),
+    Section("cleaning", CLEANING_TEMPLATE, inputs=("anomalies", "rows", "rules"),
+            fill=cleaning_fill),
+    Section("missing", MISSING_TEMPLATE, inputs=("missing",), fill=missing_fill),
+    Section("impact", r"""
 % Section 7: Expected Impact and Future Research Directions
 \section{\color{primaryblue}Research Contributions and Long-term Vision}
 
@@ -211,7 +293,8 @@ DataMender represents more than a practical tool for data cleaning; it embodies
 \textbf{Broader Vision:} We envision DataMender as the foundation for a new generation of intelligent data management systems that seamlessly blend human expertise with AI automation. As LLM capabilities continue to advance, the principles and architectures we develop will inform increasingly sophisticated tools for data governance, quality assurance, and automated compliance monitoring.
 
 Our work demonstrates that the future of data science lies not in replacing human expertise with AI automation, but in creating intelligent systems that amplify human capabilities while maintaining the oversight and control necessary for reliable, trustworthy data management.
-
+"""),
+    Section("references", r"""
 % References
 \section{\color{primaryblue}References}
 
@@ -228,49 +311,45 @@ Our work demonstrates that the future of data science lies not in replacing huma
 
 \item Trifacta. (2024). Predictive Transformation Overview. Retrieved from https://docs.trifacta.com/dataprep/en/trifacta-application/concepts/feature-overviews/overview-of-predictive-transformation.html
 \end{enumerate}
-
-\end{document}
-"""
-    
-    return latex_content
+"""),
+]
 
 
 def main():
-    """Generate the LaTeX proposal file and compile to PDF."""
+    """Render the proposal from its section templates and compile it to PDF."""
+    parser = argparse.ArgumentParser(description="Generate the DataMender proposal.")
+    parser.add_argument("--benchmark", help="datamender.benchmark results JSON")
+    parser.add_argument("--fix-report", help="report JSON written by datamender.fixer --report")
+    parser.add_argument("--profile", help="pre-clean profile JSON, for the missing-value chart")
+    parser.add_argument("--no-pdf", action="store_true", help="only write the .tex files")
+    parser.add_argument("--force", action="store_true", help="ignore cached hashes")
+    args = parser.parse_args()
+
     print("Generating polished DataMender proposal document...")
-    
-    # Create the document content
-    latex_content = create_latex_proposal()
-    
-    # Get the directory where this script is located (proposal folder)
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    tex_file = os.path.join(script_dir, 'datamender_proposal_polished.tex')
-    
-    # Write LaTeX file
-    with open(tex_file, 'w') as f:
-        f.write(latex_content)
-    
-    print("✅ Generated datamender_proposal_polished.tex")
-    
-    # Compile to PDF
-    print("Compiling to PDF...")
-    import subprocess
-    try:
-        result = subprocess.run(['pdflatex', 'datamender_proposal_polished.tex'], 
-                              cwd=script_dir, capture_output=True, text=True)
-        if result.returncode == 0:
-            print("✅ Generated datamender_proposal_polished.pdf")
-        else:
-            print("❌ PDF compilation failed:")
-            print(result.stderr)
-    except FileNotFoundError:
+    metrics = collect_metrics(args.benchmark, args.fix_report, args.profile)
+    result = build_document(DOCUMENT, PREAMBLE, SECTIONS, metrics, SCRIPT_DIR,
+                            compile=not args.no_pdf, force=args.force)
+    print(f"✅ Generated {DOCUMENT}.tex ({len(result.rendered)} sections rendered, "
+          f"{len(result.reused)} unchanged)")
+
+    if args.no_pdf:
+        pass
+    elif result.compiled:
+        print(f"✅ Generated {DOCUMENT}.pdf")
+    elif result.error == "pdflatex not found":
         print("⚠️  pdflatex not found. Please install LaTeX and run:")
-        print("   pdflatex datamender_proposal_polished.tex")
-    
-    print(f"\n📁 Files created in: {script_dir}")
-    print("   - datamender_proposal_polished.tex")
-    print("   - datamender_proposal_polished.pdf")
+        print(f"   pdflatex {DOCUMENT}.tex")
+    elif result.error:
+        print("❌ PDF compilation failed:")
+        print(result.error)
+    else:
+        print(f"✅ {DOCUMENT}.pdf is up to date, skipped pdflatex")
+
+    print(f"\n📁 Files created in: {SCRIPT_DIR}")
+    print(f"   - {DOCUMENT}.tex")
+    if result.compiled:
+        print(f"   - {DOCUMENT}.pdf")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from datamender import cache as cache_module
+from datamender.cache import SuggestionCache, atomic_write, fingerprint
+
+TEMPLATE = "Suggest rules for {column}: {profile}"
+SUMMARY = {"kind": "float", "rows": 1000, "missing_pct": 0.5, "min": 0.0, "max": 250.0,
+           "mean": 18.24, "std": 41.35, "negatives": 0,
+           "quantiles": {"p01": 5.43, "p50": 14.89, "p99": 57.58}}
+
+
+def test_key_is_stable_for_the_same_prompt_model_and_profile():
+    first = fingerprint("fare_amount", SUMMARY, TEMPLATE, "model-a")
+    again = fingerprint("fare_amount", dict(SUMMARY), TEMPLATE, "model-a")
+    grown = fingerprint("fare_amount", dict(SUMMARY, rows=2000, mean=18.2401), TEMPLATE,
+                        "model-a")
+
+    assert first == again
+    assert grown.key == first.key
+
+
+@pytest.mark.parametrize("change", [
+    {"template": TEMPLATE + " Answer in JSON."},
+    {"model_name": "model-b"},
+    {"column": "tip_amount"},
+    {"summary": dict(SUMMARY, max=900.0)},
+    {"summary": dict(SUMMARY, kind="integer")},
+])
+def test_key_changes_with_prompt_model_or_profile(change):
+    lookup = {"column": "fare_amount", "summary": SUMMARY, "template": TEMPLATE,
+              "model_name": "model-a"}
+
+    assert fingerprint(**dict(lookup, **change)).key != fingerprint(**lookup).key
+
+
+def test_answers_survive_a_reopen_and_miss_on_any_change(tmp_path):
+    with SuggestionCache(tmp_path, similarity=0) as cache:
+        cache.store("fare_amount", SUMMARY, TEMPLATE, "model-a", "[]", seconds=1.5, tokens=40)
+
+    cache = SuggestionCache(tmp_path, similarity=0)
+    assert cache.lookup("fare_amount", SUMMARY, TEMPLATE, "model-a") == "[]"
+    assert cache.lookup("fare_amount", SUMMARY, TEMPLATE, "model-b") is None
+    assert cache.lookup("fare_amount", SUMMARY, TEMPLATE + "!", "model-a") is None
+    assert cache.lookup("fare_amount", dict(SUMMARY, max=900.0), TEMPLATE, "model-a") is None
+    assert (cache.stats.hits, cache.stats.misses) == (1, 3)
+    assert cache.stats.saved_seconds == 1.5 and cache.stats.saved_tokens == 40
+
+
+def test_atomic_write_replaces_whole_files(tmp_path):
+    path = tmp_path / "entry.json"
+    atomic_write(str(path), "old")
+    atomic_write(str(path), b"new")
+
+    assert path.read_text() == "new"
+    assert os.listdir(tmp_path) == ["entry.json"]
+
+
+def test_failed_atomic_write_keeps_the_old_file(tmp_path, monkeypatch):
+    path = tmp_path / "entry.json"
+    atomic_write(str(path), "old")
+
+    def crash(source, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(cache_module.os, "replace", crash)
+    with pytest.raises(OSError):
+        atomic_write(str(path), "new")
+
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["entry.json"]
+
+
+def test_store_leaves_no_temporary_files(tmp_path):
+    with SuggestionCache(tmp_path) as cache:
+        for model in ("model-a", "model-b"):
+            cache.store("fare_amount", SUMMARY, TEMPLATE, model, "[]")
+
+    assert sorted(os.listdir(tmp_path)) == ["entries", "index.json"]
+    assert all(name.endswith(".json") for name in os.listdir(tmp_path / "entries"))
+    assert len(os.listdir(tmp_path / "entries")) == 2
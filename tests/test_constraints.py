@@ -0,0 +1,26 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from datamender.constraints import Constraint, check_constraints
+
+
+@pytest.mark.parametrize("chunksize", [1000, 2])
+def test_monotonic_sees_nanosecond_steps_of_recent_timestamps(tmp_path, chunksize):
+    start = np.datetime64("2024-03-01T08:00:00", "ns").astype(np.int64)
+    assert start > 2 ** 53
+    offsets = np.array([0, 0, 100, 100, 99, 101, 200, 100])
+    vendors = np.array([1, 2, 1, 2, 1, 2, 1, 2])
+    path = tmp_path / "trips.parquet"
+    pq.write_table(pa.table({
+        "vendor_id": vendors,
+        "pickup_datetime": pa.array(start + offsets, pa.timestamp("ns")),
+    }), path)
+    constraint = Constraint("monotonic", column="pickup_datetime", group_by=["vendor_id"])
+
+    (result,) = check_constraints(path, [constraint], chunksize=chunksize)
+
+    assert result.violations == 2
+    assert result.groups == 2
+    assert sorted(result.sample) == [[2, 4], [5, 7]]
@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import pytest
+
+from datamender import discovery
+from datamender.discovery import discover_rules_async
+from datamender.llm import HTTPModel, Model, ModelError, StubModel, _read_http
+from datamender.profiler import profile_file
+from datamender.synth import generate_trips
+
+
+@pytest.fixture(scope="module")
+def profile(tmp_path_factory):
+    path = tmp_path_factory.mktemp("discovery") / "trips.csv"
+    generate_trips(path, rows=500)
+    return profile_file(path)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(discovery, "RETRY_BACKOFF", 0.0)
+
+
+class SlowModel(StubModel):
+    """Stub answering after ``latency`` seconds, counting calls in flight."""
+
+    def __init__(self, name, latency, tracker):
+        super().__init__(name)
+        self.latency = latency
+        self.tracker = tracker
+
+    async def acomplete(self, prompt):
+        self.tracker["now"] += 1
+        self.tracker["peak"] = max(self.tracker["peak"], self.tracker["now"])
+        try:
+            await asyncio.sleep(self.latency)
+            return self.complete(prompt)
+        finally:
+            self.tracker["now"] -= 1
+
+
+class BrokenModel(Model):
+    name = "broken"
+
+    async def acomplete(self, prompt):
+        raise ModelError("broken: HTTP 500")
+
+
+class FlakyServer:
+    """HTTP endpoint whose first ``faults`` connections misbehave, then answers like a stub."""
+
+    def __init__(self, fault, faults):
+        self.fault = fault
+        self.faults = faults
+        self.connections = 0
+        self.stub = StubModel()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        _, _, body = await _read_http(reader, request=True)
+        if self.connections <= self.faults:
+            if self.fault == "truncate":
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n{\"te")
+                await writer.drain()
+            writer.close()
+            return
+        data = json.dumps({"text": self.stub.complete(json.loads(body)["prompt"])}).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(data) + data)
+        await writer.drain()
+        writer.close()
+
+
+def _discover(profile, models, **options):
+    return asyncio.run(discover_rules_async(profile, models, **options))
+
+
+def test_calls_fan_out_concurrently(profile):
+    tracker = {"now": 0, "peak": 0}
+    models = [SlowModel(f"slow-{index}", 0.05, tracker) for index in range(3)]
+    calls = 3 * len(profile["columns"])
+
+    rules, results = _discover(profile, models, concurrency=8)
+
+    assert len(results) == calls and all(result.ok for result in results)
+    assert tracker["peak"] == min(8, calls)
+    assert rules
+
+
+def test_one_failing_model_does_not_stop_the_others(profile):
+    models = [StubModel("a"), StubModel("b", margin=0.2), BrokenModel()]
+
+    rules, results = _discover(profile, models, retries=1)
+
+    broken = [result for result in results if result.model == "broken"]
+    assert len(broken) == len(profile["columns"])
+    assert all(result.error.startswith("ModelError") and result.attempts == 2
+               for result in broken)
+    assert all(result.ok for result in results if result.model != "broken")
+    assert rules
+
+
+@pytest.mark.parametrize("fault", ["drop", "truncate"])
+def test_dropped_and_truncated_replies_are_retried(profile, fault):
+    server = FlakyServer(fault, faults=1)
+
+    async def run():
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            return await discover_rules_async(
+                profile, [HTTPModel("flaky", f"http://127.0.0.1:{port}/complete")],
+                concurrency=1, retries=1)
+
+    rules, results = asyncio.run(run())
+
+    assert all(result.ok for result in results)
+    assert sorted(result.attempts for result in results)[-1] == 2
+    assert sum(result.attempts for result in results) == len(results) + 1
+    assert rules
+
+
+@pytest.mark.parametrize("fault", ["drop", "truncate"])
+def test_persistent_faults_are_recorded_per_column(profile, fault):
+    server = FlakyServer(fault, faults=10 ** 6)
+
+    async def run():
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            return await discover_rules_async(
+                profile, [HTTPModel("flaky", f"http://127.0.0.1:{port}/complete")], retries=1)
+
+    _, results = asyncio.run(run())
+
+    assert len(results) == len(profile["columns"])
+    assert all(result.error.startswith("ModelError") and result.attempts == 2
+               for result in results)
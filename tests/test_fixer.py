@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datamender.fixer import fix_file
+from datamender.io import iter_batches
+from datamender.rules import Rule
+from datamender.synth import ANOMALY_RATES, trip_chunk, trip_rules
+
+
+def _write(table, path, row_group_size):
+    if str(path).endswith(".parquet"):
+        pq.write_table(table, path, row_group_size=row_group_size)
+    else:
+        with pa.ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table, max_chunksize=row_group_size)
+
+
+def test_clean_row_groups_skip_the_rules(tmp_path):
+    clean = dict.fromkeys(ANOMALY_RATES, 0.0)
+    frames = [trip_chunk(1000, index=index, first_id=index * 1000,
+                         rates=None if index in (3, 17) else clean)[0] for index in range(20)]
+    table = pa.Table.from_pandas(pd.concat(frames, ignore_index=True), preserve_index=False)
+    reports, cleaned = {}, {}
+    for extension in ("parquet", "arrow"):
+        source, output = tmp_path / f"trips.{extension}", tmp_path / f"clean.{extension}"
+        _write(table, source, 1000)
+        reports[extension] = fix_file(source, trip_rules(), output)
+        cleaned[extension] = pa.Table.from_batches(
+            [chunk.batch for chunk in iter_batches(output)]).to_pandas()
+
+    assert reports["parquet"]["rows_skipped"] == 18000
+    assert reports["arrow"]["rows_skipped"] == 0
+    assert reports["parquet"]["anomalies"] == reports["arrow"]["anomalies"]
+    pd.testing.assert_frame_equal(cleaned["parquet"], cleaned["arrow"])
+
+
+def test_nan_in_float_row_group_is_not_skipped(tmp_path):
+    source = tmp_path / "nan.parquet"
+    values = np.arange(10, dtype=np.float64)
+    values[7] = np.nan
+    pq.write_table(pa.table({"x": pa.array(values, from_pandas=False)}), source, row_group_size=5)
+
+    report = fix_file(source, [Rule("not_null", "x", "fill", value=0)], tmp_path / "out.parquet")
+
+    assert report["rows_skipped"] == 5
+    assert pd.read_parquet(tmp_path / "out.parquet")["x"].tolist()[7] == 0
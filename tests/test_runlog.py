@@ -0,0 +1,21 @@
+from datamender.profiler import profile_file
+from datamender.rules import Rule
+from datamender.runlog import rollback_rule, run_checkpointed
+from datamender.synth import generate_trips
+
+
+def test_rollback_of_drop_rule_matches_full_reprofile(tmp_path):
+    source, output = tmp_path / "trips.parquet", tmp_path / "clean.parquet"
+    generate_trips(source, rows=12000, chunk_rows=2000)
+    rules = [Rule("range", "trip_id", "drop", max=11990),
+             Rule("non_negative", "fare_amount", "abs")]
+    run_checkpointed(source, rules, output, profile=profile_file(source))
+
+    report = rollback_rule(f"{output}.run", "trip_id.range")
+
+    assert report["replayed_segments"] == [5]
+    got, want = report["run"]["profile"], profile_file(output)
+    assert got["rows"] == want["rows"] == 12000
+    for name, column in want["columns"].items():
+        for key in ("count", "missing", "min", "max"):
+            assert got["columns"][name].get(key) == column.get(key), (name, key)